@@ -0,0 +1,116 @@
+# src/notebook_service/admission.py
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+# Admission settings for synchronous /run executions
+RUN_MAX_CONCURRENCY = int(os.getenv("RUN_MAX_CONCURRENCY", "2"))
+RUN_MAX_QUEUE = int(os.getenv("RUN_MAX_QUEUE", "8"))
+
+
+class AdmissionRejected(Exception):
+    """Raised when every slot is busy and the wait queue is full."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Server busy, retry later")
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Cap concurrent executions and bound the queue waiting for a slot.
+
+    Meant to be used from the event loop only. A freed slot is handed
+    straight to the oldest waiter, so waiters are served FIFO.
+    """
+
+    def __init__(self, max_concurrent: int, max_queue: int):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self._running = 0
+        self._waiters: deque[asyncio.Future] = deque()
+
+        # counters reported by stats()
+        self._admitted = 0
+        self._rejected = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._avg_run = 0.0
+
+    def retry_after(self) -> int:
+        """
+        Seconds until a slot is likely free, from the average run time.
+        """
+        rounds = (len(self._waiters) + 1) / max(self.max_concurrent, 1)
+        return max(1, math.ceil(self._avg_run * rounds))
+
+    async def acquire(self) -> float:
+        """
+        Wait for a slot; return the admission timestamp.
+
+        Raises AdmissionRejected when the queue is already full.
+        """
+        t0 = time.monotonic()
+        if self._running < self.max_concurrent and not self._waiters:
+            self._running += 1
+        else:
+            if len(self._waiters) >= self.max_queue:
+                self._rejected += 1
+                raise AdmissionRejected(self.retry_after())
+            fut = asyncio.get_running_loop().create_future()
+            self._waiters.append(fut)
+            try:
+                await fut
+            except asyncio.CancelledError:
+                if fut in self._waiters:
+                    self._waiters.remove(fut)
+                elif fut.done() and not fut.cancelled():
+                    # slot was handed to us as we were cancelled
+                    self._hand_off()
+                raise
+
+        waited = time.monotonic() - t0
+        self._admitted += 1
+        self._wait_total += waited
+        self._wait_max = max(self._wait_max, waited)
+        return time.monotonic()
+
+    def release(self, admitted_at: float) -> None:
+        run = time.monotonic() - admitted_at
+        # exponentially weighted so Retry-After tracks recent load
+        self._avg_run = run if not self._avg_run else (
+            0.8 * self._avg_run + 0.2 * run
+        )
+        self._hand_off()
+
+    def _hand_off(self) -> None:
+        while self._waiters:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                fut.set_result(None)
+                return
+        self._running -= 1
+
+    @asynccontextmanager
+    async def slot(self):
+        admitted_at = await self.acquire()
+        try:
+            yield
+        finally:
+            self.release(admitted_at)
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "running": self._running,
+            "queued": len(self._waiters),
+            "admitted": self._admitted,
+            "rejected": self._rejected,
+            "wait_seconds_total": round(self._wait_total, 6),
+            "wait_seconds_max": round(self._wait_max, 6),
+            "avg_run_seconds": round(self._avg_run, 6),
+        }
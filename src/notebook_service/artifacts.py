@@ -0,0 +1,202 @@
+# src/notebook_service/artifacts.py
+import base64
+import binascii
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import threading
+from pathlib import Path
+
+# Large outputs are written here and served as /processed/artifacts/<name>
+DEFAULT_ARTIFACT_DIR = (
+    Path(__file__).resolve().parents[2] / "data" / "processed" / "artifacts"
+)
+ARTIFACT_DIR = Path(os.getenv("ARTIFACT_DIR", DEFAULT_ARTIFACT_DIR))
+# Outputs at least this many bytes are offloaded; 0 keeps everything inline
+ARTIFACT_MIN_BYTES = int(os.getenv("ARTIFACT_MIN_BYTES", "65536"))
+# Size cap; least recently offloaded artifacts are deleted first
+ARTIFACT_MAX_MB = int(os.getenv("ARTIFACT_MAX_MB", "500"))
+ARTIFACT_URL_PREFIX = "/processed/artifacts/"
+
+# Mimes whose notebook payload is base64-encoded binary
+BINARY_MIMES = {"image/png", "image/jpeg", "image/gif"}
+
+# Eviction deletes down to this fraction of the cap, so the directory is
+# listed once per batch of writes rather than on every write at the cap
+_EVICT_TO = 0.9
+
+_NAME_RE = re.compile(r"^[0-9a-f]{64}(\.[A-Za-z0-9]+)?$")
+
+
+def encode_payload(mime: str, data) -> bytes:
+    """
+    Bytes of one output payload as it would be saved to a file.
+    """
+    if isinstance(data, list):
+        data = "".join(data)
+    if mime in BINARY_MIMES and isinstance(data, str):
+        return base64.b64decode(data)
+    if isinstance(data, str):
+        return data.encode("utf-8")
+    return json.dumps(data).encode("utf-8")
+
+
+def artifact_name(digest: str, mime: str) -> str:
+    ext = mimetypes.guess_extension(mime) or ".bin"
+    return f"{digest}{ext}"
+
+
+class ArtifactStore:
+    """
+    Content-addressed directory of offloaded outputs.
+
+    Each payload is stored once as ``<sha256><ext>``; identical outputs
+    from later runs reuse the existing file and bump its mtime. Once the
+    directory exceeds *max_bytes*, the files offloaded least recently
+    are deleted. Its size is tracked as files are written and only
+    re-measured, by listing it, when an eviction is due. Offloading
+    happens when a response is projected, so a deleted artifact is
+    written again the next time it is returned.
+    """
+
+    def __init__(self, directory: Path, min_bytes: int, max_bytes: int):
+        self.directory = Path(directory)
+        self.min_bytes = min_bytes
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._offloaded = 0
+        self._written = 0
+        self._bytes_offloaded = 0
+        self._evictions = 0
+        # bytes in the directory; None until it is first listed
+        self._size: int | None = None
+        self._evict_lock = threading.Lock()
+
+    def offload(self, record: dict) -> dict:
+        """
+        Return *record* with a large payload replaced by a reference.
+
+        Small payloads come back unchanged.
+        """
+        mime = record["mime"]
+        data = record["data"]
+        # judge by length first, so small outputs are never re-encoded
+        if isinstance(data, (str, list)) and (
+            sum(map(len, data)) if isinstance(data, list) else len(data)
+        ) < self.min_bytes:
+            return record
+        try:
+            payload = encode_payload(mime, data)
+        except (binascii.Error, TypeError, ValueError):
+            return record
+        if len(payload) < self.min_bytes:
+            return record
+
+        digest = hashlib.sha256(payload).hexdigest()
+        name = artifact_name(digest, mime)
+        path = self.directory / name
+        written = False
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            tmp = path.with_suffix(
+                f".{os.getpid()}.{threading.get_ident()}.tmp"
+            )
+            tmp.write_bytes(payload)
+            os.replace(tmp, path)
+            written = True
+            with self._lock:
+                if self._size is not None:
+                    self._size += len(payload)
+                due = self._size is None or self._size > self.max_bytes
+            if due:
+                self._evict(keep=path)
+
+        with self._lock:
+            self._offloaded += 1
+            self._written += written
+            self._bytes_offloaded += len(payload)
+
+        return {
+            **record,
+            "data": None,
+            "artifact": {
+                "sha256": digest,
+                "mime": mime,
+                "size": len(payload),
+                "url": ARTIFACT_URL_PREFIX + name,
+            },
+        }
+
+    def _evict(self, keep: Path) -> None:
+        # other replicas write here too, so measure before deleting
+        with self._evict_lock:
+            entries = []
+            total = 0
+            for p in self.directory.iterdir():
+                if not _NAME_RE.match(p.name):
+                    continue
+                try:
+                    st = p.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, p))
+                total += st.st_size
+            evicted = 0
+            if total > self.max_bytes:
+                entries.sort()
+                for _, size, p in entries:
+                    if total <= self.max_bytes * _EVICT_TO:
+                        break
+                    if p == keep:
+                        continue
+                    p.unlink(missing_ok=True)
+                    total -= size
+                    evicted += 1
+            with self._lock:
+                self._size = total
+                self._evictions += evicted
+
+    def path_for(self, name: str) -> Path | None:
+        """
+        Path of artifact *name*, or None if the name isn't one of ours.
+        """
+        if not _NAME_RE.match(name):
+            return None
+        return self.directory / name
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "min_bytes": self.min_bytes,
+                "max_bytes": self.max_bytes,
+                "offloaded": self._offloaded,
+                "written": self._written,
+                "bytes_offloaded": self._bytes_offloaded,
+                "evictions": self._evictions,
+            }
+
+
+_store: ArtifactStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_artifact_store() -> ArtifactStore | None:
+    """
+    Return the process-wide artifact store, or None when disabled.
+    """
+    global _store
+    if ARTIFACT_MIN_BYTES <= 0:
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = ArtifactStore(
+                ARTIFACT_DIR,
+                ARTIFACT_MIN_BYTES,
+                max_bytes=ARTIFACT_MAX_MB * 1024 * 1024,
+            )
+        return _store
@@ -0,0 +1,493 @@
+# src/notebook_service/compiled.py
+"""
+Kernel-free "compiled notebook" engine.
+
+A notebook's code cells are compiled once per worker process and run
+in-process, in a fresh namespace per run, on a set of worker processes.
+stdout/stderr, last-expression values, ``display()`` calls and matplotlib
+figures are captured as nbformat outputs, so the result has the same
+CellOutput shape as a kernel run.
+
+Only plain Python cells are supported: ``%matplotlib``/``%config`` line
+magics are ignored, anything else IPython-specific is rejected.
+"""
+import ast
+import base64
+import builtins
+import io
+import os
+import threading
+import time
+import traceback
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import redirect_stderr, redirect_stdout
+from importlib import import_module
+from multiprocessing import get_context
+
+from notebook_service.notebook_cache import read_notebook
+from notebook_service.result_cache import cache_key, get_result_cache
+from notebook_service.runner import (
+    ExecutionCancelled,
+    ExecutionTimeout,
+    output_records,
+    resolve_notebook_path,
+)
+
+# Engine settings
+COMPILED_WORKERS = int(os.getenv("COMPILED_WORKERS", "2"))
+COMPILED_PRELOAD = [
+    m.strip()
+    for m in os.getenv(
+        "COMPILED_PRELOAD",
+        "pandas,networkx,sklearn,matplotlib,notebook_service",
+    ).split(",")
+    if m.strip()
+]
+
+# line magics that only configure the kernel's display and can be dropped
+IGNORED_MAGICS = ("%matplotlib", "%config")
+
+
+class UnsupportedNotebook(ValueError):
+    """Raised when a notebook uses IPython features the engine lacks."""
+
+
+class CompiledCellError(Exception):
+    """Raised in place of a kernel's CellExecutionError."""
+
+    def __init__(self, cell: int, trace: str):
+        super().__init__(cell, trace)
+        self.cell = cell
+        self.trace = trace
+
+    def __str__(self) -> str:
+        return f"Cell {self.cell} raised:\n{self.trace}"
+
+
+class CompiledCell:
+    """
+    One code cell as a statement block plus an optional trailing
+    expression whose value is displayed, like IPython does.
+    """
+
+    def __init__(self, index: int, source: str, filename: str):
+        self.index = index
+        lines = []
+        for line in source.splitlines():
+            stripped = line.lstrip()
+            if stripped.startswith(IGNORED_MAGICS):
+                lines.append("")
+            elif stripped.startswith(("%", "!")):
+                raise UnsupportedNotebook(
+                    f"Cell {index} uses IPython syntax: {stripped!r}"
+                )
+            else:
+                lines.append(line)
+        code = "\n".join(lines)
+        try:
+            tree = ast.parse(code, filename=filename)
+        except SyntaxError as e:
+            raise UnsupportedNotebook(f"Cell {index}: {e}") from e
+
+        self.expr = None
+        if tree.body and isinstance(tree.body[-1], ast.Expr) \
+                and not code.rstrip().endswith(";"):
+            last = ast.Expression(tree.body.pop().value)
+            self.expr = compile(last, filename, "eval")
+        self.body = compile(tree, filename, "exec")
+
+
+def compile_notebook(nb, name: str = "<notebook>") -> list[CompiledCell]:
+    return [
+        CompiledCell(idx, cell.source, f"{name}[{idx}]")
+        for idx, cell in enumerate(nb.cells, start=1)
+        if cell.cell_type == "code" and cell.source.strip()
+    ]
+
+
+# -- worker side -----------------------------------------------------------
+
+# compiled notebooks of this worker: path -> ((mtime_ns, size), cells)
+_compiled: dict[str, tuple[tuple, list[CompiledCell]]] = {}
+
+
+def _init_worker(preload: list[str]) -> None:
+    os.environ["MPLBACKEND"] = "Agg"
+    for mod in preload:
+        try:
+            import_module(mod)
+        except Exception:
+            pass
+
+
+def _load(path: str) -> list[CompiledCell]:
+    st = os.stat(path)
+    signature = (st.st_mtime_ns, st.st_size)
+    entry = _compiled.get(path)
+    if entry is None or entry[0] != signature:
+        nb = read_notebook(path, strip=True)
+        entry = (signature, compile_notebook(nb, os.path.basename(path)))
+        _compiled[path] = entry
+    return entry[1]
+
+
+class _Capture:
+    """
+    Collects one cell's outputs in order, flushing captured text first.
+    """
+
+    def __init__(self):
+        self.outputs: list[dict] = []
+        self.stdout = io.StringIO()
+        self.stderr = io.StringIO()
+
+    def flush_streams(self) -> None:
+        for name, buf in (("stdout", self.stdout), ("stderr", self.stderr)):
+            text = buf.getvalue()
+            if text:
+                self.outputs.append(
+                    {"output_type": "stream", "name": name, "text": text}
+                )
+                buf.seek(0)
+                buf.truncate()
+
+    def add(self, output_type: str, data: dict, count=None) -> None:
+        self.flush_streams()
+        out = {"output_type": output_type, "data": data, "metadata": {}}
+        if output_type == "execute_result":
+            out["execution_count"] = count
+        self.outputs.append(out)
+
+
+def _mime_bundle(obj) -> dict:
+    from matplotlib.figure import Figure
+
+    if isinstance(obj, Figure):
+        buf = io.BytesIO()
+        obj.savefig(buf, format="png", bbox_inches="tight")
+        return {
+            "image/png": base64.b64encode(buf.getvalue()).decode(),
+            "text/plain": repr(obj),
+        }
+    return {"text/plain": repr(obj)}
+
+
+def _flush_figures(capture: _Capture) -> None:
+    # what the inline backend does at the end of every cell
+    import matplotlib.pyplot as plt
+
+    for num in plt.get_fignums():
+        capture.add("display_data", _mime_bundle(plt.figure(num)))
+    plt.close("all")
+
+
+def run_in_worker(path: str) -> list[tuple[int, dict]]:
+    """
+    Run the compiled notebook at *path*; return ``(cell, output)`` pairs.
+    """
+    import matplotlib.pyplot as plt
+    from matplotlib.figure import Figure
+
+    cells = _load(path)
+    os.chdir(os.path.dirname(path))
+    plt.close("all")
+
+    capture = _Capture()
+
+    def display(*objs, **kwargs):
+        for obj in objs:
+            capture.add("display_data", _mime_bundle(obj))
+            if isinstance(obj, Figure):
+                plt.close(obj)
+
+    namespace = {
+        "__name__": "__main__",
+        "__builtins__": builtins,
+        "display": display,
+    }
+    show = plt.show
+    plt.show = lambda *a, **kw: _flush_figures(capture)
+    results: list[tuple[int, dict]] = []
+    try:
+        for count, cell in enumerate(cells, start=1):
+            capture.outputs = []
+            with redirect_stdout(capture.stdout), \
+                    redirect_stderr(capture.stderr):
+                try:
+                    exec(cell.body, namespace)
+                    value = (
+                        eval(cell.expr, namespace) if cell.expr else None
+                    )
+                except Exception:
+                    raise CompiledCellError(
+                        cell.index, traceback.format_exc()
+                    ) from None
+            if value is not None:
+                capture.add("execute_result", _mime_bundle(value), count)
+                if isinstance(value, Figure):
+                    plt.close(value)
+            _flush_figures(capture)
+            capture.flush_streams()
+            results.extend((cell.index, out) for out in capture.outputs)
+    finally:
+        plt.show = show
+    return results
+
+
+def _serve(conn, preload: list[str]) -> None:
+    """
+    Worker process main loop: answer each request on *conn* with
+    ``("ok", value)`` or ``("error", exception)`` until it is closed.
+    """
+    _init_worker(preload)
+    while True:
+        try:
+            kind, arg = conn.recv()
+        except EOFError:
+            return
+        try:
+            value = run_in_worker(arg) if kind == "run" else os.getpid()
+        except Exception as e:
+            try:
+                conn.send(("error", e))
+            except Exception:
+                # the exception itself can't be pickled
+                conn.send(("error", RuntimeError(f"{type(e).__name__}: {e}")))
+            continue
+        conn.send(("ok", value))
+
+
+# -- service side ----------------------------------------------------------
+
+class _Worker:
+    """
+    One worker process and the pipe it takes requests on.
+    """
+
+    __slots__ = ("process", "conn")
+
+    def __init__(self, preload: list[str]):
+        ctx = get_context("spawn")
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_serve, args=(child, preload), daemon=True
+        )
+        self.process.start()
+        child.close()
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+
+
+class CompiledEngine:
+    """
+    Worker processes that run compiled notebooks, one run at a time each.
+
+    A timed-out or cancelled run can't be stopped cooperatively, so its
+    worker is killed and replaced; runs on other workers carry on. A run
+    whose worker dies is retried once on another.
+    """
+
+    def __init__(self, workers: int, preload: list[str]):
+        self.workers = workers
+        self.preload = preload
+        self._lock = threading.Lock()
+        self._freed = threading.Condition(self._lock)
+        self._idle: list[_Worker] = []
+        self._busy: set[_Worker] = set()
+        self._starting = 0
+        self._runs = 0
+        self._failures = 0
+        self._resets = 0
+
+    def _checkout(
+        self,
+        deadline: float | None,
+        cancel_event: threading.Event | None,
+    ) -> _Worker:
+        with self._lock:
+            while True:
+                if self._idle:
+                    worker = self._idle.pop()
+                    self._busy.add(worker)
+                    return worker
+                if len(self._busy) + self._starting < self.workers:
+                    self._starting += 1
+                    break
+                if cancel_event is not None and cancel_event.is_set():
+                    raise ExecutionCancelled("Run cancelled")
+                if deadline is not None and time.monotonic() > deadline:
+                    raise ExecutionTimeout("Timed out waiting for a worker")
+                self._freed.wait(0.1)
+        try:
+            worker = _Worker(self.preload)
+        except BaseException:
+            with self._lock:
+                self._starting -= 1
+            raise
+        with self._lock:
+            self._starting -= 1
+            self._busy.add(worker)
+        return worker
+
+    def _checkin(self, worker: _Worker) -> None:
+        with self._lock:
+            self._busy.discard(worker)
+            self._idle.append(worker)
+            self._freed.notify()
+
+    def _discard(self, worker: _Worker) -> None:
+        # replace the worker at once, so the engine stays ready
+        with self._lock:
+            self._busy.discard(worker)
+            self._resets += 1
+            self._starting += 1
+        worker.kill()
+        try:
+            replacement = _Worker(self.preload)
+        finally:
+            with self._lock:
+                self._starting -= 1
+                self._freed.notify()
+        self._checkin(replacement)
+
+    def _call(
+        self,
+        worker: _Worker,
+        request: tuple,
+        deadline: float | None = None,
+        cancel_event: threading.Event | None = None,
+        timeout: float | None = None,
+    ):
+        # ("ok", value) or ("error", exception raised by the notebook);
+        # EOFError or OSError if the worker dies
+        worker.conn.send(request)
+        while not worker.conn.poll(0.1):
+            if cancel_event is not None and cancel_event.is_set():
+                raise ExecutionCancelled("Run cancelled")
+            if deadline is not None and time.monotonic() > deadline:
+                raise ExecutionTimeout(f"Run exceeded {timeout}s")
+        return worker.conn.recv()
+
+    def start(self) -> None:
+        """
+        Spawn the workers and import the preload modules up front.
+        """
+        workers = [self._checkout(None, None) for _ in range(self.workers)]
+        for worker in workers:
+            status, value = self._call(worker, ("ping", None))
+            self._checkin(worker)
+            if status == "error":
+                raise value
+
+    def run(
+        self,
+        path: str,
+        timeout: float | None = None,
+        cancel_event: threading.Event | None = None,
+    ) -> list[tuple[int, dict]]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for attempt in (1, 2):
+            try:
+                worker = self._checkout(deadline, cancel_event)
+            except Exception:
+                self._count("_failures")
+                raise
+            try:
+                status, value = self._call(
+                    worker, ("run", path), deadline, cancel_event, timeout
+                )
+            except (ExecutionTimeout, ExecutionCancelled):
+                # only killing the worker stops the run
+                self._discard(worker)
+                self._count("_failures")
+                raise
+            except (EOFError, OSError):
+                # the worker died (ExecutionTimeout is an OSError too)
+                self._discard(worker)
+                if attempt == 2:
+                    self._count("_failures")
+                    raise BrokenProcessPool(
+                        "A compiled-engine worker died during the run"
+                    ) from None
+                continue
+            except BaseException:
+                self._discard(worker)
+                raise
+            self._checkin(worker)
+            if status == "error":
+                self._count("_failures")
+                raise value
+            self._count("_runs")
+            return value
+
+    def shutdown(self) -> None:
+        with self._lock:
+            workers = self._idle + list(self._busy)
+            self._idle, self._busy = [], set()
+        for worker in workers:
+            worker.kill()
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "running": bool(self._idle or self._busy),
+                "runs": self._runs,
+                "failures": self._failures,
+                "resets": self._resets,
+            }
+
+
+_engine: CompiledEngine | None = None
+_engine_lock = threading.Lock()
+
+
+def get_compiled_engine() -> CompiledEngine:
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = CompiledEngine(COMPILED_WORKERS, COMPILED_PRELOAD)
+        return _engine
+
+
+def run_compiled(
+    path: str,
+    timeout: float | None = None,
+    cancel_event: threading.Event | None = None,
+) -> dict:
+    """
+    ``run_notebook`` for the compiled engine: same arguments and result.
+
+    Raises UnsupportedNotebook for notebooks that need a kernel.
+    """
+    nb_path = resolve_notebook_path(path)
+    # compile here too, so unsupported notebooks fail before a worker
+    # is involved
+    _load(str(nb_path))
+    nb = read_notebook(nb_path, strip=True)
+
+    cache = get_result_cache()
+    if cache is not None:
+        key = cache_key(nb_path, nb) + "-compiled"
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    pairs = get_compiled_engine().run(str(nb_path), timeout, cancel_event)
+    result = {
+        "outputs": [
+            record
+            for idx, out in pairs
+            for record in output_records(idx, out)
+        ]
+    }
+    if cache is not None:
+        cache.put(key, result)
+    return result
@@ -1,94 +1,202 @@
+import logging
 import os
-from typing import Any, Dict, List, Tuple
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
 
 import pandas as pd
 
+from notebook_service import metrics
+from notebook_service.nlu_backends import EMOTIONS, backend_name, make_backend
+from notebook_service.nlu_cache import cache_key, get_nlu_cache, normalize_text
+from notebook_service.nlu_retry import (
+    NLU_MAX_CONCURRENCY,
+    call_with_retry,
+    get_nlu_limiter,
+)
+
+log = logging.getLogger(__name__)
+
 DEV_MODE = os.getenv("DEV_MODE", "false").lower() == "true"
 
-if DEV_MODE:
-    # dummy stub
-    class DummyNLU:
-        def analyze(self, *, text: str, features: Any):
-            return {
-                "emotion": {
-                    "document": {
-                        "emotion": {
-                            "anger": 0.0,
-                            "disgust": 0.0,
-                            "fear": 0.0,
-                            "joy": 1.0,
-                            "sadness": 0.0,
-                        }
-                    }
-                },
-                # no concepts/semantic_roles in dev
-            }
-
-    NLU_CLIENT = DummyNLU()
-
-else:
-    from ibm_cloud_sdk_core.authenticators import IAMAuthenticator
-    from ibm_watson import NaturalLanguageUnderstandingV1
-    from ibm_watson.natural_language_understanding_v1 import (
-        ConceptsOptions,
-        EmotionOptions,
-        Features,
-        SemanticRolesOptions,
-    )
-
-    auth = IAMAuthenticator(os.environ["NLU_APIKEY"])
-    NLU_CLIENT = NaturalLanguageUnderstandingV1(
-        version="2023-08-01", authenticator=auth
-    )
-    NLU_CLIENT.set_service_url(os.environ["NLU_URL"])
-
-
-def get_analysis(texts: List[str]) -> pd.DataFrame:
+NLU_CLIENT = make_backend(backend_name(DEV_MODE))
+# part of every NLU cache key, so backends never share answers
+NLU_VERSION = NLU_CLIENT.version
+FEATURES = {
+    "concepts": {"limit": 8},
+    "semantic_roles": {"limit": 5},
+    "emotion": {},
+}
+
+NLU_CALL_SECONDS = metrics.Histogram(
+    "notebook_service_nlu_call_seconds",
+    "Latency of one NLU analyze call from get_analysis",
+)
+NLU_ERRORS = metrics.Counter(
+    "notebook_service_nlu_errors_total",
+    "NLU analyze calls that raised, by exception type",
+    labels=("error",),
+)
+NLU_CACHE_LOOKUPS = metrics.Counter(
+    "notebook_service_nlu_cache_lookups_total",
+    "get_analysis texts answered from the NLU cache (hit) or not (miss)",
+    labels=("result",),
+)
+NLU_DUPLICATES = metrics.Counter(
+    "notebook_service_nlu_duplicate_texts_total",
+    "get_analysis rows answered by another row of the same batch",
+)
+
+
+def get_analysis(
+    texts: List[str], concurrency: Optional[int] = None
+) -> pd.DataFrame:
     """
     Run NLU with Concepts, Semantic Roles, and Emotion on each text.
     Returns a DataFrame with columns:
       text, anger, disgust, fear, joy, sadness,
-      concepts (List[str]), semantic_roles (List[Tuple[str,str,str]])
+      concepts (List[str]), semantic_roles (List[Tuple[str,str,str]]),
+      error (None, or why the text could not be analysed)
+
+    Up to *concurrency* (default NLU_MAX_CONCURRENCY) threads send
+    requests, within the adaptive limit shared by the process (see
+    nlu_retry); throttles and transient errors are retried with
+    backoff. Rows keep the order of *texts*. A text whose request still
+    fails gets a row with empty results and ``error`` set instead of
+    failing the batch. Responses are cached on disk (see nlu_cache), so
+    texts seen before with the same features and API version are not
+    sent again.
+
+    Texts that normalise alike (whitespace, typographic or wrapping
+    quotes) are analysed once per batch; their rows share the parsed
+    concept and role lists rather than holding copies.
     """
-    records: List[Dict[str, Any]] = []
-
-    for txt in texts:
-        if DEV_MODE:
-            raw = NLU_CLIENT.analyze(text=txt, features=None)
-        else:
-            raw = NLU_CLIENT.analyze(
-                text=txt,
-                features=Features(
-                    concepts=ConceptsOptions(limit=8),
-                    semantic_roles=SemanticRolesOptions(limit=5),
-                    emotion=EmotionOptions(),
-                ),
-                return_analyzed_text=False,
-            ).get_result()
-
-        # parse emotion
-        emo = raw["emotion"]["document"]["emotion"]
-
-        # keep full raw concepts
-        concepts_raw = raw.get("concepts", [])
-
-        # extract just the text for your existing pipeline
-        concepts = [c["text"] for c in concepts_raw]
-
-        # parse semantic roles
-        roles: List[Tuple[str, str, str]] = []
-        for r in raw.get("semantic_roles", []):
-            subj = r["subject"]["text"]
-            act = r["action"]["text"]
-            obj = r.get("object", {}).get("text", "")
-            roles.append((subj, act, obj))
-
-        records.append({
-            "text": txt,
-            **emo,
-            "concepts_raw": concepts_raw,
-            "concepts": concepts,
-            "semantic_roles": roles,
-        })
+    normalized = [normalize_text(txt) for txt in texts]
+    unique = list(dict.fromkeys(normalized))
+    NLU_DUPLICATES.inc(len(texts) - len(unique))
+    try:
+        responses = _fetch(unique, concurrency)
+    finally:
+        # kernels are separate processes; hand the samples to /metrics
+        metrics.flush()
 
+    parsed = {
+        norm: _record(norm, raw) for norm, raw in zip(unique, responses)
+    }
+    records = [
+        {**parsed[norm], "text": txt}
+        for txt, norm in zip(texts, normalized)
+    ]
+    failed = sum(r["error"] is not None for r in records)
+    if failed:
+        log.warning("NLU failed for %d of %d texts", failed, len(records))
     return pd.DataFrame.from_records(records)
+
+
+def _fetch(texts: List[str], concurrency: Optional[int]) -> list:
+    # raw NLU response (or the exception) for each text, cache first
+    cache = get_nlu_cache()
+    keys = [cache_key(txt, FEATURES, NLU_VERSION) for txt in texts]
+    cached = cache.get_many(keys) if cache is not None else {}
+
+    missing = [i for i, key in enumerate(keys) if key not in cached]
+    if cache is not None:
+        NLU_CACHE_LOOKUPS.labels("hit").inc(len(keys) - len(missing))
+        NLU_CACHE_LOOKUPS.labels("miss").inc(len(missing))
+    if concurrency is None:
+        concurrency = NLU_MAX_CONCURRENCY
+    workers = max(1, min(concurrency, len(missing)))
+    if workers == 1:
+        fetched = [_nlu_call_or_error(texts[i]) for i in missing]
+    else:
+        with ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="nlu"
+        ) as pool:
+            fetched = list(
+                pool.map(_nlu_call_or_error, [texts[i] for i in missing])
+            )
+
+    fresh = {}
+    for i, raw in zip(missing, fetched):
+        cached[keys[i]] = raw
+        if not isinstance(raw, Exception):
+            fresh[keys[i]] = raw
+    if cache is not None:
+        cache.put_many(fresh)
+    return [cached[key] for key in keys]
+
+
+def _nlu_call_or_error(txt: str):
+    limiter = get_nlu_limiter()
+    try:
+        return call_with_retry(lambda: _nlu_call(txt), limiter)
+    except Exception as e:
+        return e
+
+
+def _nlu_call(txt: str) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    try:
+        return NLU_CLIENT.analyze(text=txt, features=FEATURES)
+    except Exception as e:
+        NLU_ERRORS.labels(type(e).__name__).inc()
+        raise
+    finally:
+        NLU_CALL_SECONDS.observe(time.perf_counter() - t0)
+
+
+def _record(txt: str, raw) -> Dict[str, Any]:
+    # one output row; failures become rows with ``error`` set
+    try:
+        if isinstance(raw, Exception):
+            raise raw
+        return _parse(txt, raw)
+    except Exception as e:
+        return {
+            "text": txt,
+            **dict.fromkeys(EMOTIONS),
+            "concepts_raw": [],
+            "concepts": [],
+            "semantic_roles": [],
+            "error": f"{type(e).__name__}: {e}",
+        }
+
+
+def _parse(txt: str, raw: Dict[str, Any]) -> Dict[str, Any]:
+    # parse emotion
+    emo = raw["emotion"]["document"]["emotion"]
+
+    # keep full raw concepts
+    concepts_raw = raw.get("concepts", [])
+
+    # extract just the text for your existing pipeline
+    concepts = [c["text"] for c in concepts_raw]
+
+    # parse semantic roles
+    roles: List[Tuple[str, str, str]] = []
+    for r in raw.get("semantic_roles", []):
+        subj = r["subject"]["text"]
+        act = r["action"]["text"]
+        obj = r.get("object", {}).get("text", "")
+        roles.append((subj, act, obj))
+
+    return {
+        "text": txt,
+        **emo,
+        "concepts_raw": concepts_raw,
+        "concepts": concepts,
+        "semantic_roles": roles,
+        "error": None,
+    }
+
+
+def ping() -> None:
+    """
+    Cheapest authenticated NLU round trip, for health checks.
+
+    Watson lists the instance's custom models; nothing is analysed or
+    billed. The dummy and synthetic backends have nothing to reach.
+    """
+    if DEV_MODE:
+        return
+    NLU_CLIENT.ping()
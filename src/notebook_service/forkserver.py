@@ -0,0 +1,370 @@
+# src/notebook_service/forkserver.py
+"""
+Fork-server kernel launcher.
+
+A template process imports the scientific stack and ipykernel once, then
+forks a new kernel for each launch request, so kernel start skips the
+interpreter start-up and import cost. ``ForkServerProvisioner`` plugs it
+into jupyter_client; ``ForkServerKernelManager`` selects that provisioner
+for any kernel it starts.
+
+Run as ``python -m notebook_service.forkserver SOCKET [MODULE ...]`` to
+start a template process by hand.
+"""
+import asyncio
+import importlib
+import json
+import logging
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from importlib.metadata import EntryPoint
+
+import psutil
+from jupyter_client import AsyncKernelManager
+from jupyter_client.kernelspec import KernelSpecManager
+from jupyter_client.provisioning import (
+    KernelProvisionerFactory,
+    LocalProvisioner,
+)
+from traitlets import default
+
+log = logging.getLogger(__name__)
+
+# Fork-server settings (off by default: kernels are started with Popen)
+KERNEL_FORKSERVER = os.getenv("KERNEL_FORKSERVER", "false").lower() == "true"
+KERNEL_FORKSERVER_PRELOAD = [
+    m.strip()
+    for m in os.getenv(
+        "KERNEL_FORKSERVER_PRELOAD",
+        "pandas,networkx,sklearn,matplotlib,notebook_service",
+    ).split(",")
+    if m.strip()
+]
+FORKSERVER_STARTUP_TIMEOUT = 120
+PROVISIONER_NAME = "notebook-service-forkserver"
+
+
+# -- template process ------------------------------------------------------
+
+def _recv_line(conn: socket.socket) -> bytes:
+    buf = b""
+    while not buf.endswith(b"\n"):
+        chunk = conn.recv(65536)
+        if not chunk:
+            break
+        buf += chunk
+    return buf
+
+
+def _run_kernel(request: dict) -> None:
+    # forked child: become an ordinary, independent kernel process
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    os.setsid()
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    os.close(devnull)
+    os.environ.clear()
+    os.environ.update(request["env"])
+    os.chdir(request["cwd"])
+    sys.argv = ["ipykernel_launcher", *request["argv"]]
+
+    from ipykernel.kernelapp import launch_new_instance
+
+    launch_new_instance(argv=request["argv"])
+
+
+def serve(socket_path: str, preload: list[str]) -> None:
+    """
+    Import *preload*, then fork a kernel per request on *socket_path*.
+
+    A request is one JSON line ``{"argv", "env", "cwd"}`` (argv being the
+    ipykernel arguments); the reply is ``{"pid": ...}``. Exits when the
+    process that started it goes away.
+    """
+    # must be set before matplotlib reads its rcParams
+    os.environ.setdefault(
+        "MPLBACKEND", "module://matplotlib_inline.backend_inline"
+    )
+    for mod in preload:
+        try:
+            importlib.import_module(mod)
+        except Exception as e:
+            print(f"forkserver: cannot preload {mod}: {e}", file=sys.stderr)
+    import ipykernel.kernelapp  # noqa: F401
+
+    # forked kernels are reaped automatically
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    parent = os.getppid()
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    # the socket appears under its real name only once it accepts
+    listener.bind(socket_path + ".tmp")
+    listener.listen(16)
+    os.rename(socket_path + ".tmp", socket_path)
+    listener.settimeout(1.0)
+
+    while os.getppid() == parent:
+        try:
+            conn, _ = listener.accept()
+        except socket.timeout:
+            continue
+        with conn:
+            try:
+                request = json.loads(_recv_line(conn))
+            except ValueError:
+                continue
+            pid = os.fork()
+            if pid == 0:
+                listener.close()
+                conn.close()
+                try:
+                    _run_kernel(request)
+                    os._exit(0)
+                except BaseException:
+                    traceback.print_exc()
+                    os._exit(1)
+            conn.sendall(json.dumps({"pid": pid}).encode() + b"\n")
+
+
+# -- service side ----------------------------------------------------------
+
+class ForkServer:
+    """
+    Handle on a template process that forks preloaded kernels.
+    """
+
+    def __init__(self, preload: list[str]):
+        self.preload = preload
+        self._lock = threading.Lock()
+        self._proc: subprocess.Popen | None = None
+        self._dir = tempfile.mkdtemp(prefix="nbs-forkserver-")
+        self.socket_path = os.path.join(self._dir, "sock")
+        self._forks = 0
+        self._restarts = 0
+        self._fork_seconds_total = 0.0
+
+    def _ensure_running(self) -> None:
+        if self._proc is not None and self._proc.poll() is None:
+            return
+        if self._proc is not None:
+            self._restarts += 1
+            log.warning("Fork server exited, restarting")
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self._proc = subprocess.Popen(
+            [
+                sys.executable, "-m", "notebook_service.forkserver",
+                self.socket_path, *self.preload,
+            ],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + FORKSERVER_STARTUP_TIMEOUT
+        while not os.path.exists(self.socket_path):
+            if self._proc.poll() is not None:
+                raise RuntimeError("Fork server failed to start")
+            if time.monotonic() > deadline:
+                self._proc.kill()
+                raise RuntimeError("Fork server did not start in time")
+            time.sleep(0.05)
+
+    def start(self) -> None:
+        with self._lock:
+            self._ensure_running()
+
+    def spawn(self, argv: list[str], env: dict, cwd: str) -> int:
+        """
+        Fork a kernel running ``ipykernel_launcher *argv``; return its pid.
+        """
+        request = json.dumps({"argv": argv, "env": env, "cwd": cwd})
+        with self._lock:
+            self._ensure_running()
+            t0 = time.monotonic()
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+                conn.settimeout(FORKSERVER_STARTUP_TIMEOUT)
+                conn.connect(self.socket_path)
+                conn.sendall(request.encode() + b"\n")
+                reply = json.loads(_recv_line(conn))
+            self._forks += 1
+            self._fork_seconds_total += time.monotonic() - t0
+        return reply["pid"]
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._proc is not None and self._proc.poll() is None:
+                self._proc.terminate()
+                try:
+                    self._proc.wait(timeout=5)
+                except subprocess.TimeoutExpired:
+                    self._proc.kill()
+            self._proc = None
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "preload": self.preload,
+                "running": (
+                    self._proc is not None and self._proc.poll() is None
+                ),
+                "forks": self._forks,
+                "restarts": self._restarts,
+                "fork_seconds_total": round(self._fork_seconds_total, 6),
+            }
+
+
+class ForkedKernelProcess:
+    """
+    The Popen-like surface LocalProvisioner needs, for a forked kernel.
+
+    The kernel is a child of the template, not of this process, so it is
+    tracked through psutil; its exit status is not available.
+    """
+
+    stdin = stdout = stderr = None
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.returncode: int | None = None
+        try:
+            self._proc: psutil.Process | None = psutil.Process(pid)
+        except psutil.NoSuchProcess:
+            self._proc, self.returncode = None, 0
+
+    def poll(self) -> int | None:
+        if self.returncode is None:
+            try:
+                alive = self._proc.status() != psutil.STATUS_ZOMBIE
+            except psutil.NoSuchProcess:
+                alive = False
+            if not alive:
+                self.returncode = 0
+        return self.returncode
+
+    def wait(self, timeout: float | None = None) -> int:
+        if self.returncode is None:
+            try:
+                self._proc.wait(timeout)
+            except psutil.NoSuchProcess:
+                pass
+            self.returncode = 0
+        return self.returncode
+
+    def send_signal(self, signum: int) -> None:
+        try:
+            self._proc.send_signal(signum)
+        except psutil.NoSuchProcess:
+            raise ProcessLookupError(3, "No such process")
+
+    def kill(self) -> None:
+        self.send_signal(signal.SIGKILL)
+
+    def terminate(self) -> None:
+        self.send_signal(signal.SIGTERM)
+
+
+class ForkServerProvisioner(LocalProvisioner):
+    """
+    LocalProvisioner that forks ipykernel from the shared template process.
+
+    Commands that don't run ``-m ipykernel_launcher``, or any launch while
+    KERNEL_FORKSERVER is off, go through the usual Popen path.
+    """
+
+    async def launch_kernel(self, cmd: list[str], **kwargs):
+        server = get_fork_server()
+        if server is None or cmd[1:3] != ["-m", "ipykernel_launcher"]:
+            return await super().launch_kernel(cmd, **kwargs)
+
+        env = kwargs.get("env") or dict(os.environ)
+        cwd = str(kwargs.get("cwd") or os.getcwd())
+        # spawn() blocks on a lock, socket round trips and possibly a
+        # template restart; kernels launch on the server's event loop
+        pid = await asyncio.to_thread(server.spawn, cmd[3:], env, cwd)
+        self.process = ForkedKernelProcess(pid)
+        self.pid = pid
+        self.pgid = pid  # the kernel called setsid()
+        self.cwd = cwd
+        return self.connection_info
+
+
+class ForkServerKernelSpecManager(KernelSpecManager):
+    """
+    Kernel specs that name ForkServerProvisioner as their provisioner.
+    """
+
+    def get_kernel_spec(self, kernel_name):
+        spec = super().get_kernel_spec(kernel_name)
+        spec.metadata = {
+            **spec.metadata,
+            "kernel_provisioner": {"provisioner_name": PROVISIONER_NAME},
+        }
+        return spec
+
+
+class ForkServerKernelManager(AsyncKernelManager):
+    """
+    AsyncKernelManager whose kernels are forked from the template process.
+    """
+
+    @default("kernel_spec_manager")
+    def _kernel_spec_manager_default(self):
+        return ForkServerKernelSpecManager(data_dir=self.data_dir)
+
+
+def register_provisioner() -> None:
+    """
+    Make the provisioner known without relying on an installed package.
+    """
+    KernelProvisionerFactory.instance().provisioners.setdefault(
+        PROVISIONER_NAME,
+        EntryPoint(
+            name=PROVISIONER_NAME,
+            value="notebook_service.forkserver:ForkServerProvisioner",
+            group="jupyter_client.kernel_provisioners",
+        ),
+    )
+
+
+def kernel_manager_class() -> type[AsyncKernelManager]:
+    """
+    Kernel manager class for new kernels, honouring KERNEL_FORKSERVER.
+    """
+    if not KERNEL_FORKSERVER:
+        return AsyncKernelManager
+    register_provisioner()
+    return ForkServerKernelManager
+
+
+_server: ForkServer | None = None
+_server_lock = threading.Lock()
+
+
+def get_fork_server() -> ForkServer | None:
+    """
+    Return the process-wide fork server, or None when disabled.
+    """
+    global _server
+    if not KERNEL_FORKSERVER:
+        return None
+    with _server_lock:
+        if _server is None:
+            _server = ForkServer(KERNEL_FORKSERVER_PRELOAD)
+        return _server
+
+
+if __name__ == "__main__":
+    try:
+        serve(sys.argv[1], sys.argv[2:])
+    except KeyboardInterrupt:
+        pass
@@ -11,6 +11,14 @@ import numpy as np
 import pandas as pd
 from sklearn.preprocessing import MultiLabelBinarizer
 
+from notebook_service import metrics
+
+GRAPH_STAGE_SECONDS = metrics.Histogram(
+    "notebook_service_graph_stage_seconds",
+    "Time spent in each SemanticGraph construction stage",
+    labels=("stage",),
+)
+
 # Load per-document exclusions from JSON config
 CONFIG_DIR = Path(__file__).parent / "config"
 config_path = CONFIG_DIR / "dbpedia_exclusions.json"
@@ -198,30 +206,39 @@ class SemanticGraph:
         min_comm_size: int = 9,
         seed: int = 42,
     ):
+        stage = GRAPH_STAGE_SECONDS.labels
         # Raw co-occurrence matrix
-        self.M, self.C, self.edges = compute_cooccurrence(
-            df_concepts,
-            threshold_count
-        )
-        self.feat_names = sorted(df_concepts['concept'].unique())
+        with stage("cooccurrence").time():
+            self.M, self.C, self.edges = compute_cooccurrence(
+                df_concepts,
+                threshold_count
+            )
+            self.feat_names = sorted(df_concepts['concept'].unique())
 
         # Build undirected backbone by percentile only
-        self.G_und = threshold_undirected_graph(
-            self.C,
-            self.feat_names,
-            percentile=percentile,
-        )
+        with stage("threshold").time():
+            self.G_und = threshold_undirected_graph(
+                self.C,
+                self.feat_names,
+                percentile=percentile,
+            )
 
         # Detect and filter communities
-        (
-            self.G,
-            self.keep,
-            self.partition,
-            self.sizes
-        ) = detect_and_filter_communities(self.G_und, min_comm_size, seed)
+        with stage("communities").time():
+            (
+                self.G,
+                self.keep,
+                self.partition,
+                self.sizes
+            ) = detect_and_filter_communities(
+                self.G_und, min_comm_size, seed
+            )
 
         # Compute centrality metrics on the filtered graph
-        self.metrics = compute_all_metrics(self.G)
+        with stage("centrality").time():
+            self.metrics = compute_all_metrics(self.G)
+        # kernels are separate processes; hand the samples to /metrics
+        metrics.flush()
 
         # Store parameters
         self.percentile = percentile
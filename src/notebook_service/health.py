@@ -0,0 +1,183 @@
+# src/notebook_service/health.py
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import wait as wait_futures
+from typing import Any, Callable
+
+log = logging.getLogger(__name__)
+
+# Seconds between background health probes
+HEALTH_PROBE_INTERVAL = float(os.getenv("HEALTH_PROBE_INTERVAL", "15"))
+# Seconds a single check may take before it counts as failed
+HEALTH_CHECK_TIMEOUT = float(os.getenv("HEALTH_CHECK_TIMEOUT", "5"))
+
+Check = Callable[[], dict[str, Any]]
+
+
+class HealthProber:
+    """
+    Run *checks* in a background thread and cache the results.
+
+    A check returns a dict with an ``"ok"`` bool plus whatever details it
+    wants to report; raising, or taking longer than *check_timeout*,
+    counts as not ok. Probes read the cached snapshot, so /health and
+    /ready cost the same however expensive the checks are.
+
+    Checks run concurrently on a small persistent executor. A check
+    still stuck in an earlier probe is reported as not ok rather than
+    started again, so a hung dependency holds at most one thread.
+    """
+
+    def __init__(
+        self,
+        checks: dict[str, Check],
+        interval: float = HEALTH_PROBE_INTERVAL,
+        check_timeout: float = HEALTH_CHECK_TIMEOUT,
+    ):
+        self.checks = checks
+        self.interval = interval
+        self.check_timeout = check_timeout
+        self._snapshot: dict | None = None
+        self._lock = threading.Lock()
+        self._probe_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._executor: ThreadPoolExecutor | None = None
+        self._pending: dict[str, Future] = {}
+
+        # counters reported by stats()
+        self._probes = 0
+        self._failed_checks = 0
+        self._last_duration = 0.0
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._loop, name="health-prober", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join(timeout=self.check_timeout + 1)
+        with self._probe_lock:
+            executor, self._executor = self._executor, None
+            self._pending.clear()
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            self.probe()
+            self._stop.wait(self.interval)
+
+    @staticmethod
+    def _run_check(check: Check) -> tuple[dict[str, Any], float]:
+        started = time.monotonic()
+        try:
+            outcome = dict(check())
+        except Exception as e:
+            outcome = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        return outcome, time.monotonic() - started
+
+    def probe(self) -> dict:
+        """
+        Run every check now and cache the snapshot.
+        """
+        with self._probe_lock:
+            t0 = time.monotonic()
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=max(1, len(self.checks)),
+                    thread_name_prefix="health-check",
+                )
+            results: dict[str, dict] = {}
+            for name, check in self.checks.items():
+                previous = self._pending.get(name)
+                if previous is not None and not previous.done():
+                    results[name] = {
+                        "ok": False,
+                        "error": "still running since an earlier probe",
+                    }
+                    continue
+                self._pending[name] = self._executor.submit(
+                    self._run_check, check
+                )
+            running = {
+                name: fut for name, fut in self._pending.items()
+                if name not in results
+            }
+            wait_futures(running.values(), timeout=self.check_timeout)
+            for name, fut in running.items():
+                if fut.done():
+                    result, seconds = fut.result()
+                else:
+                    result = {"ok": False, "error": "timed out"}
+                    seconds = time.monotonic() - t0
+                result["ok"] = bool(result.get("ok"))
+                result["seconds"] = round(seconds, 6)
+                results[name] = result
+            results = {name: results[name] for name in self.checks}
+            snapshot = {
+                "ready": all(r["ok"] for r in results.values()),
+                "checked_at": time.time(),
+                "checks": results,
+            }
+            with self._lock:
+                self._snapshot = snapshot
+                self._probes += 1
+                self._failed_checks += sum(
+                    not r["ok"] for r in results.values()
+                )
+                self._last_duration = time.monotonic() - t0
+            for name, r in results.items():
+                if not r["ok"]:
+                    log.warning("Health check %s failed: %s", name, r)
+            return snapshot
+
+    def latest(self) -> dict | None:
+        """
+        The cached results of the last probe, or None before the first.
+        """
+        with self._lock:
+            return self._snapshot
+
+    def snapshot(self) -> dict:
+        """
+        The latest probe results; probes once if none has finished yet.
+        """
+        snapshot = self.latest()
+        return snapshot if snapshot is not None else self.probe()
+
+    def stale(self) -> bool:
+        """
+        True when the background loop has stopped producing results.
+        """
+        with self._lock:
+            if self._thread is None or self._snapshot is None:
+                return False
+            age = time.time() - self._snapshot["checked_at"]
+        return age > 3 * self.interval + self.check_timeout * len(
+            self.checks
+        )
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "interval_seconds": self.interval,
+                "probes": self._probes,
+                "failed_checks": self._failed_checks,
+                "last_probe_seconds": round(self._last_duration, 6),
+                "ready": (
+                    self._snapshot["ready"] if self._snapshot else None
+                ),
+            }
@@ -0,0 +1,483 @@
+# src/notebook_service/incremental.py
+import ast
+import builtins
+import hashlib
+import json
+import os
+import threading
+from collections import Counter
+from pathlib import Path
+
+import nbformat
+
+from notebook_service.notebook_cache import read_notebook
+from notebook_service.result_cache import declared_inputs, file_digest
+from notebook_service.runner import (
+    execute_notebook,
+    output_records,
+    resolve_notebook_path,
+)
+
+# Per-notebook state (cell hashes, outputs) and kernel checkpoints
+DEFAULT_INCREMENTAL_DIR = (
+    Path(__file__).resolve().parents[2]
+    / "data" / "processed" / ".cache" / "incremental"
+)
+INCREMENTAL_DIR = Path(
+    os.getenv("INCREMENTAL_DIR", DEFAULT_INCREMENTAL_DIR)
+)
+
+BUILTINS = set(dir(builtins)) | {"get_ipython", "display", "In", "Out"}
+
+# Kernel-side snippets. Modules, functions, classes and instances of
+# classes defined in the notebook itself can't be restored from a pickle
+# in a fresh kernel, so they are never checkpointed; the cells that
+# define them are re-run instead (they are usually cheap imports/defs).
+_SAVE_CHECKPOINT = """\
+import pickle as _nbs_pickle, types as _nbs_types
+try:
+    with open({path!r}, "rb") as _nbs_f:
+        _nbs_ck = _nbs_pickle.load(_nbs_f)
+except Exception:
+    _nbs_ck = {{}}
+for _nbs_name in {names!r}:
+    # a name that can't be saved now must not keep an older value
+    _nbs_val = globals().get(_nbs_name, _nbs_ck)
+    if _nbs_val is _nbs_ck:
+        _nbs_ck.pop(_nbs_name, None)
+        continue
+    if isinstance(_nbs_val, (_nbs_types.ModuleType, _nbs_types.FunctionType,
+                             type)):
+        _nbs_ck.pop(_nbs_name, None)
+        continue
+    if type(_nbs_val).__module__ == "__main__":
+        _nbs_ck.pop(_nbs_name, None)
+        continue
+    try:
+        _nbs_pickle.dumps(_nbs_val)
+    except Exception:
+        _nbs_ck.pop(_nbs_name, None)
+        continue
+    _nbs_ck[_nbs_name] = _nbs_val
+with open({path!r} + ".tmp", "wb") as _nbs_f:
+    _nbs_pickle.dump(_nbs_ck, _nbs_f)
+import os as _nbs_os
+_nbs_os.replace({path!r} + ".tmp", {path!r})
+print(sorted(_nbs_ck))
+del _nbs_pickle, _nbs_types, _nbs_ck, _nbs_f, _nbs_os
+"""
+
+_RESTORE_CHECKPOINT = """\
+import pickle as _nbs_pickle
+with open({path!r}, "rb") as _nbs_f:
+    _nbs_ck = _nbs_pickle.load(_nbs_f)
+globals().update({{k: _nbs_ck[k] for k in {names!r}}})
+del _nbs_pickle, _nbs_f, _nbs_ck
+"""
+
+
+def _strip_magics(source: str) -> str | None:
+    """
+    Blank out IPython line magics / shell escapes; None for cell magics.
+    """
+    if source.lstrip().startswith("%%"):
+        return None
+    lines = []
+    for line in source.splitlines():
+        stripped = line.lstrip()
+        if stripped.startswith(("%", "!")) or stripped.endswith("?"):
+            indent = line[: len(line) - len(stripped)]
+            lines.append(f"{indent}pass")
+        else:
+            lines.append(line)
+    return "\n".join(lines)
+
+
+class _NameCollector(ast.NodeVisitor):
+    """
+    Collect the global names a block of code reads and binds.
+
+    Mutating a name through ``x.attr = ...`` or ``x[k] = ...`` counts as
+    both reading and binding it.
+    """
+
+    def __init__(self):
+        self.defines: set[str] = set()
+        self.uses: set[str] = set()
+
+    def _use(self, name: str) -> None:
+        if name not in self.defines:
+            self.uses.add(name)
+
+    def visit_Name(self, node):
+        if isinstance(node.ctx, ast.Load):
+            self._use(node.id)
+        else:
+            self.defines.add(node.id)
+
+    def visit_Assign(self, node):
+        self.visit(node.value)
+        for target in node.targets:
+            self.visit(target)
+
+    def visit_AnnAssign(self, node):
+        if node.value is not None:
+            self.visit(node.value)
+        self.visit(node.target)
+
+    def visit_AugAssign(self, node):
+        self.visit(node.value)
+        if isinstance(node.target, ast.Name):
+            self._use(node.target.id)
+        self.visit(node.target)
+
+    def _visit_mutation(self, node):
+        self.generic_visit(node)
+        if isinstance(node.ctx, (ast.Store, ast.Del)):
+            base = node.value
+            while isinstance(base, (ast.Attribute, ast.Subscript)):
+                base = base.value
+            if isinstance(base, ast.Name):
+                self.defines.add(base.id)
+
+    visit_Attribute = _visit_mutation
+    visit_Subscript = _visit_mutation
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            self.defines.add(alias.asname or alias.name.split(".")[0])
+
+    def visit_ImportFrom(self, node):
+        for alias in node.names:
+            if alias.name != "*":
+                self.defines.add(alias.asname or alias.name)
+
+    def _visit_scope(self, node, body, params=()):
+        # names a nested scope reads but doesn't bind are globals it needs
+        inner = _NameCollector()
+        inner.defines.update(params)
+        for child in body:
+            inner.visit(child)
+        for name in inner.uses:
+            self._use(name)
+
+    def visit_FunctionDef(self, node):
+        for deco in node.decorator_list:
+            self.visit(deco)
+        self.visit(node.args)
+        args = node.args
+        params = [
+            a.arg
+            for a in args.posonlyargs + args.args + args.kwonlyargs
+        ]
+        params += [a.arg for a in (args.vararg, args.kwarg) if a]
+        self._visit_scope(node, node.body, params)
+        self.defines.add(node.name)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_arguments(self, node):
+        for default in node.defaults + node.kw_defaults:
+            if default is not None:
+                self.visit(default)
+
+    def visit_Lambda(self, node):
+        self.visit(node.args)
+        params = [a.arg for a in node.args.args]
+        self._visit_scope(node, [node.body], params)
+
+    def visit_ClassDef(self, node):
+        for expr in node.decorator_list + node.bases:
+            self.visit(expr)
+        self._visit_scope(node, node.body)
+        self.defines.add(node.name)
+
+    def _visit_comprehension(self, node):
+        inner = _NameCollector()
+        for gen in node.generators:
+            inner.visit(gen.iter)
+            inner.visit(gen.target)
+            for cond in gen.ifs:
+                inner.visit(cond)
+        for field in ("elt", "key", "value"):
+            if hasattr(node, field):
+                inner.visit(getattr(node, field))
+        for name in inner.uses:
+            self._use(name)
+
+    visit_ListComp = _visit_comprehension
+    visit_SetComp = _visit_comprehension
+    visit_GeneratorExp = _visit_comprehension
+    visit_DictComp = _visit_comprehension
+
+
+def analyze_cell(source: str) -> tuple[set[str], set[str]] | None:
+    """
+    Return (defines, uses) for a code cell, or None if it can't be parsed.
+
+    Builtins are left out of *uses*.
+    """
+    code = _strip_magics(source)
+    if code is None:
+        return None
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+    collector = _NameCollector()
+    collector.visit(tree)
+    return collector.defines, collector.uses - BUILTINS
+
+
+class CellGraph:
+    """
+    Variable dataflow DAG over a notebook's code cells.
+
+    ``parents[i]`` maps each name cell *i* reads to the closest earlier
+    cell that binds it. Cells that can't be parsed are ``opaque`` and are
+    always re-executed.
+    """
+
+    def __init__(self, nb):
+        self.code_cells = [
+            i for i, c in enumerate(nb.cells) if c.cell_type == "code"
+        ]
+        self.sources = {i: nb.cells[i].source for i in self.code_cells}
+        self.defines: dict[int, set[str]] = {}
+        self.parents: dict[int, dict[str, int]] = {}
+        self.opaque: set[int] = set()
+
+        last_def: dict[str, int] = {}
+        for i in self.code_cells:
+            analysis = analyze_cell(self.sources[i])
+            if analysis is None:
+                self.opaque.add(i)
+                analysis = (set(), set())
+            defines, uses = analysis
+            self.parents[i] = {
+                name: last_def[name] for name in uses if name in last_def
+            }
+            self.defines[i] = defines
+            for name in defines:
+                last_def[name] = i
+
+    def children(self, i: int) -> set[int]:
+        return {
+            j for j, parents in self.parents.items()
+            if i in parents.values()
+        }
+
+    def downstream(self, cells: set[int]) -> set[int]:
+        """
+        *cells* plus every cell that transitively depends on them.
+        """
+        seen = set(cells)
+        frontier = list(cells)
+        while frontier:
+            for child in self.children(frontier.pop()):
+                if child not in seen:
+                    seen.add(child)
+                    frontier.append(child)
+        return seen
+
+
+def cell_hash(source: str) -> str:
+    return hashlib.sha256(source.encode()).hexdigest()
+
+
+def _state_dir(nb_path: Path) -> Path:
+    digest = hashlib.sha256(str(nb_path).encode()).hexdigest()[:16]
+    return INCREMENTAL_DIR / f"{nb_path.stem}-{digest}"
+
+
+def _load_state(state_file: Path) -> dict:
+    try:
+        with open(state_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _save_state(state_file: Path, state: dict) -> None:
+    tmp = state_file.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, state_file)
+
+
+def plan_run(
+    graph: CellGraph,
+    previous: dict,
+    changed_inputs: set[str],
+) -> tuple[set[int], dict[str, int]]:
+    """
+    Decide which cells to execute and which names to restore.
+
+    Returns (cells_to_run, {name: producing_cell}) where every restored
+    name is available in the previous checkpoint.
+
+    The checkpoint holds each name's value at the end of the run, so a
+    name bound by more than one cell is never restored: a re-run cell
+    above a later rebinding would see the later value. Its producer is
+    re-run instead.
+    """
+    old_hashes = previous.get("hashes", {})
+    checkpointed = set(previous.get("checkpointed", []))
+    definers = Counter(
+        name for names in graph.defines.values() for name in names
+    )
+
+    changed = set(graph.opaque)
+    for i in graph.code_cells:
+        source = graph.sources[i]
+        if old_hashes.get(str(i)) != cell_hash(source):
+            changed.add(i)
+        elif any(name in source for name in changed_inputs):
+            # a cell mentioning a modified input file must re-read it
+            changed.add(i)
+
+    to_run = graph.downstream(changed)
+    restore: dict[str, int] = {}
+
+    # pull every upstream value the re-run cells need, re-running the
+    # producer when its value wasn't checkpointed
+    pending = sorted(to_run)
+    while pending:
+        i = pending.pop()
+        for name, producer in graph.parents[i].items():
+            if producer in to_run:
+                continue
+            if name in checkpointed and definers[name] == 1:
+                restore[name] = producer
+            else:
+                to_run.add(producer)
+                pending.append(producer)
+
+    # a name produced by a re-run cell no longer needs restoring
+    restore = {n: p for n, p in restore.items() if p not in to_run}
+    return to_run, restore
+
+
+_locks: dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+
+def _notebook_lock(nb_path: Path) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(str(nb_path), threading.Lock())
+
+
+def run_incremental(
+    path: str,
+    timeout: float | None = None,
+    cancel_event: threading.Event | None = None,
+) -> dict:
+    """
+    Re-execute only the cells affected since the notebook's last run.
+
+    A cell is re-run when its source changed, when it mentions a
+    declared input file that changed, or when a cell it reads from is
+    re-run. Values it needs from untouched cells are restored from the
+    kernel checkpoint saved by the previous run; outputs of untouched
+    cells are replayed from that run.
+
+    The checkpoint holds each name's value at the end of the previous
+    run, and in-place mutation through method calls (``lst.append``) is
+    not tracked, so cells should rebind what they change.
+
+    Returns ``{"outputs": [...], "executed_cells": [...]}`` with the same
+    output records as ``run_notebook``. Cell numbers in both are 1-based
+    positions in the notebook, markdown cells included.
+    """
+    nb_path = resolve_notebook_path(path)
+
+    with _notebook_lock(nb_path):
+        state_dir = _state_dir(nb_path)
+        state_dir.mkdir(parents=True, exist_ok=True)
+        state_file = state_dir / "state.json"
+        checkpoint = state_dir / "checkpoint.pkl"
+
+        nb = read_notebook(nb_path, strip=True)
+        graph = CellGraph(nb)
+
+        inputs = {
+            rel: file_digest((nb_path.parent / rel).resolve())
+            for rel in declared_inputs(nb)
+        }
+        previous = _load_state(state_file)
+        if not checkpoint.exists():
+            previous = {}
+        old_inputs = previous.get("inputs", {})
+        changed_inputs = {
+            Path(rel).name for rel, digest in inputs.items()
+            if old_inputs.get(rel) != digest
+        }
+
+        to_run, restore = plan_run(graph, previous, changed_inputs)
+        run_order = sorted(to_run)
+        old_outputs = previous.get("outputs", {})
+        if not run_order:
+            # nothing changed: replay the last run without a kernel
+            outputs = [
+                o for i in graph.code_cells
+                for o in old_outputs.get(str(i), [])
+            ]
+            return {"outputs": outputs, "executed_cells": []}
+
+        # sub-notebook: [restore] + cells to run + checkpoint
+        sub = nbformat.v4.new_notebook(metadata=nb.metadata)
+        if restore:
+            sub.cells.append(nbformat.v4.new_code_cell(
+                _RESTORE_CHECKPOINT.format(
+                    path=str(checkpoint), names=sorted(restore)
+                )
+            ))
+        offset = len(sub.cells)
+        sub.cells.extend(
+            nbformat.v4.new_code_cell(graph.sources[i]) for i in run_order
+        )
+        all_names = sorted(set().union(*graph.defines.values()))
+        sub.cells.append(nbformat.v4.new_code_cell(
+            _SAVE_CHECKPOINT.format(path=str(checkpoint), names=all_names)
+        ))
+
+        executed = execute_notebook(sub, nb_path, timeout, cancel_event)
+
+        new_outputs = {
+            i: [
+                record
+                for out in executed.cells[offset + pos].get("outputs", [])
+                for record in output_records(i + 1, out)
+            ]
+            for pos, i in enumerate(run_order)
+        }
+        saved = "".join(
+            out.get("text", "")
+            for out in executed.cells[-1].get("outputs", [])
+            if out.get("name") == "stdout"
+        ).strip().splitlines()
+        checkpointed = ast.literal_eval(saved[-1]) if saved else []
+
+        outputs: list[dict] = []
+        for i in graph.code_cells:
+            if i in new_outputs:
+                outputs.extend(new_outputs[i])
+            else:
+                outputs.extend(old_outputs.get(str(i), []))
+
+        _save_state(state_file, {
+            "hashes": {
+                str(i): cell_hash(graph.sources[i]) for i in graph.code_cells
+            },
+            "inputs": inputs,
+            "checkpointed": checkpointed,
+            "outputs": {
+                str(i): [o for o in outputs if o["cell"] == i + 1]
+                for i in graph.code_cells
+            },
+        })
+
+    return {
+        "outputs": outputs,
+        "executed_cells": [i + 1 for i in run_order],
+    }
@@ -0,0 +1,187 @@
+# src/notebook_service/jobs.py
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+
+from notebook_service.runner import ExecutionCancelled, ExecutionTimeout
+
+# Executor settings
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "2"))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "16"))
+JOB_TIMEOUT = int(os.getenv("JOB_TIMEOUT", "600"))
+JOB_RETENTION = int(os.getenv("JOB_RETENTION", "3600"))
+
+FINISHED = {"succeeded", "failed", "cancelled", "timeout"}
+
+
+class JobQueueFull(Exception):
+    """Raised when the executor and its wait queue are both full."""
+
+
+class Job:
+    """
+    One submitted notebook run and its lifecycle.
+    """
+
+    def __init__(self, notebook: str, fmt: str, timeout: float):
+        self.id = uuid.uuid4().hex
+        self.notebook = notebook
+        self.fmt = fmt
+        self.timeout = timeout
+        self.status = "queued"
+        self.submitted_at = time.time()
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+        self.error: str | None = None
+        self.result: dict | None = None
+        self.cancel_event = threading.Event()
+        self.future: Future | None = None
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "notebook": self.notebook,
+            "fmt": self.fmt,
+            "status": self.status,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+            "result": self.result,
+        }
+
+
+class JobManager:
+    """
+    Run notebooks in a bounded thread pool and track them by id.
+
+    *run* is called as ``run(notebook, fmt, timeout=..., cancel_event=...)``
+    and returns the job's result dict. At most *concurrency* jobs run at
+    once and at most *queue_size* more wait; beyond that, submit() raises
+    JobQueueFull. Finished jobs are kept for *retention* seconds.
+    """
+
+    def __init__(
+        self,
+        run: Callable[..., dict],
+        concurrency: int = JOB_CONCURRENCY,
+        queue_size: int = JOB_QUEUE_SIZE,
+        timeout: float = JOB_TIMEOUT,
+        retention: float = JOB_RETENTION,
+    ):
+        self.run = run
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.retention = retention
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix="job"
+        )
+        self._lock = threading.Lock()
+        self._jobs: dict[str, Job] = {}
+        self._pending = 0
+
+    def submit(
+        self,
+        notebook: str,
+        fmt: str,
+        timeout: float | None = None,
+    ) -> Job:
+        """
+        Queue *notebook* for execution and return its Job right away.
+
+        *timeout* may shorten, but never extend, the configured limit.
+        """
+        limit = self.timeout if timeout is None else min(timeout, self.timeout)
+        job = Job(notebook, fmt, limit)
+        with self._lock:
+            self._purge()
+            if self._pending >= self.concurrency + self.queue_size:
+                raise JobQueueFull("Job queue is full")
+            self._pending += 1
+            self._jobs[job.id] = job
+        job.future = self._executor.submit(self._execute, job)
+        return job
+
+    def _execute(self, job: Job) -> None:
+        with self._lock:
+            if job.status != "queued":
+                # cancelled while waiting in the queue
+                self._pending -= 1
+                return
+            job.status = "running"
+            job.started_at = time.time()
+
+        status, result, error = "succeeded", None, None
+        try:
+            result = self.run(
+                job.notebook,
+                job.fmt,
+                timeout=job.timeout,
+                cancel_event=job.cancel_event,
+            )
+        except ExecutionCancelled:
+            status = "cancelled"
+        except ExecutionTimeout as e:
+            status, error = "timeout", str(e) or "Execution timed out"
+        except Exception as e:
+            status, error = "failed", f"{type(e).__name__}: {e}"
+
+        with self._lock:
+            job.status = status
+            job.result = result
+            job.error = error
+            job.finished_at = time.time()
+            self._pending -= 1
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Job | None:
+        """
+        Cancel a queued job now; ask a running job to stop.
+
+        A running job moves to "cancelled" once the runner notices.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in FINISHED:
+                return job
+            job.cancel_event.set()
+            if job.status == "queued":
+                job.status = "cancelled"
+                job.finished_at = time.time()
+                if job.future is not None and job.future.cancel():
+                    self._pending -= 1
+            return job
+
+    def _purge(self) -> None:
+        cutoff = time.time() - self.retention
+        for job_id in [
+            j.id for j in self._jobs.values()
+            if j.finished_at is not None and j.finished_at < cutoff
+        ]:
+            del self._jobs[job_id]
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            counts: dict[str, int] = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return {
+                "concurrency": self.concurrency,
+                "queue_size": self.queue_size,
+                "pending": self._pending,
+                "jobs": counts,
+            }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            for job in self._jobs.values():
+                job.cancel_event.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,316 @@
+# src/notebook_service/kernel_pool.py
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import psutil
+from jupyter_client import BlockingKernelClient
+from jupyter_core.utils import run_sync
+
+from notebook_service.forkserver import kernel_manager_class
+from notebook_service.metrics import Histogram
+
+log = logging.getLogger(__name__)
+
+# Pool settings (KERNEL_POOL_SIZE=0 keeps the one-kernel-per-run behaviour)
+KERNEL_POOL_SIZE = int(os.getenv("KERNEL_POOL_SIZE", "0"))
+KERNEL_POOL_MAX_RUNS = int(os.getenv("KERNEL_POOL_MAX_RUNS", "50"))
+KERNEL_POOL_MAX_RSS_MB = int(os.getenv("KERNEL_POOL_MAX_RSS_MB", "400"))
+KERNEL_POOL_PRELOAD = [
+    m.strip()
+    for m in os.getenv(
+        "KERNEL_POOL_PRELOAD", "pandas,networkx,sklearn,matplotlib"
+    ).split(",")
+    if m.strip()
+]
+KERNEL_STARTUP_TIMEOUT = 60
+
+KERNEL_START_SECONDS = Histogram(
+    "notebook_service_kernel_start_seconds",
+    "Time to launch a kernel, for the pool or for a single run",
+    labels=("kind",),
+)
+
+
+# How often acquire() checks its caller's cancel event while waiting
+_CANCEL_POLL_SECONDS = 0.2
+
+
+class LeaseTimeout(TimeoutError):
+    """Raised when no kernel is free before the caller's deadline."""
+
+
+class LeaseCancelled(Exception):
+    """Raised when the caller gives up while waiting for a kernel."""
+
+
+class PooledKernel:
+    """
+    A running kernel owned by the pool, plus its bookkeeping.
+    """
+
+    def __init__(self, kernel_name: str, preload: list[str]):
+        self.km = kernel_manager_class()(kernel_name=kernel_name)
+        self.runs = 0
+        self.preload = preload
+
+    def start(self) -> None:
+        with KERNEL_START_SECONDS.labels("pooled").time():
+            run_sync(self.km.start_kernel)()
+        # import the heavy modules once so leases start warm
+        code = "\n".join(f"import {mod}" for mod in self.preload)
+        if code:
+            self.execute(code)
+
+    def execute(self, code: str) -> None:
+        """
+        Run *code* silently in the kernel; raise if it errors.
+        """
+        # parent=km so liveness comes from the process, not the heartbeat
+        kc = BlockingKernelClient(parent=self.km)
+        kc.load_connection_info(self.km.get_connection_info())
+        kc.start_channels()
+        try:
+            kc.wait_for_ready(timeout=KERNEL_STARTUP_TIMEOUT)
+            reply = kc.execute_interactive(
+                code,
+                store_history=False,
+                timeout=KERNEL_STARTUP_TIMEOUT,
+                output_hook=lambda msg: None,
+            )
+        finally:
+            kc.stop_channels()
+        if reply["content"].get("status") != "ok":
+            raise RuntimeError(
+                f"Kernel setup failed: {reply['content'].get('evalue')}"
+            )
+
+    def chdir(self, cwd: str) -> None:
+        self.execute(f"import os as _os; _os.chdir({cwd!r}); del _os")
+
+    def reset(self) -> None:
+        # %reset drops user names; preloaded modules stay in sys.modules
+        self.execute("get_ipython().run_line_magic('reset', '-f')")
+
+    def rss_bytes(self) -> int:
+        pid = getattr(self.km.provisioner, "pid", None)
+        if pid is None:
+            return 0
+        try:
+            return psutil.Process(pid).memory_info().rss
+        except psutil.Error:
+            return 0
+
+    def shutdown(self) -> None:
+        try:
+            run_sync(self.km.shutdown_kernel)(now=True)
+        except Exception as e:
+            log.warning("Kernel shutdown failed: %s", e)
+
+
+class KernelPool:
+    """
+    Fixed-size pool of pre-started, pre-imported kernels.
+
+    Callers lease a kernel manager with ``with pool.lease(cwd) as km:``;
+    the kernel's namespace is reset on return, and the kernel is
+    replaced after *max_runs* leases, once its RSS passes
+    *max_rss_mb*, or when the run raised.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        kernel_name: str = "python3",
+        max_runs: int = KERNEL_POOL_MAX_RUNS,
+        max_rss_mb: int = KERNEL_POOL_MAX_RSS_MB,
+        preload: list[str] | None = None,
+    ):
+        self.size = size
+        self.kernel_name = kernel_name
+        self.max_runs = max_runs
+        self.max_rss_mb = max_rss_mb
+        self.preload = KERNEL_POOL_PRELOAD if preload is None else preload
+
+        self._cond = threading.Condition()
+        self._idle: list[PooledKernel] = []
+        self._started = False
+        self._closed = False
+
+        # counters reported by stats()
+        self._leased = 0
+        self._leases = 0
+        self._recycled = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def start(self, wait: bool = True) -> None:
+        """
+        Launch *size* kernels; block until they are idle if *wait*.
+        """
+        with self._cond:
+            if self._started:
+                return
+            self._started = True
+        threads = [self._spawn() for _ in range(self.size)]
+        if wait:
+            for t in threads:
+                t.join()
+
+    def _spawn(self) -> threading.Thread:
+        t = threading.Thread(target=self._add_kernel, daemon=True)
+        t.start()
+        return t
+
+    def _add_kernel(self) -> None:
+        # keep retrying so a transient failure can't shrink the pool
+        delay = 1.0
+        while not self._closed:
+            kernel = PooledKernel(self.kernel_name, self.preload)
+            try:
+                kernel.start()
+            except Exception as e:
+                log.error(
+                    "Could not start pooled kernel (retry in %.0fs): %s",
+                    delay, e,
+                )
+                kernel.shutdown()
+                time.sleep(delay)
+                delay = min(delay * 2, 30.0)
+                continue
+            with self._cond:
+                if not self._closed:
+                    self._idle.append(kernel)
+                    self._cond.notify()
+                    return
+            kernel.shutdown()
+
+    @contextmanager
+    def lease(self, cwd: str):
+        """
+        Yield an idle kernel manager whose working directory is *cwd*.
+        """
+        kernel = self.acquire(cwd)
+        healthy = False
+        try:
+            yield kernel.km
+            healthy = True
+        finally:
+            self.release(kernel, healthy)
+
+    def acquire(
+        self,
+        cwd: str,
+        deadline: float | None = None,
+        cancel_event: threading.Event | None = None,
+    ) -> PooledKernel:
+        """
+        Take an idle kernel (blocking until one is free) and chdir it.
+
+        Waiting stops with LeaseTimeout once time.monotonic() passes
+        *deadline*, and with LeaseCancelled once *cancel_event* is set.
+        Every acquire() must be paired with a release(); lease() does
+        both for synchronous callers.
+        """
+        self.start(wait=False)
+        t0 = time.monotonic()
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Kernel pool is shut down")
+                if cancel_event is not None and cancel_event.is_set():
+                    raise LeaseCancelled(
+                        "Cancelled while waiting for a kernel"
+                    )
+                if self._idle:
+                    break
+                wait = None
+                if deadline is not None:
+                    wait = deadline - time.monotonic()
+                    if wait <= 0:
+                        raise LeaseTimeout(
+                            "Deadline passed while waiting for a kernel"
+                        )
+                if cancel_event is not None:
+                    wait = min(wait or _CANCEL_POLL_SECONDS,
+                               _CANCEL_POLL_SECONDS)
+                self._cond.wait(wait)
+            kernel = self._idle.pop()
+            self._leased += 1
+            waited = time.monotonic() - t0
+            self._leases += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+
+        try:
+            kernel.chdir(cwd)
+        except BaseException:
+            self.release(kernel, healthy=False)
+            raise
+        return kernel
+
+    def release(self, kernel: PooledKernel, healthy: bool) -> None:
+        kernel.runs += 1
+        recycle = (
+            not healthy
+            or kernel.runs >= self.max_runs
+            or kernel.rss_bytes() > self.max_rss_mb * 1024 * 1024
+        )
+        if not recycle:
+            try:
+                kernel.reset()
+            except Exception as e:
+                log.warning("Kernel reset failed, recycling: %s", e)
+                recycle = True
+
+        with self._cond:
+            self._leased -= 1
+            if recycle:
+                self._recycled += 1
+            elif not self._closed:
+                self._idle.append(kernel)
+                self._cond.notify()
+                return
+
+        kernel.shutdown()
+        if recycle and not self._closed:
+            self._spawn()
+
+    def shutdown(self) -> None:
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for kernel in idle:
+            kernel.shutdown()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "size": self.size,
+                "idle": len(self._idle),
+                "leased": self._leased,
+                "leases": self._leases,
+                "recycled": self._recycled,
+                "lease_wait_seconds_total": round(self._wait_total, 6),
+                "lease_wait_seconds_max": round(self._wait_max, 6),
+            }
+
+
+_pool: KernelPool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> KernelPool | None:
+    """
+    Return the process-wide pool, or None when pooling is disabled.
+    """
+    global _pool
+    if KERNEL_POOL_SIZE <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = KernelPool(KERNEL_POOL_SIZE)
+        return _pool
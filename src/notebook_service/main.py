@@ -1,25 +1,81 @@
 # src/notebook_service/main.py
 import argparse
 import asyncio
+import hashlib
 import os
+import re
 import sys
+import threading
 import time
+import weakref
+from contextlib import asynccontextmanager
 from enum import Enum
 from mimetypes import guess_type
 from pathlib import Path
 
+import anyio.to_thread
 import nbformat
 from fastapi import FastAPI, HTTPException
 from fastapi import Path as PathParam
-from fastapi import Query, Security
-from fastapi.responses import FileResponse, HTMLResponse
+from fastapi import Query, Request, Security
+from fastapi.responses import (
+    FileResponse,
+    HTMLResponse,
+    ORJSONResponse,
+    PlainTextResponse,
+    Response,
+    StreamingResponse,
+)
 from fastapi.security.api_key import APIKeyHeader
 from nbclient import NotebookClient
 from starlette.concurrency import run_in_threadpool
 
-from notebook_service import __version__
-from notebook_service.runner import DEFAULT_NOTEBOOK_DIR, run_notebook
-from notebook_service.schemas import NotebookOutputs
+from notebook_service import __version__, metrics
+from notebook_service.admission import (
+    RUN_MAX_CONCURRENCY,
+    RUN_MAX_QUEUE,
+    AdmissionController,
+    AdmissionRejected,
+)
+from notebook_service.artifacts import get_artifact_store
+from notebook_service.compiled import (
+    UnsupportedNotebook,
+    get_compiled_engine,
+    run_compiled,
+)
+from notebook_service.forkserver import get_fork_server
+from notebook_service.health import HealthProber
+from notebook_service.incremental import run_incremental
+from notebook_service.jobs import JobManager, JobQueueFull
+from notebook_service.kernel_pool import get_pool
+from notebook_service.nlu_cache import get_nlu_cache
+from notebook_service.notebook_cache import get_notebook_cache, read_notebook
+from notebook_service.processed_index import SORT_KEYS, get_processed_index
+from notebook_service.profiling import get_cell_histograms
+from notebook_service.projection import OutputProjection
+from notebook_service.responses import (
+    CompressionMiddleware,
+    etag_matches,
+    negotiated_response,
+    wants_msgpack,
+)
+from notebook_service.result_cache import file_digest, get_result_cache
+from notebook_service.runner import (
+    DEFAULT_NOTEBOOK_DIR,
+    ExecutionCancelled,
+    ExecutionTimeout,
+    async_run_notebook,
+    output_records,
+    result_key,
+    run_notebook,
+)
+from notebook_service.schemas import JobInfo, NotebookOutputs, ProcessedPage
+from notebook_service.singleflight import SingleFlight
+from notebook_service.streaming import (
+    STREAM_MEDIA_TYPES,
+    encode_event,
+    stream_outputs,
+)
 
 # Global settings
 SERVICE_ENV_VAR = "SERVICE_APIKEY"
@@ -42,6 +98,15 @@ except Exception:
 # Evaluate DEV after attempting to load .env
 DEV = os.getenv("DEV_MODE", "false").lower() == "true"
 
+# Default /run engine: "kernel" (Jupyter kernel) or "compiled" (in-process)
+RUN_ENGINE = os.getenv("RUN_ENGINE", "kernel")
+
+# Deadline in seconds for a synchronous or streamed /run (0 = none)
+RUN_TIMEOUT = float(os.getenv("RUN_TIMEOUT", "300"))
+
+# How often /run checks whether its client has gone away
+DISCONNECT_POLL_SECONDS = 0.5
+
 # Accept multiple possible header names for backward compatibility
 service_key_header_primary = APIKeyHeader(
     name="X-SERVICE-Key",
@@ -85,38 +150,132 @@ NotebookName = _make_notebook_enum()
 ROOT_DIR = Path(__file__).resolve().parents[2]   # /app
 PROCESSED_DIR = ROOT_DIR / "data" / "processed"
 PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
+ARTIFACT_PREFIX = "artifacts/"
+# Links per /files page
+FILES_PAGE_SIZE = 500
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # kernels and workers started from here on flush their metrics
+    # to a directory /metrics reads
+    metrics.share_with_children()
+    # start the fork server and warm the kernel pool (if enabled)
+    # before taking traffic
+    fork_server = get_fork_server()
+    if fork_server is not None:
+        await run_in_threadpool(fork_server.start)
+    pool = get_pool()
+    if pool is not None:
+        await run_in_threadpool(pool.start)
+    if RUN_ENGINE == "compiled":
+        await run_in_threadpool(get_compiled_engine().start)
+    prober.start()
+    yield
+    prober.stop()
+    job_manager.shutdown()
+    get_compiled_engine().shutdown()
+    if pool is not None:
+        await run_in_threadpool(pool.shutdown)
+    if fork_server is not None:
+        await run_in_threadpool(fork_server.shutdown)
+
 
 # FastAPI application
 app = FastAPI(
     title="Notebook Execution Service",
     description="Execute Jupyter notebooks and return their outputs.",
     version=__version__,
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
 start_time = time.time()
 
+# bounds synchronous /run executions; /jobs has its own queue
+admission = AdmissionController(RUN_MAX_CONCURRENCY, RUN_MAX_QUEUE)
+run_flights = SingleFlight()
 
-@app.get("/health")
-async def health():
-    result = {"status": "ok"}
-    result["uptime_seconds"] = int(time.time() - start_time)
-    from notebook_service import __version__
-    result["version"] = __version__
-    # In DEV mode, don't touch external NLU — return healthy
+
+def _check_nlu() -> dict:
+    # In DEV mode, don't touch external NLU
     if DEV:
-        result["nlu"] = "skipped"
-        return result
-    try:
-        from notebook_service.emotion import NLU_CLIENT
-        NLU_CLIENT
-        result["nlu"] = "reachable"
-    except Exception as e:
-        raise HTTPException(
-            status_code=503,
-            detail=f"NLU error: {e}"
-        )
+        return {"ok": True, "nlu": "skipped"}
+    from notebook_service.emotion import ping
+    ping()
+    return {"ok": True, "nlu": "reachable"}
+
+
+def _check_kernels() -> dict:
+    # ready once every kernel has started; later recycling only needs
+    # one warm kernel left
+    if RUN_ENGINE == "compiled":
+        engine = get_compiled_engine().stats()
+        return {"ok": engine["running"], "engine": "compiled"}
+    pool = get_pool()
+    if pool is None:
+        return {"ok": True, "pool": "disabled"}
+    stats = pool.stats()
+    warm = stats["idle"] + stats["leased"]
+    if warm >= stats["size"]:
+        _pool_warmed.set()
+    needed = 1 if _pool_warmed.is_set() else stats["size"]
+    return {"ok": warm >= needed, "warm": warm, "size": stats["size"]}
+
+
+def _check_queues() -> dict:
+    # not ready while new work would only be rejected
+    runs = admission.stats()
+    jobs = job_manager.stats()
+    return {
+        "ok": runs["queued"] < runs["max_queue"]
+        and jobs["pending"] < jobs["concurrency"] + jobs["queue_size"],
+        "run_queued": runs["queued"],
+        "job_pending": jobs["pending"],
+    }
+
+
+_pool_warmed = threading.Event()
+prober = HealthProber({
+    "nlu": _check_nlu,
+    "kernels": _check_kernels,
+    "queues": _check_queues,
+})
+
+
+async def _health_snapshot() -> dict:
+    # only the very first probe (before the prober has run) does work
+    snapshot = prober.latest()
+    if snapshot is None:
+        snapshot = await run_in_threadpool(prober.snapshot)
+    return snapshot
+
+
+@app.get("/health", summary="Liveness probe")
+async def health():
+    # answered from the prober's cache, never by calling dependencies
+    snapshot = await _health_snapshot()
+    nlu = snapshot["checks"]["nlu"]
+    result = {
+        "status": "ok",
+        "uptime_seconds": int(time.time() - start_time),
+        "version": __version__,
+        "nlu": nlu.get("nlu", "unreachable"),
+    }
+    if prober.stale():
+        raise HTTPException(503, "Health prober has stopped")
     return result
 
 
+@app.get("/ready", summary="Readiness probe")
+async def ready():
+    snapshot = await _health_snapshot()
+    if not snapshot["ready"]:
+        return ORJSONResponse(snapshot, status_code=503)
+    return snapshot
+
+
 def get_service_key(
     x_service_key_primary: str = Security(service_key_header_primary),
     x_service_key_alt1: str = Security(service_key_header_alt1),
@@ -143,6 +302,115 @@ def get_service_key(
     return x_service_key
 
 
+async def _disconnected(request: Request) -> None:
+    # returns once the client has gone away
+    while not await request.is_disconnected():
+        await asyncio.sleep(DISCONNECT_POLL_SECONDS)
+
+
+async def _admit() -> float:
+    try:
+        return await admission.acquire()
+    except AdmissionRejected as e:
+        raise HTTPException(
+            503, str(e), headers={"Retry-After": str(e.retry_after)}
+        )
+
+
+async def _execute_run(
+    nb_path: Path,
+    projection: OutputProjection,
+    engine: str,
+    incremental: bool,
+    profile: bool,
+    timeout: float | None,
+    cell_timeout: float | None,
+    cancel_event: threading.Event,
+) -> dict:
+    """
+    One admitted, synchronous /run execution, projected for the response.
+    """
+    admitted_at = await _admit()
+    run_kwargs = {"timeout": timeout, "cancel_event": cancel_event}
+    kind = "incremental" if incremental and engine != "compiled" else engine
+    outcome = "error"
+    metrics.RUNS_IN_FLIGHT.inc()
+    t0 = time.perf_counter()
+    try:
+        if cancel_event.is_set():
+            # every request waiting on this run left while it queued
+            raise ExecutionCancelled("Cancelled while waiting for a slot")
+        if engine == "compiled":
+            outputs = await run_in_threadpool(
+                run_compiled, str(nb_path), **run_kwargs
+            )
+        elif incremental:
+            outputs = await run_in_threadpool(
+                run_incremental, str(nb_path), **run_kwargs
+            )
+        else:
+            outputs = await async_run_notebook(
+                str(nb_path),
+                profile=profile,
+                cell_timeout=cell_timeout,
+                **run_kwargs,
+            )
+        outcome = "ok"
+    except UnsupportedNotebook as e:
+        outcome = "unsupported"
+        raise HTTPException(422, str(e))
+    except ExecutionTimeout as e:
+        outcome = "timeout"
+        raise HTTPException(504, str(e) or "Execution timed out")
+    except ExecutionCancelled:
+        outcome = "cancelled"
+        # nobody is left to read this; nginx's "client closed request"
+        raise HTTPException(499, "Client disconnected")
+    finally:
+        admission.release(admitted_at)
+        metrics.RUNS_IN_FLIGHT.dec()
+        metrics.RUN_SECONDS.labels(nb_path.name, kind, outcome).observe(
+            time.perf_counter() - t0
+        )
+    # offloading hashes and writes large payloads
+    return await run_in_threadpool(projection.apply, outputs)
+
+
+def _run_etag(
+    key: str, engine: str, projection: OutputProjection, accept: str
+) -> str:
+    # weak: the cache key vouches for equivalent, not identical, bytes
+    tag = hashlib.sha256(
+        repr((key, engine, projection.key(), wants_msgpack(accept)))
+        .encode()
+    ).hexdigest()[:32]
+    return f'W/"{tag}"'
+
+
+class _AdmittedStreamingResponse(StreamingResponse):
+    """
+    A streamed run, which holds its admission slot until the response
+    is over.
+
+    The slot is released when __call__ returns or raises, which also
+    covers a client that leaves before the body is iterated. A response
+    that is never sent releases it when it is garbage collected.
+    """
+
+    def __init__(self, content, admitted_at: float, **kwargs):
+        super().__init__(content, **kwargs)
+        # a finalizer runs at most once, whichever path calls it first
+        self.release = weakref.finalize(
+            self, admission.release, admitted_at
+        )
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.release()
+
+
 @app.get(
     "/run",
     summary="Execute a notebook and fetch its outputs",
@@ -150,6 +418,7 @@ def get_service_key(
     response_model=NotebookOutputs,
 )
 async def run_notebook_query(
+    request: Request,
     notebook: NotebookName = Query(
         ...,
         description="Select which notebook to execute",
@@ -159,103 +428,443 @@ async def run_notebook_query(
         enum=["trimmed", "raw"],
         description="Response format: `trimmed` or full `raw` JSON"
     ),
+    mimes: str | None = Query(
+        None,
+        description="Comma-separated mime allowlist, or `*` for every "
+                    "mime (default: `text/plain`, `application/json`, "
+                    "`text/csv`, `image/png`)",
+    ),
+    cells: str | None = Query(
+        None,
+        description="1-based, inclusive cell range such as `3`, `2-5`, "
+                    "`4-` or `-2`",
+    ),
+    max_bytes: int | None = Query(
+        None,
+        gt=0,
+        description="Longest inline payload; longer text is cut and other "
+                    "data dropped, with `truncated: true`",
+    ),
+    fields: str | None = Query(
+        None,
+        description="Comma-separated record keys to return, e.g. "
+                    "`cell,mime,data`",
+    ),
+    stream: str | None = Query(
+        None,
+        enum=list(STREAM_MEDIA_TYPES),
+        description="Stream each output as it is produced, as `ndjson` "
+                    "lines or Server-Sent Events (`sse`)",
+    ),
+    incremental: bool = Query(
+        False,
+        description="Re-run only cells changed since the last incremental "
+                    "run (and cells that depend on them)",
+    ),
+    profile: bool = Query(
+        False,
+        description="Execute without the result cache and add per-cell "
+                    "wall time, kernel CPU, kernel RSS growth and output "
+                    "size to the response",
+    ),
+    engine: str = Query(
+        RUN_ENGINE,
+        enum=["kernel", "compiled"],
+        description="`kernel` runs a Jupyter kernel; `compiled` runs the "
+                    "code cells in-process on a worker pool (plain Python "
+                    "notebooks only, no streaming/incremental/profile)",
+    ),
+    timeout: float | None = Query(
+        None,
+        gt=0,
+        description="Seconds before the run is stopped with a 504 (capped "
+                    "by RUN_TIMEOUT and the notebook's own limit)",
+    ),
+    cell_timeout: float | None = Query(
+        None,
+        gt=0,
+        description="Seconds any single cell may run (capped by "
+                    "CELL_TIMEOUT and the notebook's own limit; kernel "
+                    "engine, not incremental)",
+    ),
 ):
+    # bad parameter combinations are rejected in DEV mode too
+    if engine == "compiled" and (stream or incremental or profile):
+        raise HTTPException(
+            400, "engine=compiled can't stream, profile or run incrementally"
+        )
+    if cell_timeout is not None and (engine == "compiled" or incremental):
+        # only the kernel engine can interrupt a single cell
+        raise HTTPException(
+            422, "cell_timeout needs engine=kernel without incremental"
+        )
+    try:
+        projection = OutputProjection.from_query(
+            fmt, mimes=mimes, cells=cells, max_bytes=max_bytes, fields=fields
+        )
+    except ValueError as e:
+        raise HTTPException(400, str(e))
     if DEV:
+        if stream:
+            end = [encode_event({}, stream, "end")] if stream == "sse" else []
+            return StreamingResponse(
+                iter(end), media_type=STREAM_MEDIA_TYPES[stream]
+            )
         return {"outputs": []}
     if notebook.value == "":
         raise HTTPException(404, "No notebooks available to run")
     nb_path = NOTEBOOK_DIR / notebook.value
     if not nb_path.exists():
         raise HTTPException(status_code=404, detail="Notebook not found")
-    outputs = await run_in_threadpool(run_notebook, str(nb_path))
+    # the caller may shorten, but never extend, the configured deadline
+    limits = [t for t in (timeout, RUN_TIMEOUT) if t]
+    limit = min(limits) if limits else None
+    if stream:
+        admitted_at = await _admit()
+        try:
+            body = stream_outputs(
+                str(nb_path),
+                stream,
+                projection=projection,
+                timeout=limit,
+                cell_timeout=cell_timeout,
+            )
+            return _AdmittedStreamingResponse(
+                body,
+                admitted_at,
+                media_type=STREAM_MEDIA_TYPES[stream],
+                headers={"Cache-Control": "no-cache"},
+            )
+        except BaseException:
+            admission.release(admitted_at)
+            raise
+
+    # a cacheable run is identified by its result-cache key
+    etag = None
+    if not (incremental or profile):
+        cache_key = await run_in_threadpool(result_key, str(nb_path))
+        if cache_key is not None:
+            accept = request.headers.get("accept", "")
+            etag = _run_etag(cache_key, engine, projection, accept)
+            if etag_matches(request.headers.get("if-none-match"), etag):
+                return Response(status_code=304, headers={"ETag": etag})
+
+    # identical concurrent requests share one execution
+    key = (notebook.value, projection.key(), engine, incremental, profile,
+           limit, cell_timeout)
+    run = asyncio.ensure_future(run_flights.run(
+        key,
+        lambda cancel_event: _execute_run(
+            nb_path, projection, engine, incremental, profile, limit,
+            cell_timeout, cancel_event,
+        ),
+    ))
+    gone = asyncio.ensure_future(_disconnected(request))
+    try:
+        await asyncio.wait({run, gone}, return_when=asyncio.FIRST_COMPLETED)
+    except asyncio.CancelledError:
+        run.cancel()
+        raise
+    finally:
+        gone.cancel()
+    if not run.done():
+        # leaving the flight stops it once no other request waits on it
+        run.cancel()
+        raise HTTPException(499, "Client disconnected")
+    # already projected; skip re-validating every record against the model
+    response = negotiated_response(
+        run.result(), request.headers.get("accept", "")
+    )
+    if etag is not None:
+        response.headers["ETag"] = etag
+    return response
 
-    if fmt.lower() == "raw":
-        return outputs  # full JSON
-    # otherwise return the trimmed version
-    else:
-        return filter_notebook(outputs)  # your pruned version
+
+@app.get(
+    "/profile",
+    summary="Per-notebook, per-cell execution latency histograms",
+    dependencies=[Security(get_service_key)],
+)
+async def cell_latency():
+    histograms = get_cell_histograms()
+    return {
+        "buckets": list(histograms.buckets),
+        "notebooks": histograms.snapshot(),
+    }
 
 
-def filter_notebook(nb_json: dict) -> dict:
+def runtime_stats() -> dict:
     """
-    Prune a full notebook JSON to only keep stream and plan-text results.
+    stats() of every backend, as reported by /stats and /metrics.
     """
-    allowed_mimes = {
-        "text/plain",
-        "application/json",
-        "text/csv",
-        "image/png",
+    pool = get_pool()
+    fork_server = get_fork_server()
+    cache = get_result_cache()
+    store = get_artifact_store()
+    notebooks = get_notebook_cache()
+    nlu = get_nlu_cache()
+    return {
+        "kernel_pool": pool.stats() if pool is not None else None,
+        "fork_server": (
+            fork_server.stats() if fork_server is not None else None
+        ),
+        "compiled_engine": get_compiled_engine().stats(),
+        "result_cache": cache.stats() if cache is not None else None,
+        "artifacts": store.stats() if store is not None else None,
+        "notebook_cache": (
+            notebooks.stats() if notebooks is not None else None
+        ),
+        "nlu_cache": _nlu_cache_stats(nlu) if nlu is not None else None,
+        "processed_index": get_processed_index(PROCESSED_DIR).stats(),
+        "admission": admission.stats(),
+        "coalescing": run_flights.stats(),
+        "jobs": job_manager.stats(),
+        "health": prober.stats(),
     }
 
-    for cell in nb_json.get("cells", []):
-        if cell.get("cell_type") != "code":
-            continue
-        new_outputs: list[dict] = []
-        for o in cell.get("outputs", []):
-            if o.get("output_type") == "stream":
-                new_outputs.append(o)
-                continue
 
-            if o.get("output_type") in ("execute_result", "display_data"):
-                data = o.get("data") or {}
-                filtered = {
-                    mime: data[mime]
-                    for mime in allowed_mimes
-                    if mime in data
-                }
-                if not filtered:
-                    continue
+def _nlu_cache_stats(nlu) -> dict:
+    # kernels do the lookups, so count them from their flushed metrics;
+    # the server's own NluCache has never been read
+    lookups = metrics.totals("notebook_service_nlu_cache_lookups_total")
+    hits = int(lookups.get(("hit",), 0))
+    misses = int(lookups.get(("miss",), 0))
+    stats = nlu.stats()
+    return {
+        "entries": stats["entries"],
+        "bytes": stats["bytes"],
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0,
+    }
+
 
-                out: dict = {
-                    "output_type": o["output_type"],
-                    "data": filtered,
-                }
-                if "execution_count" in o:
-                    out["execution_count"] = o["execution_count"]
+def _stats_gauges(stats=None, path=()):
+    # numeric /stats leaves as gauges: kernel_pool.idle becomes
+    # notebook_service_kernel_pool_idle
+    if stats is None:
+        stats = runtime_stats()
+    for key, value in stats.items():
+        key_path = (*path, str(key))
+        if isinstance(value, dict):
+            yield from _stats_gauges(value, key_path)
+        elif isinstance(value, (int, float)):
+            name = re.sub(r"[^0-9A-Za-z_]", "_", "_".join(key_path))
+            yield (
+                f"notebook_service_{name}",
+                f"{'.'.join(key_path)} from /stats",
+                value,
+            )
 
-                if o.get("metadata"):
-                    out["metadata"] = o["metadata"]
 
-                new_outputs.append(out)
+metrics.REGISTRY.add_collector("stats", _stats_gauges)
 
-        cell["outputs"] = new_outputs
 
-    return nb_json
+@app.get(
+    "/stats",
+    summary="Runtime statistics for the execution backends",
+    dependencies=[Security(get_service_key)],
+)
+async def stats():
+    # several backends stat files or query SQLite
+    return await run_in_threadpool(runtime_stats)
+
+
+@app.get(
+    "/metrics",
+    summary="Prometheus metrics",
+    response_class=PlainTextResponse,
+)
+async def prometheus_metrics():
+    # anyio's limiter is what run_in_threadpool waits on
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    metrics.THREADPOOL_BUSY.set(limiter.borrowed_tokens)
+    metrics.THREADPOOL_SIZE.set(limiter.total_tokens)
+    # the stats collector and the children's flushes touch the disk
+    text = await run_in_threadpool(metrics.render)
+    return PlainTextResponse(text, media_type=metrics.CONTENT_TYPE)
+
+
+def execute_job(notebook: str, fmt: str, **run_kwargs) -> dict:
+    """
+    Job body: run *notebook* and shape the result like /run does.
+    """
+    if DEV:
+        return {"outputs": []}
+    outputs = run_notebook(str(NOTEBOOK_DIR / notebook), **run_kwargs)
+    return OutputProjection.from_query(fmt).apply(outputs)
+
+
+job_manager = JobManager(run=execute_job)
+
+
+@app.post(
+    "/jobs",
+    summary="Submit a notebook run and return its job id",
+    dependencies=[Security(get_service_key)],
+    response_model=JobInfo,
+    status_code=202,
+)
+async def submit_job(
+    notebook: NotebookName = Query(
+        ...,
+        description="Select which notebook to execute",
+    ),
+    fmt: str = Query(
+        "trimmed",
+        enum=["trimmed", "raw"],
+        description="Response format: `trimmed` or full `raw` JSON"
+    ),
+    timeout: float | None = Query(
+        None,
+        gt=0,
+        description="Seconds before the run is stopped (capped by "
+                    "JOB_TIMEOUT)",
+    ),
+):
+    if notebook.value == "":
+        raise HTTPException(404, "No notebooks available to run")
+    if not (NOTEBOOK_DIR / notebook.value).exists():
+        raise HTTPException(status_code=404, detail="Notebook not found")
+    try:
+        job = job_manager.submit(notebook.value, fmt, timeout=timeout)
+    except JobQueueFull as e:
+        raise HTTPException(503, str(e), headers={"Retry-After": "5"})
+    return job.to_dict()
+
+
+@app.get(
+    "/jobs/{job_id}",
+    summary="Fetch a job's status and, once finished, its outputs",
+    dependencies=[Security(get_service_key)],
+    response_model=JobInfo,
+)
+async def get_job(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(404, f"Job '{job_id}' not found")
+    return job.to_dict()
+
+
+@app.delete(
+    "/jobs/{job_id}",
+    summary="Cancel a queued or running job",
+    dependencies=[Security(get_service_key)],
+    response_model=JobInfo,
+)
+async def cancel_job(job_id: str):
+    job = job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(404, f"Job '{job_id}' not found")
+    return job.to_dict()
+
+
+def _processed_page(**kwargs) -> dict:
+    index = get_processed_index(PROCESSED_DIR)
+    entries, next_cursor = index.page(**kwargs)
+    items = [
+        {
+            "name": e.name,
+            "size": e.size,
+            "mtime": e.mtime_ns / 1e9,
+            "sha256": index.digest(e),
+        }
+        for e in entries
+    ]
+    return {"items": items, "next_cursor": next_cursor}
 
 
 @app.get(
     "/processed",
-    summary="List all processed files",
-    dependencies=[Security(get_service_key)]
+    summary="List processed files, one page at a time",
+    dependencies=[Security(get_service_key)],
+    response_model=ProcessedPage,
 )
-async def processed_files():
-    return [p.name for p in PROCESSED_DIR.iterdir() if p.is_file()]
+async def processed_files(
+    cursor: str | None = Query(
+        None,
+        description="`next_cursor` of the previous page",
+    ),
+    limit: int = Query(100, ge=1, le=1000, description="Page size"),
+    sort: str = Query("name", enum=list(SORT_KEYS)),
+    order: str = Query("asc", enum=["asc", "desc"]),
+    prefix: str | None = Query(
+        None, description="Only names starting with this"
+    ),
+    glob: str | None = Query(
+        None, description="Only names matching this pattern, e.g. `*.csv`"
+    ),
+):
+    try:
+        return await run_in_threadpool(
+            _processed_page,
+            sort=sort,
+            order=order,
+            limit=limit,
+            cursor=cursor,
+            prefix=prefix,
+            glob=glob,
+        )
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+
+def _processed_path(filename: str) -> Path | None:
+    # "artifacts/<sha256><ext>" names an offloaded output; anything else
+    # must be a plain file directly inside PROCESSED_DIR
+    if filename.startswith(ARTIFACT_PREFIX):
+        store = get_artifact_store()
+        if store is None:
+            return None
+        return store.path_for(filename[len(ARTIFACT_PREFIX):])
+    if "/" in filename or filename in ("", ".", ".."):
+        return None
+    return PROCESSED_DIR / filename
 
 
 @app.get(
-    "/processed/{filename}",
+    "/processed/{filename:path}",
     summary="Download a processed file",
     dependencies=[Security(get_service_key)],
 )
 async def download_processed_file(
+    request: Request,
     filename: str = PathParam(
         ...,
-        description="Exact filename to download"
+        description="Exact filename to download, or `artifacts/<name>` "
+                    "for an offloaded output"
     ),
 ):
-    file_path = PROCESSED_DIR / filename
-    if not file_path.exists():
+    file_path = _processed_path(filename)
+    if file_path is None or not file_path.is_file():
         raise HTTPException(404, f"'{filename}' not found")
+
+    if filename.startswith(ARTIFACT_PREFIX):
+        # content-addressed: the name is the hash and never changes
+        etag = f'"{file_path.stem}"'
+        cache_control = "public, max-age=31536000, immutable"
+    else:
+        digest = await run_in_threadpool(file_digest, file_path)
+        etag = f'"{digest}"'
+        cache_control = "no-cache"
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    # FileResponse answers Range / If-Range requests with 206
     media_type, _ = guess_type(str(file_path))
     return FileResponse(
         path=str(file_path),
         media_type=media_type or "application/octet-stream",
-        filename=filename,
+        filename=file_path.name,
+        headers=headers,
     )
 
 
 @app.get("/files", response_class=HTMLResponse)
-async def processed_files_ui():
+async def processed_files_ui(
+    cursor: str | None = Query(None),
+):
     if DEV:
         return """
         <html><body>
@@ -263,23 +872,32 @@ async def processed_files_ui():
             <p>(none)</p>
         </body></html>
         """
-    files = sorted(
-        p.name for p in PROCESSED_DIR.iterdir()
-        if p.is_file()
-    )
+    try:
+        entries, next_cursor = await run_in_threadpool(
+            get_processed_index(PROCESSED_DIR).page,
+            limit=FILES_PAGE_SIZE,
+            cursor=cursor,
+        )
+    except ValueError as e:
+        raise HTTPException(400, str(e))
     links = "\n".join(
-        f'<li><a href="/processed/{f}">{f}</a></li>' for f in files
+        f'<li><a href="/processed/{e.name}">{e.name}</a></li>'
+        for e in entries
+    )
+    more = (
+        f'<p><a href="/files?cursor={next_cursor}">Next page</a></p>'
+        if next_cursor else ""
     )
     return f"""
     <html><body>
       <h1>Processed Files</h1>
-      <ul>{links}</ul>
+      <ul>{links}</ul>{more}
     </body></html>
     """
 
 
 def list_cells(path):
-    nb = nbformat.read(path, as_version=4)
+    nb = read_notebook(path, strip=True)
     for idx, cell in enumerate(nb.cells):
         preview = cell.source.strip().splitlines()[0] if cell.source else ""
         print(f"{idx:3d}: {cell.cell_type:<5} {preview!r}")
@@ -290,7 +908,7 @@ def run_and_filter(path, to_run):
 
     # read & slice…
     notebook_dir = Path(path).parent
-    nb_full = nbformat.read(path, as_version=4)
+    nb_full = read_notebook(path, strip=True)
     nb = nbformat.v4.new_notebook(metadata=nb_full.metadata)
     nb.cells = [nb_full.cells[i] for i in to_run]
     client_kwargs = {
@@ -306,32 +924,21 @@ def run_and_filter(path, to_run):
     finally:
         os.chdir(orig_cwd)
 
-    # prune outputs…
-    for cell in nb.cells:
-        if cell.cell_type != "code":
-            continue
-
-        new_out = []
-        for o in cell.get("outputs", []):
-            # keep STDOUT / STDERR streams untouched
-            if o.output_type == "stream":
-                new_out.append(o)
-
-            # for execute_reults , drop HTML and metadata, only keep
-            # plain text
-            elif o.output_type == "execute_result":
-                text = o.data.get("text/plain")
-                if text is not None:
-                    new_out.append({
-                        "output_type": "execute_result",
-                        "data": {"text/plain": text},
-                        "execution_count": o.execution_count
-                    })
-        cell.outputs = new_out
+    # keep streams and plain-text results only
+    outputs = OutputProjection(mimes={"text/plain"}).apply({
+        "outputs": [
+            record
+            for idx, cell in enumerate(nb.cells, start=1)
+            for out in cell.get("outputs", [])
+            if out.get("output_type") != "display_data"
+            for record in output_records(idx, out)
+        ]
+    })
 
     # Signal completion
     print(f"✅ Completed run_and_filter on {Path(path).name}. "
           f"Check data/processed for the CSV & JSON outputs.")
+    return outputs
 
 
 if __name__ == "__main__":
@@ -368,14 +975,25 @@ if __name__ == "__main__":
         "--cells",
         nargs="+",
         type=int,
-        required=True,
         help="Cell indices to run eg. --cells 1 2 3"
     )
+    # …or let the dependency graph pick them
+    run_cmd.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Re-run only cells changed since the last incremental run"
+    )
 
     args = parser.parse_args()
 
     if args.command == "list-cells":
         list_cells(args.notebook)
     elif args.command == "run":
-        # --cells is now required, so we can use it directly
-        run_and_filter(args.notebook, args.cells)
+        if args.incremental:
+            result = run_incremental(str(Path(args.notebook).resolve()))
+            print(f"✅ Re-ran cells {result['executed_cells']} of "
+                  f"{Path(args.notebook).name}.")
+        elif args.cells:
+            run_and_filter(args.notebook, args.cells)
+        else:
+            parser.error("run needs --cells or --incremental")
@@ -0,0 +1,487 @@
+# src/notebook_service/metrics.py
+"""
+Prometheus text-format metrics without a client library.
+
+Metrics register themselves in REGISTRY and are rendered by /metrics.
+Updating one is a dict lookup and an add under a per-metric lock.
+
+Kernels and compiled-engine workers are separate processes. The server
+calls share_with_children() before starting them, which points
+METRICS_DIR at a private directory; code running in a child calls
+flush() to write its counters and histograms there, and the server adds
+them to its own when it renders. Files left by processes that have
+exited are folded into one, so the directory does not grow with every
+recycled kernel.
+"""
+import bisect
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+# Where child processes leave their samples (set by the server)
+METRICS_DIR = os.getenv("METRICS_DIR") or None
+
+# Upper bounds (seconds) of latency histogram buckets
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120,
+    300,
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# unique per process, so a reused pid never overwrites a dead child's file
+_PROCESS_FILE = f"{os.getpid()}-{uuid.uuid4().hex[:8]}.json"
+_serving = False
+# samples of exited processes, summed (see _read_flushed)
+_AGGREGATE_FILE = "exited.json"
+_fold_lock = threading.Lock()
+
+
+class _CounterChild:
+    __slots__ = ("_lock", "value")
+
+    def __init__(self, lock):
+        self._lock = lock
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        with self._lock:
+            self.value = value
+
+
+class _HistogramChild:
+    __slots__ = ("_lock", "_buckets", "counts", "sum")
+
+    def __init__(self, lock, buckets):
+        self._lock = lock
+        self._buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        i = bisect.bisect_left(self._buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0)
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labels=(), registry=None):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._children: dict[tuple, object] = {}
+        (REGISTRY if registry is None else registry).register(self)
+
+    def labels(self, *values):
+        """
+        The child for one combination of label values.
+        """
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.label_names):
+                raise ValueError(
+                    f"{self.name} takes labels {self.label_names}"
+                )
+            with self._lock:
+                child = self._children.setdefault(key, self._child())
+        return child
+
+    def _child(self):
+        raise NotImplementedError
+
+    def state(self) -> dict:
+        with self._lock:
+            return {
+                "type": self.type,
+                "help": self.help,
+                "labels": list(self.label_names),
+                "samples": [
+                    [list(k), self._value(c)]
+                    for k, c in self._children.items()
+                ],
+            }
+
+    def _value(self, child):
+        return child.value
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def _child(self):
+        return _CounterChild(self._lock)
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def _child(self):
+        return _GaugeChild(self._lock)
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.labels().dec(amount)
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS,
+                 registry=None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labels, registry)
+
+    def _child(self):
+        return _HistogramChild(self._lock, self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def state(self) -> dict:
+        state = super().state()
+        state["buckets"] = list(self.buckets)
+        return state
+
+    def _value(self, child):
+        return [list(child.counts), child.sum]
+
+
+class Registry:
+    """
+    The metrics of a process, plus collectors sampled at render time.
+
+    A collector returns ``(name, help, value)`` gauges; it is how
+    existing ``stats()`` counters are exposed without instrumenting
+    them twice.
+    """
+
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+        self._collectors: dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> None:
+        # a reloaded module's metric replaces the old one
+        with self._lock:
+            self._metrics[metric.name] = metric
+
+    def add_collector(self, name: str, collect) -> None:
+        with self._lock:
+            self._collectors[name] = collect
+
+    def state(self, types=("counter", "gauge", "histogram")) -> dict:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {m.name: m.state() for m in metrics if m.type in types}
+
+    def merged_state(self, directory: str | None = None) -> dict:
+        """
+        state() plus the counters and histograms flushed to *directory*.
+        """
+        merged = self.state()
+        for state in _read_flushed(directory):
+            _merge(merged, state)
+        return merged
+
+    def render(self, directory: str | None = None) -> str:
+        """
+        Prometheus text exposition of this process's metrics, the
+        collectors' gauges and the samples flushed to *directory*.
+        """
+        merged = self.merged_state(directory)
+        with self._lock:
+            collectors = list(self._collectors.values())
+        for collect in collectors:
+            for name, help, value in collect():
+                merged[name] = {
+                    "type": "gauge",
+                    "help": help,
+                    "labels": [],
+                    "samples": [[[], value]],
+                }
+        return "".join(_format(name, s) for name, s in merged.items())
+
+
+def _pid_alive(name: str) -> bool:
+    # flush files are named "<pid>-<random>.json"
+    try:
+        pid = int(name.split("-", 1)[0])
+    except ValueError:
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _read_flushed(directory: str | None) -> list[dict]:
+    """
+    States flushed to *directory*. Files of processes that have exited
+    are folded into _AGGREGATE_FILE and deleted, so recycled kernels
+    don't leave one file each behind.
+    """
+    if not directory:
+        return []
+    root = Path(directory)
+    with _fold_lock:
+        try:
+            aggregate = json.loads((root / _AGGREGATE_FILE).read_text())
+        except (OSError, ValueError):
+            aggregate = {"folded": [], "state": {}}
+        # folded on an earlier render that stopped before deleting them
+        already = set(aggregate["folded"])
+        live, dead = [], []
+        for path in sorted(root.glob("*.json")):
+            if path.name in (_PROCESS_FILE, _AGGREGATE_FILE):
+                continue
+            if path.name in already:
+                path.unlink(missing_ok=True)
+                continue
+            try:
+                state = json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue
+            if _pid_alive(path.name):
+                live.append(state)
+            else:
+                dead.append((path, state))
+        for path in root.glob("*.tmp"):
+            if not _pid_alive(path.name):
+                path.unlink(missing_ok=True)
+        if dead:
+            for _, state in dead:
+                _merge(aggregate["state"], state)
+            aggregate["folded"] = [path.name for path, _ in dead]
+            tmp = root / f"{_AGGREGATE_FILE}.{os.getpid()}.tmp"
+            try:
+                tmp.write_text(json.dumps(aggregate))
+                os.replace(tmp, root / _AGGREGATE_FILE)
+            except OSError:
+                # keep the files; the next render tries again
+                dead = []
+            for path, _ in dead:
+                path.unlink(missing_ok=True)
+        return [aggregate["state"], *live]
+
+
+def _merge(into: dict, state: dict) -> None:
+    for name, metric in state.items():
+        ours = into.get(name)
+        if ours is None:
+            into[name] = metric
+            continue
+        if ours["type"] != metric["type"] or \
+                ours.get("buckets") != metric.get("buckets"):
+            continue
+        samples = {tuple(k): v for k, v in ours["samples"]}
+        for k, v in metric["samples"]:
+            k = tuple(k)
+            if k not in samples:
+                samples[k] = v
+            elif ours["type"] == "histogram":
+                counts = [a + b for a, b in zip(samples[k][0], v[0])]
+                samples[k] = [counts, samples[k][1] + v[1]]
+            else:
+                samples[k] = samples[k] + v
+        ours["samples"] = [[list(k), v] for k, v in samples.items()]
+
+
+def _escape(value: str) -> str:
+    return (
+        value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    )
+
+
+def _label_str(names, values, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value) -> str:
+    if isinstance(value, float):
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        if value.is_integer():
+            return str(int(value))
+    return repr(value)
+
+
+def _format(name: str, state: dict) -> str:
+    lines = [
+        f"# HELP {name} {_escape(state['help'])}",
+        f"# TYPE {name} {state['type']}",
+    ]
+    names = state["labels"]
+    for values, value in state["samples"]:
+        if state["type"] != "histogram":
+            lines.append(
+                f"{name}{_label_str(names, values)} {_number(value)}"
+            )
+            continue
+        counts, total = value
+        running = 0
+        bounds = [_number(float(b)) for b in state["buckets"]] + ["+Inf"]
+        for bound, n in zip(bounds, counts):
+            running += n
+            labels = _label_str(names, values, f'le="{bound}"')
+            lines.append(f"{name}_bucket{labels} {running}")
+        labels = _label_str(names, values)
+        lines.append(f"{name}_sum{labels} {_number(float(total))}")
+        lines.append(f"{name}_count{labels} {running}")
+    return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def share_with_children() -> str:
+    """
+    Make this process the one that renders /metrics and export
+    METRICS_DIR so kernels and workers started later flush into it.
+    """
+    global METRICS_DIR, _serving
+    _serving = True
+    if METRICS_DIR is None:
+        METRICS_DIR = tempfile.mkdtemp(prefix="notebook-service-metrics-")
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    os.environ["METRICS_DIR"] = METRICS_DIR
+    return METRICS_DIR
+
+
+def flush() -> None:
+    """
+    Write this process's counters and histograms to METRICS_DIR.
+
+    A no-op in the serving process and when METRICS_DIR is unset.
+    """
+    if _serving or METRICS_DIR is None:
+        return
+    state = REGISTRY.state(types=("counter", "histogram"))
+    path = Path(METRICS_DIR) / _PROCESS_FILE
+    tmp = path.with_suffix(".tmp")
+    try:
+        tmp.write_text(json.dumps(state))
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def totals(name: str) -> dict[tuple, float]:
+    """
+    Value of each labelled sample of counter or gauge *name*, summed
+    over this process and, in the server, its children's flushes.
+    """
+    state = REGISTRY.merged_state(METRICS_DIR if _serving else None)
+    metric = state.get(name)
+    if metric is None or metric["type"] == "histogram":
+        return {}
+    return {tuple(k): v for k, v in metric["samples"]}
+
+
+def render() -> str:
+    """
+    Everything /metrics reports, in Prometheus text format.
+    """
+    return REGISTRY.render(METRICS_DIR if _serving else None)
+
+
+RUN_SECONDS = Histogram(
+    "notebook_service_run_duration_seconds",
+    "Synchronous /run execution time by notebook, engine and outcome",
+    labels=("notebook", "engine", "outcome"),
+)
+RUNS_IN_FLIGHT = Gauge(
+    "notebook_service_runs_in_flight",
+    "Synchronous /run executions currently holding an admission slot",
+)
+THREADPOOL_BUSY = Gauge(
+    "notebook_service_threadpool_busy_threads",
+    "Worker threads in use by run_in_threadpool",
+)
+THREADPOOL_SIZE = Gauge(
+    "notebook_service_threadpool_max_threads",
+    "Size of the run_in_threadpool worker pool",
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "notebook_service_http_request_duration_seconds",
+    "HTTP request latency by route template, method and status",
+    labels=("method", "route", "status"),
+)
+
+
+class MetricsMiddleware:
+    """
+    Time every HTTP request, labelled by its route template so path
+    parameters don't create new series.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        t0 = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_SECONDS.labels(
+                scope["method"], route, status
+            ).observe(time.perf_counter() - t0)
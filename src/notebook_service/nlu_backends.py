@@ -0,0 +1,343 @@
+# src/notebook_service/nlu_backends.py
+"""
+NLU backends behind emotion.get_analysis, selected by NLU_BACKEND.
+
+- ``watson``: IBM Watson NLU (NLU_APIKEY, NLU_URL).
+- ``http``: any server speaking Watson's ``/v1/analyze`` JSON at
+  NLU_URL without IAM auth, such as the stand-in in nlu_standin.
+- ``synthetic``: responses derived from a hash of the text, in-process.
+- ``dummy``: fixed joy=1.0 and nothing else (the DEV_MODE default).
+
+A backend's ``analyze`` returns the raw response dict, and failures
+carry an HTTP ``status_code`` (and ``http_response`` headers) so
+nlu_retry treats them the same whatever the backend. ``version``
+identifies where responses come from and is part of NLU cache keys,
+so synthetic answers never satisfy real lookups.
+"""
+import hashlib
+import os
+import random
+import re
+import time
+from types import SimpleNamespace
+from typing import Any
+
+import requests
+
+from notebook_service.nlu_retry import NLU_MAX_CONCURRENCY
+
+# Which backend answers NLU requests ("" = dummy in DEV_MODE, else watson)
+NLU_BACKEND = os.getenv("NLU_BACKEND", "").lower()
+# Seconds an http backend waits for a response
+NLU_HTTP_TIMEOUT = float(os.getenv("NLU_HTTP_TIMEOUT", "30"))
+# Synthetic backend: mean latency (seconds, exponentially distributed)
+# and the share of requests that fail with a 500 or are throttled (429)
+NLU_SYNTHETIC_LATENCY = float(os.getenv("NLU_SYNTHETIC_LATENCY", "0"))
+NLU_SYNTHETIC_ERROR_RATE = float(os.getenv("NLU_SYNTHETIC_ERROR_RATE", "0"))
+NLU_SYNTHETIC_THROTTLE_RATE = float(
+    os.getenv("NLU_SYNTHETIC_THROTTLE_RATE", "0")
+)
+
+# Watson API version the watson and http backends speak
+WATSON_VERSION = "2023-08-01"
+
+EMOTIONS = ("anger", "disgust", "fear", "joy", "sadness")
+
+_WORD = re.compile(r"[^\W\d_][\w'’-]*")
+_SENTENCE = re.compile(r"[^.!?;]+")
+_STOPWORDS = frozenset("""
+    a about after again all also an and any are as at be because been
+    before being but by can could did do does doing during each even
+    every for from had has have having he her here hers him his how i
+    if in into is it its just like made make me more most my no not now
+    of off on once only or other our out over own same she should so
+    some still such than that the their them then there these they this
+    those through to too under until up very was we were what when where
+    which while who why will with without would you your
+""".split())
+
+
+class NluBackendError(Exception):
+    """An NLU request failed with an HTTP status."""
+
+    def __init__(self, status_code: int, message: str, http_response=None):
+        super().__init__(f"Error: {message}, Status code: {status_code}")
+        self.status_code = status_code
+        self.message = message
+        self.http_response = http_response
+
+
+class DummyBackend:
+    """
+    Fixed response: joy=1.0, other emotions 0, no concepts or roles.
+    """
+
+    name = "dummy"
+    version = "dev"
+
+    def analyze(self, *, text: str, features: Any) -> dict:
+        emotion = dict.fromkeys(EMOTIONS, 0.0)
+        emotion["joy"] = 1.0
+        return {"emotion": {"document": {"emotion": emotion}}}
+
+    def ping(self) -> None:
+        pass
+
+
+class WatsonBackend:
+    """
+    IBM Watson NLU through the ibm-watson SDK.
+    """
+
+    name = "watson"
+    version = WATSON_VERSION
+
+    def __init__(self, apikey: str, url: str):
+        from ibm_cloud_sdk_core.authenticators import IAMAuthenticator
+        from ibm_watson import NaturalLanguageUnderstandingV1
+        from ibm_watson.natural_language_understanding_v1 import Features
+
+        self._features = Features
+        self.client = NaturalLanguageUnderstandingV1(
+            version=WATSON_VERSION, authenticator=IAMAuthenticator(apikey)
+        )
+        self.client.set_service_url(url)
+
+    def analyze(self, *, text: str, features: dict) -> dict:
+        return self.client.analyze(
+            text=text,
+            features=self._features.from_dict(features),
+            return_analyzed_text=False,
+        ).get_result()
+
+    def ping(self) -> None:
+        # lists custom models; nothing is analysed or billed
+        self.client.list_models()
+
+
+class HttpBackend:
+    """
+    Watson's ``/v1/analyze`` JSON API at *url*, without authentication.
+
+    *session* defaults to a pooled requests.Session sized for
+    NLU_MAX_CONCURRENCY; tests pass a client for an ASGI app instead.
+    """
+
+    name = "http"
+
+    def __init__(self, url: str, timeout: float = NLU_HTTP_TIMEOUT,
+                 session=None):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.version = f"{WATSON_VERSION}@{self.url}"
+        if session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(
+                pool_maxsize=NLU_MAX_CONCURRENCY
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        self._session = session
+
+    def _request(self, method: str, path: str, **kwargs) -> dict:
+        resp = self._session.request(
+            method,
+            f"{self.url}{path}",
+            params={"version": WATSON_VERSION},
+            timeout=self.timeout,
+            **kwargs,
+        )
+        if resp.status_code >= 400:
+            try:
+                message = resp.json().get("error", resp.text)
+            except ValueError:
+                message = resp.text
+            raise NluBackendError(resp.status_code, message, resp)
+        return resp.json()
+
+    def analyze(self, *, text: str, features: dict) -> dict:
+        return self._request(
+            "POST", "/v1/analyze", json={"text": text, "features": features}
+        )
+
+    def ping(self) -> None:
+        self._request("GET", "/v1/models")
+
+
+class SyntheticBackend:
+    """
+    Offline NLU whose answers are derived from a hash of the text.
+
+    The same text always gets the same concepts (with ``relevance`` and
+    ``dbpedia_resource``), semantic roles and emotion scores, shaped
+    like Watson's, so the graph pipeline can run and be load-tested
+    without network access. Latency and failures are injected at
+    random: *latency* is the mean delay in seconds, *error_rate* the
+    share of 500s and *throttle_rate* the share of 429s (with
+    ``Retry-After: 1``).
+    """
+
+    name = "synthetic"
+    version = "synthetic-1"
+
+    def __init__(
+        self,
+        latency: float = NLU_SYNTHETIC_LATENCY,
+        error_rate: float = NLU_SYNTHETIC_ERROR_RATE,
+        throttle_rate: float = NLU_SYNTHETIC_THROTTLE_RATE,
+        seed: int | None = None,
+    ):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self._rng = random.Random(seed)
+
+    def draw_fault(self) -> tuple[float, NluBackendError | None]:
+        """
+        Delay to add to the next request, and the error to fail it
+        with, if any.
+        """
+        delay = (
+            self._rng.expovariate(1 / self.latency) if self.latency > 0
+            else 0.0
+        )
+        roll = self._rng.random()
+        if roll < self.throttle_rate:
+            return delay, NluBackendError(
+                429,
+                "Too Many Requests",
+                SimpleNamespace(headers={"Retry-After": "1"}),
+            )
+        if roll < self.throttle_rate + self.error_rate:
+            return delay, NluBackendError(500, "Internal Server Error")
+        return delay, None
+
+    def analyze(self, *, text: str, features: dict | None) -> dict:
+        delay, error = self.draw_fault()
+        if delay:
+            time.sleep(delay)
+        if error is not None:
+            raise error
+        return synthesize(text, features)
+
+    def ping(self) -> None:
+        pass
+
+
+def synthesize(text: str, features: dict | None) -> dict:
+    """
+    Watson-shaped response for *text*, a pure function of its content.
+
+    *features* selects the sections as in a Watson request; None means
+    all three.
+    """
+    if features is None:
+        features = {"concepts": {}, "semantic_roles": {}, "emotion": {}}
+    digest = hashlib.blake2b(text.encode(), digest_size=16).digest()
+    rng = random.Random(digest)
+    words = _WORD.findall(text)
+    result: dict[str, Any] = {
+        "language": "en",
+        "usage": {
+            "text_units": 1,
+            "text_characters": len(text),
+            "features": len(features),
+        },
+    }
+
+    if "emotion" in features:
+        result["emotion"] = {"document": {"emotion": {
+            e: round(rng.random(), 6) for e in EMOTIONS
+        }}}
+
+    if "concepts" in features:
+        limit = features["concepts"].get("limit", 50)
+        candidates = list(dict.fromkeys(
+            w.strip("'’-").capitalize() for w in words
+            if len(w) > 3 and w.lower() not in _STOPWORDS
+        ))
+        picked = rng.sample(candidates, min(limit, len(candidates)))
+        relevance = sorted(
+            (round(rng.uniform(0.4, 0.99), 6) for _ in picked),
+            reverse=True,
+        )
+        result["concepts"] = [
+            {
+                "text": word,
+                "relevance": rel,
+                "dbpedia_resource": f"http://dbpedia.org/resource/{word}",
+            }
+            for word, rel in zip(picked, relevance)
+        ]
+
+    if "semantic_roles" in features:
+        limit = features["semantic_roles"].get("limit", 50)
+        roles = []
+        for sentence in _SENTENCE.findall(text):
+            tokens = _WORD.findall(sentence)
+            if len(tokens) < 3:
+                continue
+            i = rng.randrange(1, len(tokens) - 1)
+            roles.append({
+                "sentence": sentence.strip(),
+                "subject": {"text": " ".join(tokens[:i])},
+                "action": {
+                    "text": tokens[i],
+                    "normalized": tokens[i].lower(),
+                },
+                "object": {"text": " ".join(tokens[i + 1:])},
+            })
+            if len(roles) == limit:
+                break
+        result["semantic_roles"] = roles
+
+    return result
+
+
+def backend_name(dev_mode: bool) -> str:
+    """
+    The configured backend: NLU_BACKEND, else dummy in DEV_MODE and
+    watson otherwise.
+    """
+    return NLU_BACKEND or ("dummy" if dev_mode else "watson")
+
+
+def backend_identity(name: str) -> dict:
+    """
+    What distinguishes the answers of backend *name*, without building
+    it (no credentials or SDK needed).
+    """
+    if name == "http":
+        url = os.environ.get("NLU_URL", "").rstrip("/")
+        return {"backend": name, "version": f"{WATSON_VERSION}@{url}"}
+    if name == "synthetic":
+        # injected failures turn into error rows in the results
+        return {
+            "backend": name,
+            "version": SyntheticBackend.version,
+            "error_rate": NLU_SYNTHETIC_ERROR_RATE,
+            "throttle_rate": NLU_SYNTHETIC_THROTTLE_RATE,
+        }
+    versions = {
+        "dummy": DummyBackend.version,
+        "watson": WatsonBackend.version,
+    }
+    return {"backend": name, "version": versions.get(name)}
+
+
+def make_backend(name: str):
+    """
+    Build the backend called *name*; ValueError for an unknown one.
+    """
+    if name == "dummy":
+        return DummyBackend()
+    if name == "synthetic":
+        return SyntheticBackend()
+    if name == "watson":
+        return WatsonBackend(os.environ["NLU_APIKEY"], os.environ["NLU_URL"])
+    if name == "http":
+        return HttpBackend(os.environ["NLU_URL"])
+    raise ValueError(
+        f"Unknown NLU_BACKEND {name!r}; "
+        "expected watson, http, synthetic or dummy"
+    )
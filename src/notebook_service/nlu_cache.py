@@ -0,0 +1,243 @@
+# src/notebook_service/nlu_cache.py
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import unicodedata
+from pathlib import Path
+
+log = logging.getLogger(__name__)
+
+# Cache settings; the database is pod-local, since SQLite locking is not
+# reliable on network volumes such as the data/processed PVC
+DEFAULT_NLU_CACHE_PATH = (
+    Path(tempfile.gettempdir()) / "notebook-service" / "nlu.sqlite3"
+)
+NLU_CACHE_ENABLED = os.getenv("NLU_CACHE_ENABLED", "true").lower() == "true"
+NLU_CACHE_PATH = Path(os.getenv("NLU_CACHE_PATH", DEFAULT_NLU_CACHE_PATH))
+NLU_CACHE_TTL = int(os.getenv("NLU_CACHE_TTL", str(30 * 24 * 3600)))
+NLU_CACHE_MAX_MB = int(os.getenv("NLU_CACHE_MAX_MB", "100"))
+
+# SQLite caps the number of bound parameters per statement
+_CHUNK = 500
+# evict after this many stores, or once the bytes stored since the last
+# eviction pass this share of max_bytes, rather than on every store
+_EVICT_EVERY = 50
+_EVICT_SLACK = 0.05
+
+_WHITESPACE = re.compile(r"\s+")
+# typographic quotes and apostrophes, folded to their ASCII forms
+_QUOTES = str.maketrans({
+    "\u2018": "'", "\u2019": "'", "\u201a": "'", "\u201b": "'",
+    "\u2032": "'", "\u201c": '"', "\u201d": '"', "\u201e": '"',
+    "\u201f": '"', "\u2033": '"', "\u00ab": '"', "\u00bb": '"',
+})
+
+
+def normalize_text(text: str) -> str:
+    """
+    Canonical form of *text* for cache keys and deduplication: NFC,
+    ASCII quotes, single spaces, trimmed, and without a pair of quotes
+    wrapping the whole text (as left by naive CSV reading).
+    """
+    text = unicodedata.normalize("NFC", text).translate(_QUOTES)
+    text = _WHITESPACE.sub(" ", text).strip()
+    quote = text[:1]
+    if quote in ("'", '"') and len(text) >= 2 and text[-1] == quote \
+            and quote not in text[1:-1]:
+        text = text[1:-1].strip()
+    return text
+
+
+def cache_key(text: str, features, version: str) -> str:
+    """
+    Hash the normalised text, the requested features and the API version.
+    """
+    payload = json.dumps(
+        [normalize_text(text), features, version],
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class NluCache:
+    """
+    SQLite-backed cache of raw NLU responses.
+
+    Entries expire *ttl* seconds after they were stored. Once the stored
+    responses pass *max_bytes*, the least recently read are evicted;
+    eviction runs every few stores, so the cap may be briefly exceeded.
+    Lookups and stores take whole batches, so a notebook run costs one
+    transaction per batch rather than one per text. Safe to share
+    between threads, and between the kernels of one pod through a local
+    database file; do not point it at a network volume.
+    """
+
+    def __init__(self, path: Path, ttl: int, max_bytes: int):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            self.path, timeout=30, check_same_thread=False
+        )
+        with self._lock, self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " created REAL NOT NULL,"
+                " accessed REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed"
+                " ON responses (accessed)"
+            )
+
+        # stores since the last eviction; the first store always evicts
+        self._unevicted_puts = _EVICT_EVERY
+        self._unevicted_bytes = 0
+
+        # counters reported by stats()
+        self._hits = 0
+        self._misses = 0
+        self._stores = 0
+        self._evictions = 0
+
+    def get_many(self, keys) -> dict[str, dict]:
+        """
+        Cached responses for whichever of *keys* are present and fresh.
+        """
+        keys = list(dict.fromkeys(keys))
+        now = time.time()
+        found: dict[str, dict] = {}
+        with self._lock:
+            try:
+                with self._db:
+                    for i in range(0, len(keys), _CHUNK):
+                        found.update(self._read(keys[i:i + _CHUNK], now))
+            except sqlite3.Error as e:
+                # a busy or broken cache only costs NLU calls
+                log.warning("NLU cache read failed: %s", e)
+            self._hits += len(found)
+            self._misses += len(keys) - len(found)
+        return found
+
+    def _read(self, keys: list[str], now: float) -> dict[str, dict]:
+        marks = ",".join("?" * len(keys))
+        rows = self._db.execute(
+            f"SELECT key, value FROM responses"
+            f" WHERE key IN ({marks}) AND created > ?",
+            (*keys, now - self.ttl),
+        ).fetchall()
+        self._db.executemany(
+            "UPDATE responses SET accessed = ? WHERE key = ?",
+            [(now, key) for key, _ in rows],
+        )
+        return {key: json.loads(value) for key, value in rows}
+
+    def put_many(self, responses: dict[str, dict]) -> None:
+        """
+        Store *responses* (key -> raw NLU result), evicting when due.
+        """
+        if not responses:
+            return
+        now = time.time()
+        rows = []
+        for key, response in responses.items():
+            value = json.dumps(response, separators=(",", ":"))
+            rows.append((key, value, len(value), now, now))
+        with self._lock:
+            try:
+                with self._db:
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO responses"
+                        " (key, value, size, created, accessed)"
+                        " VALUES (?, ?, ?, ?, ?)",
+                        rows,
+                    )
+                    self._unevicted_puts += 1
+                    self._unevicted_bytes += sum(row[2] for row in rows)
+                    if self._evict_due():
+                        self._evict(now)
+            except sqlite3.Error as e:
+                log.warning("NLU cache write failed: %s", e)
+                return
+            self._stores += len(rows)
+
+    def _evict_due(self) -> bool:
+        return (
+            self._unevicted_puts >= _EVICT_EVERY
+            or self._unevicted_bytes > self.max_bytes * _EVICT_SLACK
+        )
+
+    def _evict(self, now: float) -> None:
+        # caller holds the lock and an open transaction
+        expired = self._db.execute(
+            "DELETE FROM responses WHERE created <= ?", (now - self.ttl,)
+        ).rowcount
+        # keep the most recently read entries that fit in max_bytes
+        over = self._db.execute(
+            "DELETE FROM responses WHERE key IN ("
+            " SELECT key FROM ("
+            "  SELECT key, SUM(size) OVER ("
+            "   ORDER BY accessed DESC, key"
+            "  ) AS running FROM responses"
+            " ) WHERE running > ?)",
+            (self.max_bytes,),
+        ).rowcount
+        self._evictions += expired + over
+        self._unevicted_puts = self._unevicted_bytes = 0
+
+    def clear(self) -> None:
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM responses")
+
+    def stats(self) -> dict:
+        with self._lock:
+            try:
+                entries, size = self._db.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0)"
+                    " FROM responses"
+                ).fetchone()
+            except sqlite3.Error:
+                entries = size = None
+            lookups = self._hits + self._misses
+            return {
+                "entries": entries,
+                "bytes": size,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0,
+                "stores": self._stores,
+                "evictions": self._evictions,
+            }
+
+
+_cache: NluCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_nlu_cache() -> NluCache | None:
+    """
+    Return the process-wide NLU cache, or None when disabled.
+    """
+    global _cache
+    if not NLU_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = NluCache(
+                NLU_CACHE_PATH,
+                ttl=NLU_CACHE_TTL,
+                max_bytes=NLU_CACHE_MAX_MB * 1024 * 1024,
+            )
+        return _cache
@@ -0,0 +1,332 @@
+# src/notebook_service/nlu_retry.py
+"""
+Retries and adaptive concurrency for NLU requests.
+
+A 429 or a transient 5xx used to fail the whole notebook run. Now
+call_with_retry() retries such failures with jittered exponential
+backoff, and waits as long as a ``Retry-After`` header asks. Every
+attempt first takes a slot from an AdaptiveLimiter. The limiter raises
+its limit by one request per window of successes and halves it on a
+throttle (AIMD).
+
+Each kernel is its own process with its own limiter, and a kernel may
+serve a single run. The learned limit is therefore kept in a small
+pod-local file (NLU_LIMITER_STATE): a new limiter starts from it rather
+than from NLU_CONCURRENCY, and a cut made by one kernel is adopted by
+the others within a second. Increases are per kernel, so kernels
+running at the same time may together send up to their limits summed.
+"""
+import email.utils
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+import requests
+
+from notebook_service import metrics
+
+log = logging.getLogger(__name__)
+
+# Retries of one text after a throttle or transient failure (0 = none)
+NLU_MAX_RETRIES = int(os.getenv("NLU_MAX_RETRIES", "5"))
+# Backoff before retry n is uniform in [0, min(MAX, BASE * 2**n)] seconds
+NLU_BACKOFF_BASE = float(os.getenv("NLU_BACKOFF_BASE", "0.5"))
+NLU_BACKOFF_MAX = float(os.getenv("NLU_BACKOFF_MAX", "30"))
+# Starting NLU concurrency limit, and the bounds it adapts within
+NLU_CONCURRENCY = int(os.getenv("NLU_CONCURRENCY", "8"))
+NLU_MIN_CONCURRENCY = int(os.getenv("NLU_MIN_CONCURRENCY", "1"))
+NLU_MAX_CONCURRENCY = int(os.getenv("NLU_MAX_CONCURRENCY", "32"))
+# Pod-local file sharing the learned limit between kernels ("" = none)
+NLU_LIMITER_STATE = os.getenv(
+    "NLU_LIMITER_STATE",
+    str(Path(tempfile.gettempdir()) / "notebook-service" / "nlu-limit.json"),
+)
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+THROTTLE_STATUSES = frozenset({429, 503})
+
+# window over which stats() reports throughput
+_THROUGHPUT_WINDOW = 60.0
+# how often a limiter looks for cuts made by other processes
+_SYNC_SECONDS = 1.0
+
+NLU_REQUESTS = metrics.Counter(
+    "notebook_service_nlu_requests_total",
+    "NLU analyze attempts by outcome (ok, throttled, error)",
+    labels=("outcome",),
+)
+NLU_RETRIES = metrics.Counter(
+    "notebook_service_nlu_retries_total",
+    "NLU analyze attempts repeated, by HTTP status or exception type",
+    labels=("reason",),
+)
+
+
+def status_of(exc: BaseException) -> int | None:
+    """
+    HTTP status carried by an NLU SDK exception, if any.
+    """
+    status = getattr(exc, "status_code", None) or getattr(exc, "code", None)
+    return status if isinstance(status, int) else None
+
+
+def retry_after(exc: BaseException) -> float | None:
+    """
+    Seconds asked for by the ``Retry-After`` header of the failed
+    response (delta-seconds or an HTTP date), or None.
+    """
+    response = getattr(exc, "http_response", None)
+    value = getattr(response, "headers", {}).get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def is_retryable(exc: BaseException) -> bool:
+    if status_of(exc) in RETRY_STATUSES:
+        return True
+    return isinstance(exc, (
+        ConnectionError,
+        TimeoutError,
+        requests.ConnectionError,
+        requests.Timeout,
+    ))
+
+
+def backoff(attempt: int, base: float, cap: float) -> float:
+    """
+    Full-jitter delay before retry number *attempt* (from 0).
+    """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit for NLU requests found by AIMD.
+
+    Each success raises the limit by ``1 / limit``, so a whole window of
+    successes adds one slot, up to *maximum*. A throttle halves it, down
+    to *minimum*, once per round trip: throttles of requests that
+    started before the last cut are ignored, as they were sent at the
+    old rate. Safe to share between threads.
+
+    With a *state_path*, the limit starts from the one saved there and
+    is saved whenever its integer value changes; a cut saved by another
+    process after this limiter's last cut is adopted.
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int,
+                 state_path: str | Path | None = None):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.state_path = Path(state_path) if state_path else None
+        self._last_cut = 0.0
+        # wall-clock time of the newest cut this limiter knows of
+        self._cut_at = 0.0
+        self._synced = time.monotonic()
+        saved = self._load()
+        if saved is not None:
+            initial = saved["limit"]
+            self._cut_at = saved.get("cut_at", 0.0)
+        self._limit = float(min(max(initial, self.minimum), self.maximum))
+        self._in_flight = 0
+        self._cond = threading.Condition()
+        self._completed: deque[float] = deque()
+
+        # counters reported by stats()
+        self._ok = 0
+        self._throttled = 0
+        self._errors = 0
+        self._retries = 0
+        self._cuts = 0
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def _load(self) -> dict | None:
+        if self.state_path is None:
+            return None
+        try:
+            state = json.loads(self.state_path.read_text())
+            float(state["limit"])
+        except (OSError, ValueError, TypeError, KeyError):
+            return None
+        return state
+
+    def _save(self) -> None:
+        # caller holds the lock
+        if self.state_path is None:
+            return
+        tmp = self.state_path.with_name(
+            f"{self.state_path.name}.{os.getpid()}.tmp"
+        )
+        try:
+            self.state_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp.write_text(json.dumps(
+                {"limit": int(self._limit), "cut_at": self._cut_at}
+            ))
+            os.replace(tmp, self.state_path)
+        except OSError as e:
+            log.debug("Could not save the NLU limit: %s", e)
+
+    def _sync(self, now: float, force: bool = False) -> bool:
+        # caller holds the lock; adopt a newer cut from another process
+        if self.state_path is None:
+            return False
+        if not force and now - self._synced < _SYNC_SECONDS:
+            return False
+        self._synced = now
+        saved = self._load()
+        if saved is None or saved.get("cut_at", 0.0) <= self._cut_at:
+            return False
+        self._cut_at = saved["cut_at"]
+        self._limit = float(
+            min(max(saved["limit"], self.minimum), self.maximum)
+        )
+        self._last_cut = now
+        return True
+
+    def acquire(self) -> float:
+        """
+        Wait for a slot; return the start time to pass to release().
+        """
+        with self._cond:
+            self._sync(time.monotonic())
+            while self._in_flight >= int(self._limit):
+                self._cond.wait()
+            self._in_flight += 1
+            return time.monotonic()
+
+    def release(self, started: float, outcome: str) -> None:
+        """
+        Free a slot; *outcome* is ``"ok"``, ``"throttled"`` or
+        ``"error"`` (a failure that says nothing about load).
+        """
+        now = time.monotonic()
+        with self._cond:
+            self._in_flight -= 1
+            before = int(self._limit)
+            if outcome == "ok":
+                self._ok += 1
+                self._limit = min(
+                    self.maximum, self._limit + 1 / self._limit
+                )
+                self._completed.append(now)
+            elif outcome == "throttled":
+                self._throttled += 1
+                if started >= self._last_cut:
+                    self._limit = max(self.minimum, self._limit / 2)
+                    self._last_cut = now
+                    self._cut_at = time.time()
+                    self._cuts += 1
+                    log.info("NLU throttled; concurrency limit now %d",
+                             int(self._limit))
+            else:
+                self._errors += 1
+            # a raise must not overwrite another process's newer cut
+            if int(self._limit) != before and (
+                outcome == "throttled" or not self._sync(now, force=True)
+            ):
+                self._save()
+            self._cond.notify_all()
+
+    def retried(self) -> None:
+        with self._cond:
+            self._retries += 1
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        with self._cond:
+            while self._completed and \
+                    self._completed[0] < now - _THROUGHPUT_WINDOW:
+                self._completed.popleft()
+            return {
+                "limit": int(self._limit),
+                "min_limit": self.minimum,
+                "max_limit": self.maximum,
+                "in_flight": self._in_flight,
+                "ok": self._ok,
+                "throttled": self._throttled,
+                "errors": self._errors,
+                "retries": self._retries,
+                "limit_cuts": self._cuts,
+                "throughput_per_second": round(
+                    len(self._completed) / _THROUGHPUT_WINDOW, 3
+                ),
+            }
+
+
+def call_with_retry(fn, limiter: AdaptiveLimiter | None = None,
+                    sleep=time.sleep):
+    """
+    Call *fn* under *limiter*, retrying throttles and transient failures.
+
+    Gives up after NLU_MAX_RETRIES retries, on a failure that is not
+    transient, or when ``Retry-After`` asks for more than
+    NLU_BACKOFF_MAX seconds; the last exception is raised. The slot is
+    released while backing off.
+    """
+    attempt = 0
+    while True:
+        started = limiter.acquire() if limiter is not None else 0.0
+        try:
+            result = fn()
+        except Exception as e:
+            status = status_of(e)
+            outcome = "throttled" if status in THROTTLE_STATUSES else "error"
+            if limiter is not None:
+                limiter.release(started, outcome)
+            NLU_REQUESTS.labels(outcome).inc()
+            if attempt >= NLU_MAX_RETRIES or not is_retryable(e):
+                raise
+            delay = retry_after(e)
+            if delay is None:
+                delay = backoff(attempt, NLU_BACKOFF_BASE, NLU_BACKOFF_MAX)
+            elif delay > NLU_BACKOFF_MAX:
+                raise
+            NLU_RETRIES.labels(status or type(e).__name__).inc()
+            if limiter is not None:
+                limiter.retried()
+            attempt += 1
+            sleep(delay)
+            continue
+        if limiter is not None:
+            limiter.release(started, "ok")
+        NLU_REQUESTS.labels("ok").inc()
+        return result
+
+
+_limiter: AdaptiveLimiter | None = None
+_limiter_lock = threading.Lock()
+
+
+def get_nlu_limiter() -> AdaptiveLimiter:
+    """
+    Return this process's NLU concurrency limiter, which shares its
+    learned limit through NLU_LIMITER_STATE.
+    """
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = AdaptiveLimiter(
+                NLU_CONCURRENCY,
+                NLU_MIN_CONCURRENCY,
+                NLU_MAX_CONCURRENCY,
+                state_path=NLU_LIMITER_STATE,
+            )
+        return _limiter
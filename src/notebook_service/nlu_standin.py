@@ -0,0 +1,80 @@
+# src/notebook_service/nlu_standin.py
+"""
+Local HTTP stand-in for Watson NLU, answering with SyntheticBackend.
+
+Serves ``POST /v1/analyze`` and ``GET /v1/models`` in Watson's JSON
+format, with the same latency and error injection as the in-process
+synthetic backend. Point the service at it to benchmark the whole
+pipeline, HTTP included, without network access:
+
+    python -m notebook_service.nlu_standin --port 8099 --latency 0.2
+    NLU_BACKEND=http NLU_URL=http://127.0.0.1:8099 ...
+"""
+import argparse
+import asyncio
+
+from fastapi import Body, FastAPI
+from fastapi.responses import ORJSONResponse
+
+from notebook_service.nlu_backends import SyntheticBackend, synthesize
+
+app = FastAPI(
+    title="NLU stand-in", default_response_class=ORJSONResponse
+)
+app.state.backend = SyntheticBackend()
+
+
+@app.post("/v1/analyze")
+async def analyze(body: dict = Body(...)):
+    delay, error = app.state.backend.draw_fault()
+    if delay:
+        await asyncio.sleep(delay)
+    if error is not None:
+        headers = getattr(error.http_response, "headers", None)
+        return ORJSONResponse(
+            {"code": error.status_code, "error": error.message},
+            status_code=error.status_code,
+            headers=headers,
+        )
+    return synthesize(body.get("text", ""), body.get("features"))
+
+
+@app.get("/v1/models")
+def list_models():
+    return {"models": []}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(
+        prog="nlu_standin",
+        description="Serve synthetic Watson NLU responses over HTTP",
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument(
+        "--latency", type=float, default=None,
+        help="Mean injected latency in seconds "
+             "(default NLU_SYNTHETIC_LATENCY)",
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=None,
+        help="Share of requests answered with a 500 "
+             "(default NLU_SYNTHETIC_ERROR_RATE)",
+    )
+    parser.add_argument(
+        "--throttle-rate", type=float, default=None,
+        help="Share of requests answered with a 429 "
+             "(default NLU_SYNTHETIC_THROTTLE_RATE)",
+    )
+    args = parser.parse_args()
+
+    backend = app.state.backend
+    if args.latency is not None:
+        backend.latency = args.latency
+    if args.error_rate is not None:
+        backend.error_rate = args.error_rate
+    if args.throttle_rate is not None:
+        backend.throttle_rate = args.throttle_rate
+    uvicorn.run(app, host=args.host, port=args.port)
@@ -0,0 +1,114 @@
+# src/notebook_service/notebook_cache.py
+import copy
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import nbformat
+from nbformat import NotebookNode
+
+# Parsed notebooks kept in memory; 0 re-reads the file every time
+NOTEBOOK_CACHE_SIZE = int(os.getenv("NOTEBOOK_CACHE_SIZE", "32"))
+
+
+def strip_outputs(nb):
+    """
+    Copy of *nb* whose code cells have no outputs or execution counts.
+
+    Only the code cells are copied; everything else is shared with *nb*.
+    """
+    stripped = copy.copy(nb)
+    stripped.cells = [
+        NotebookNode(cell, outputs=[], execution_count=None)
+        if cell.get("cell_type") == "code" else cell
+        for cell in nb.cells
+    ]
+    return stripped
+
+
+class NotebookCache:
+    """
+    LRU cache of parsed and validated notebooks.
+
+    Entries are keyed by resolved path and variant (full or stripped)
+    and remember the file's mtime and size; a file that changed on disk
+    is parsed again. Callers get a deep copy, so executing the returned
+    notebook never touches the cached one.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def read(self, path, strip: bool = False):
+        nb_path = Path(path).resolve()
+        st = nb_path.stat()
+        signature = (st.st_mtime_ns, st.st_size)
+        key = (str(nb_path), strip)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == signature:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return copy.deepcopy(entry[1])
+            self._misses += 1
+
+        nb = nbformat.read(nb_path, as_version=4)
+        if strip:
+            nb = strip_outputs(nb)
+
+        with self._lock:
+            self._entries[key] = (signature, nb)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return copy.deepcopy(nb)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_entries": self.max_entries,
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+            }
+
+
+_cache: NotebookCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_notebook_cache() -> NotebookCache | None:
+    """
+    Return the process-wide notebook cache, or None when disabled.
+    """
+    global _cache
+    if NOTEBOOK_CACHE_SIZE <= 0:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = NotebookCache(NOTEBOOK_CACHE_SIZE)
+        return _cache
+
+
+def read_notebook(path, strip: bool = False):
+    """
+    Parse *path* as an nbformat v4 notebook, through the cache if enabled.
+
+    With *strip*, code cells come back without outputs, which is all an
+    execution needs and much cheaper to copy.
+    """
+    cache = get_notebook_cache()
+    if cache is None:
+        nb = nbformat.read(path, as_version=4)
+        return strip_outputs(nb) if strip else nb
+    return cache.read(path, strip)
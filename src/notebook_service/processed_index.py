@@ -0,0 +1,262 @@
+# src/notebook_service/processed_index.py
+"""
+In-memory index of the files in PROCESSED_DIR for /processed and /files.
+
+Listing used to stat every file on every request. The index is refreshed
+by mtime polling instead. When the directory's mtime changes (a file was
+added, removed or renamed), the names are listed again and only new
+names, or names now pointing at another inode, are statted. Files
+rewritten in place leave the directory untouched, so once
+PROCESSED_INDEX_TTL has passed every file is statted again. Either way
+an unchanged file keeps its entry, along with the SHA-256 digest it
+computed on first request.
+"""
+import base64
+import bisect
+import hashlib
+import json
+import os
+import threading
+import time
+from fnmatch import fnmatchcase
+from pathlib import Path
+
+# Seconds a listing may lag behind files rewritten in place (0 = always
+# rescan)
+PROCESSED_INDEX_TTL = float(os.getenv("PROCESSED_INDEX_TTL", "2"))
+
+SORT_KEYS = ("name", "mtime", "size")
+
+
+class Entry:
+    """
+    One file of the index; *sha256* is filled in by
+    ProcessedIndex.digest() the first time it is asked for.
+    """
+
+    __slots__ = ("name", "size", "mtime_ns", "inode", "sha256")
+
+    def __init__(self, name: str, size: int, mtime_ns: int, inode: int):
+        self.name = name
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.inode = inode
+        self.sha256: str | None = None
+
+
+def _sort_key(sort: str):
+    if sort == "name":
+        return lambda e: (e.name,)
+    if sort == "mtime":
+        return lambda e: (e.mtime_ns, e.name)
+    return lambda e: (e.size, e.name)
+
+
+def encode_cursor(sort: str, order: str, entry: Entry) -> str:
+    """
+    Opaque cursor pointing just past *entry* in the given ordering.
+    """
+    key = list(_sort_key(sort)(entry))
+    raw = json.dumps([sort, order, key], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str, order: str) -> tuple:
+    """
+    Sort key stored in *cursor*; ValueError if it is malformed or was
+    issued for another ordering.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        c_sort, c_order, key = json.loads(base64.urlsafe_b64decode(padded))
+    except Exception:
+        raise ValueError("Invalid cursor") from None
+    if (c_sort, c_order) != (sort, order):
+        raise ValueError("Cursor was issued for a different sort order")
+    return tuple(key)
+
+
+class ProcessedIndex:
+    """
+    Names, sizes and mtimes of the regular files directly in *root*.
+
+    Orderings by name, mtime and size are built once per change of the
+    directory and shared by every page until the next change.
+    """
+
+    def __init__(self, root: Path, ttl: float = PROCESSED_INDEX_TTL):
+        self.root = Path(root)
+        self.ttl = ttl
+        self._entries: dict[str, Entry] = {}
+        self._views: dict[str, tuple[list, list]] = {}
+        self._dir_mtime_ns: int | None = None
+        self._scanned_at = 0.0
+        self._lock = threading.Lock()
+        self._scans = 0
+        self._reused = 0
+        self._stat_calls = 0
+        self._digests = 0
+
+    def refresh(self) -> None:
+        """
+        Rescan *root* if it changed, statting every file only once the
+        TTL expired.
+        """
+        with self._lock:
+            try:
+                dir_mtime_ns = self.root.stat().st_mtime_ns
+            except FileNotFoundError:
+                dir_mtime_ns = None
+            fresh = time.monotonic() - self._scanned_at < self.ttl
+            if fresh and dir_mtime_ns == self._dir_mtime_ns:
+                return
+            self._scan(dir_mtime_ns, full=not fresh)
+
+    def _scan(self, dir_mtime_ns: int | None, full: bool) -> None:
+        # scandir reports names, types and inodes without a stat call
+        entries = {}
+        reused = stat_calls = 0
+        if dir_mtime_ns is not None:
+            with os.scandir(self.root) as it:
+                for d in it:
+                    old = self._entries.get(d.name)
+                    try:
+                        if not d.is_file():
+                            continue
+                        if not full and old is not None \
+                                and old.inode == d.inode():
+                            entries[d.name] = old
+                            reused += 1
+                            continue
+                        st = d.stat()
+                    except FileNotFoundError:
+                        continue
+                    stat_calls += 1
+                    if old is not None and old.mtime_ns == st.st_mtime_ns \
+                            and old.size == st.st_size \
+                            and old.inode == st.st_ino:
+                        entries[d.name] = old
+                        reused += 1
+                    else:
+                        entries[d.name] = Entry(
+                            d.name, st.st_size, st.st_mtime_ns, st.st_ino
+                        )
+        if reused != len(entries) or len(entries) != len(self._entries):
+            self._views.clear()
+        self._entries = entries
+        self._dir_mtime_ns = dir_mtime_ns
+        if full:
+            # only a full pass sees files rewritten in place
+            self._scanned_at = time.monotonic()
+        self._scans += 1
+        self._reused += reused
+        self._stat_calls += stat_calls
+
+    def _view(self, sort: str) -> tuple[list, list]:
+        # (entries, keys) in ascending order; caller holds the lock
+        view = self._views.get(sort)
+        if view is None:
+            key = _sort_key(sort)
+            ordered = sorted(self._entries.values(), key=key)
+            view = (ordered, [key(e) for e in ordered])
+            self._views[sort] = view
+        return view
+
+    def page(
+        self,
+        sort: str = "name",
+        order: str = "asc",
+        limit: int = 100,
+        cursor: str | None = None,
+        prefix: str | None = None,
+        glob: str | None = None,
+    ) -> tuple[list[Entry], str | None]:
+        """
+        Up to *limit* entries after *cursor*, and the cursor of the next
+        page (None on the last page).
+
+        *prefix* and *glob* (fnmatch, case-sensitive) filter by name.
+        Raises ValueError for an unknown sort or a bad cursor.
+        """
+        if sort not in SORT_KEYS:
+            raise ValueError(f"Unknown sort {sort!r}")
+        if order not in ("asc", "desc"):
+            raise ValueError(f"Unknown order {order!r}")
+        after = decode_cursor(cursor, sort, order) if cursor else None
+
+        self.refresh()
+        with self._lock:
+            entries, keys = self._view(sort)
+
+        if order == "asc":
+            start = 0 if after is None else bisect.bisect_right(keys, after)
+            if sort == "name" and prefix:
+                # names sharing a prefix are contiguous
+                start = max(start, bisect.bisect_left(keys, (prefix,)))
+            positions = range(start, len(entries))
+        else:
+            end = (
+                len(entries) if after is None
+                else bisect.bisect_left(keys, after)
+            )
+            positions = range(end - 1, -1, -1)
+
+        found = []
+        for i in positions:
+            entry = entries[i]
+            if prefix and not entry.name.startswith(prefix):
+                if sort == "name":
+                    if (order == "asc") == (entry.name > prefix):
+                        break
+                continue
+            if glob and not fnmatchcase(entry.name, glob):
+                continue
+            if len(found) == limit:
+                return found, encode_cursor(sort, order, found[-1])
+            found.append(entry)
+        return found, None
+
+    def digest(self, entry: Entry) -> str:
+        """
+        SHA-256 of *entry*'s file, hashed once per mtime and size.
+        """
+        if entry.sha256 is None:
+            h = hashlib.sha256()
+            try:
+                with open(self.root / entry.name, "rb") as f:
+                    for chunk in iter(lambda: f.read(1 << 20), b""):
+                        h.update(chunk)
+            except FileNotFoundError:
+                # removed since the scan; the next one drops the entry
+                return "missing"
+            entry.sha256 = h.hexdigest()
+            with self._lock:
+                self._digests += 1
+        return entry.sha256
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "files": len(self._entries),
+                "scans": self._scans,
+                "reused_entries": self._reused,
+                "stat_calls": self._stat_calls,
+                "digests": self._digests,
+                "ttl_seconds": self.ttl,
+            }
+
+
+_indexes: dict[str, ProcessedIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_processed_index(root: Path) -> ProcessedIndex:
+    """
+    Return the process-wide index of *root*.
+    """
+    key = str(Path(root).resolve())
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = ProcessedIndex(root)
+        return index
@@ -0,0 +1,179 @@
+# src/notebook_service/profiling.py
+import json
+import threading
+import time
+from datetime import datetime
+
+import psutil
+
+# Upper bounds (seconds) of the per-cell latency histogram buckets
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _kernel_process(km) -> psutil.Process | None:
+    pid = getattr(getattr(km, "provisioner", None), "pid", None)
+    if pid is None:
+        return None
+    try:
+        return psutil.Process(pid)
+    except psutil.Error:
+        return None
+
+
+def _peak_rss(proc: psutil.Process) -> int | None:
+    # Linux only: high-water mark of the kernel's resident set
+    try:
+        with open(f"/proc/{proc.pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak_rss(proc: psutil.Process) -> None:
+    try:
+        with open(f"/proc/{proc.pid}/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _sample(proc: psutil.Process | None) -> tuple[float, int] | None:
+    if proc is None:
+        return None
+    try:
+        cpu = proc.cpu_times()
+        return cpu.user + cpu.system, proc.memory_info().rss
+    except psutil.Error:
+        return None
+
+
+class CellProfiler:
+    """
+    Per-cell wall time, kernel CPU time, kernel RSS growth and output size.
+
+    attach() installs nbclient hooks on a client; each executed code cell
+    then adds one record to ``cells``. Kernel figures are None when the
+    kernel process can't be inspected.
+    """
+
+    def __init__(self):
+        self.cells: list[dict] = []
+        self._client = None
+        self._start: tuple | None = None
+
+    def attach(self, client) -> None:
+        self._client = client
+        client.on_cell_execute = self._on_cell_execute
+        client.on_cell_executed = self._on_cell_executed
+
+    def _on_cell_execute(self, cell, cell_index):
+        proc = _kernel_process(self._client.km)
+        if proc is not None:
+            _reset_peak_rss(proc)
+        self._start = (time.perf_counter(), proc, _sample(proc))
+
+    def _on_cell_executed(self, cell, cell_index, execute_reply):
+        t0, proc, before = self._start
+        wall = time.perf_counter() - t0
+        after = _sample(proc)
+
+        cpu = rss_delta = peak_delta = None
+        if before is not None and after is not None:
+            cpu = round(after[0] - before[0], 6)
+            rss_delta = after[1] - before[1]
+            peak = _peak_rss(proc)
+            peak_delta = max(peak - before[1], 0) if peak else rss_delta
+
+        self.cells.append({
+            "cell": cell_index + 1,
+            "wall_seconds": round(wall, 6),
+            "cpu_seconds": cpu,
+            "rss_delta_bytes": rss_delta,
+            "peak_rss_delta_bytes": peak_delta,
+            "output_bytes": len(json.dumps(cell.get("outputs", []))),
+            "status": (execute_reply or {}).get("content", {}).get("status"),
+        })
+
+
+def cell_durations(nb) -> dict[int, float]:
+    """
+    Wall time of each executed cell (1-based) from nbclient's timing
+    metadata (``metadata.execution``).
+    """
+    durations: dict[int, float] = {}
+    for idx, cell in enumerate(nb.cells, start=1):
+        timing = (cell.get("metadata") or {}).get("execution") or {}
+        start = timing.get("iopub.status.busy")
+        end = timing.get("shell.execute_reply")
+        if not start or not end:
+            continue
+        try:
+            elapsed = (
+                datetime.fromisoformat(end) - datetime.fromisoformat(start)
+            ).total_seconds()
+        except ValueError:
+            continue
+        durations[idx] = max(elapsed, 0.0)
+    return durations
+
+
+class CellLatencyHistograms:
+    """
+    Cumulative latency histograms per notebook and cell.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._data: dict[str, dict[int, dict]] = {}
+
+    def observe(self, notebook: str, durations: dict[int, float]) -> None:
+        with self._lock:
+            cells = self._data.setdefault(notebook, {})
+            for cell, seconds in durations.items():
+                h = cells.setdefault(cell, {
+                    "count": 0,
+                    "sum": 0.0,
+                    "counts": [0] * (len(self.buckets) + 1),
+                })
+                h["count"] += 1
+                h["sum"] += seconds
+                for i, bound in enumerate(self.buckets):
+                    if seconds <= bound:
+                        h["counts"][i] += 1
+                        break
+                else:
+                    h["counts"][-1] += 1
+
+    def snapshot(self) -> dict:
+        """
+        ``{notebook: {cell: {"count", "sum", "buckets"}}}`` where
+        ``buckets`` maps each upper bound (and "+Inf") to a cumulative
+        count, as in Prometheus.
+        """
+        labels = [str(b) for b in self.buckets] + ["+Inf"]
+        with self._lock:
+            out: dict = {}
+            for notebook, cells in self._data.items():
+                out[notebook] = {}
+                for cell, h in sorted(cells.items()):
+                    running, cumulative = 0, {}
+                    for label, n in zip(labels, h["counts"]):
+                        running += n
+                        cumulative[label] = running
+                    out[notebook][cell] = {
+                        "count": h["count"],
+                        "sum": round(h["sum"], 6),
+                        "buckets": cumulative,
+                    }
+            return out
+
+
+_histograms = CellLatencyHistograms()
+
+
+def get_cell_histograms() -> CellLatencyHistograms:
+    return _histograms
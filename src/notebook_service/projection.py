@@ -0,0 +1,172 @@
+# src/notebook_service/projection.py
+"""
+Request-level projection of CellOutput records.
+
+Runs record every output mime; what a caller gets back is decided here,
+in one pass over the records, for /run, streamed runs, jobs and the CLI.
+Unless a caller names its mimes, it gets DEFAULT_MIMES, the allowlist
+runs were always filtered by.
+Large payloads that survive the projection are offloaded to the artifact
+store here too, so mimes nobody asked for are never written to disk.
+"""
+import json
+
+from notebook_service.artifacts import get_artifact_store
+
+# Mimes returned unless mimes= names others (for fmt=trimmed and raw)
+DEFAULT_MIMES = frozenset({
+    "text/plain",
+    "application/json",
+    "text/csv",
+    "image/png",
+})
+
+# Keys of a CellOutput record that fields= may select
+FIELDS = ("cell", "type", "mime", "data", "artifact", "truncated")
+
+
+def parse_cell_range(spec: str) -> tuple[int | None, int | None]:
+    """
+    Parse ``"3"``, ``"2-5"``, ``"4-"`` or ``"-2"`` (1-based, inclusive).
+    """
+    start, sep, end = spec.partition("-")
+    try:
+        first = int(start) if start.strip() else None
+        last = int(end) if end.strip() else None
+    except ValueError:
+        raise ValueError(f"Invalid cell range {spec!r}") from None
+    if not sep:
+        last = first
+    if first is not None and last is not None and first > last:
+        raise ValueError(f"Invalid cell range {spec!r}")
+    return first, last
+
+
+def _split(spec: str | None) -> list[str] | None:
+    if spec is None:
+        return None
+    return [part.strip() for part in spec.split(",") if part.strip()]
+
+
+class OutputProjection:
+    """
+    Which records, and which parts of them, a caller gets back.
+
+    - *mimes*: allowlist of mime types (None keeps every mime; stream
+      text counts as ``text/plain``).
+    - *cells*: inclusive 1-based ``(first, last)`` range; either end may
+      be None.
+    - *max_bytes*: longest inline payload. Longer text is cut, other
+      payloads are dropped; either way the record gets
+      ``"truncated": true``.
+    - *fields*: keys to keep in each record (None keeps all).
+
+    Payloads of at least ARTIFACT_MIN_BYTES are replaced by an artifact
+    reference before *max_bytes* is applied.
+
+    Records that need no change are passed through, not copied.
+    """
+
+    def __init__(
+        self,
+        mimes=None,
+        cells: tuple[int | None, int | None] | None = None,
+        max_bytes: int | None = None,
+        fields=None,
+    ):
+        self.mimes = None if mimes is None else frozenset(mimes)
+        self.first, self.last = cells or (None, None)
+        self.max_bytes = max_bytes
+        self.fields = None if fields is None else tuple(fields)
+        unknown = set(self.fields or ()) - set(FIELDS)
+        if unknown:
+            raise ValueError(
+                f"Unknown fields: {', '.join(sorted(unknown))}"
+            )
+
+    @classmethod
+    def from_query(
+        cls,
+        fmt: str = "trimmed",
+        mimes: str | None = None,
+        cells: str | None = None,
+        max_bytes: int | None = None,
+        fields: str | None = None,
+    ) -> "OutputProjection":
+        """
+        Build a projection from /run query parameters.
+
+        *mimes* and *fields* are comma-separated; ``mimes=*`` keeps every
+        mime. Without *mimes*, both ``fmt=trimmed`` and ``fmt=raw`` keep
+        DEFAULT_MIMES. Raises ValueError for malformed parameters.
+        """
+        allowed = _split(mimes)
+        if allowed is None:
+            allowed = DEFAULT_MIMES
+        elif allowed == ["*"]:
+            allowed = None
+        return cls(
+            mimes=allowed,
+            cells=parse_cell_range(cells) if cells else None,
+            max_bytes=max_bytes,
+            fields=_split(fields),
+        )
+
+    def key(self) -> tuple:
+        """
+        Hashable identity, stable across processes (used in ETags).
+        """
+        mimes = None if self.mimes is None else tuple(sorted(self.mimes))
+        return (mimes, self.first, self.last, self.max_bytes, self.fields)
+
+    def record(self, record: dict) -> dict | None:
+        """
+        Project one record; None if it is filtered out.
+        """
+        cell = record.get("cell")
+        if self.first is not None and cell < self.first:
+            return None
+        if self.last is not None and cell > self.last:
+            return None
+        if self.mimes is not None and record.get("mime") not in self.mimes:
+            return None
+
+        store = get_artifact_store()
+        if store is not None and record.get("type") != "stream":
+            record = store.offload(record)
+        if self.max_bytes is not None:
+            record = self._limit(record)
+        if self.fields is not None:
+            record = {k: record[k] for k in self.fields if k in record}
+        return record
+
+    def _limit(self, record: dict) -> dict:
+        data = record.get("data")
+        if data is None:
+            return record
+        if isinstance(data, str):
+            # a str takes at most 4 bytes per character in UTF-8
+            if len(data) * 4 <= self.max_bytes:
+                return record
+            encoded = data.encode()
+            if len(encoded) <= self.max_bytes:
+                return record
+            cut = None
+            if record.get("mime", "").startswith("text/"):
+                cut = encoded[:self.max_bytes].decode(errors="ignore")
+        elif len(json.dumps(data, default=str)) <= self.max_bytes:
+            return record
+        else:
+            cut = None
+        return {**record, "data": cut, "truncated": True}
+
+    def apply(self, result: dict) -> dict:
+        """
+        Project ``result["outputs"]``; other keys are kept as they are.
+        """
+        outputs = []
+        for record in result.get("outputs", []):
+            projected = self.record(record)
+            if projected is not None:
+                outputs.append(projected)
+        return {**result, "outputs": outputs}
@@ -0,0 +1,277 @@
+# src/notebook_service/responses.py
+"""
+Response encoding: orjson bodies, an optional MessagePack representation
+and Accept-Encoding negotiated zstd / brotli / gzip compression.
+
+brotli, zstandard and msgpack are optional (``pip install .[speedups]``);
+without them those encodings are simply never offered.
+"""
+import os
+import zlib
+
+from fastapi.responses import ORJSONResponse, Response
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Encodings offered, in server preference order ("" disables compression)
+COMPRESSION = [
+    e.strip()
+    for e in os.getenv("COMPRESSION", "zstd,br,gzip").split(",")
+    if e.strip()
+]
+# Bodies smaller than this are sent uncompressed
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+
+# Already compressed or latency-sensitive bodies are sent as they are
+UNCOMPRESSED_TYPES = (
+    "text/event-stream",
+    "image/",
+    "audio/",
+    "video/",
+    "application/gzip",
+    "application/zip",
+    "application/zstd",
+)
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+
+class _GzipCodec:
+    def __init__(self):
+        self._obj = zlib.compressobj(6, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        flush = zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH
+        return self._obj.compress(data) + self._obj.flush(flush)
+
+
+class _BrotliCodec:
+    def __init__(self):
+        self._obj = brotli.Compressor(quality=5)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        out = self._obj.process(data)
+        return out + (self._obj.finish() if final else self._obj.flush())
+
+
+class _ZstdCodec:
+    def __init__(self):
+        self._obj = zstandard.ZstdCompressor(level=3).compressobj()
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        flush = (
+            zstandard.COMPRESSOBJ_FLUSH_FINISH if final
+            else zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        )
+        return self._obj.compress(data) + self._obj.flush(flush)
+
+
+def _codecs() -> dict:
+    codecs = {"gzip": _GzipCodec}
+    if brotli is not None:
+        codecs["br"] = _BrotliCodec
+    if zstandard is not None:
+        codecs["zstd"] = _ZstdCodec
+    return codecs
+
+
+def _qvalues(header: str) -> dict[str, float]:
+    # "gzip;q=0.5, br" -> {"gzip": 0.5, "br": 1.0}
+    values = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        values[name.strip().lower()] = q
+    return values
+
+
+def choose_encoding(accept_encoding: str) -> str | None:
+    """
+    Best content-coding for an ``Accept-Encoding`` header, or None.
+
+    The client's q-values decide; ties go to the COMPRESSION order.
+    """
+    accepted = _qvalues(accept_encoding)
+    codecs = _codecs()
+    best, best_q = None, 0.0
+    for name in COMPRESSION:
+        if name not in codecs:
+            continue
+        q = accepted.get(name, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+class _CompressingResponder:
+    """
+    Compress one response with *encoding*.
+
+    The same flow as Starlette's gzip middleware, with a pluggable
+    codec. Every streamed chunk is flushed, so NDJSON lines are not held
+    back. Bodies already encoded, partial (206) responses and
+    UNCOMPRESSED_TYPES are passed through, and strong ETags become weak,
+    since the compressed bytes differ from the identity representation.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int, encoding: str):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.content_encoding = encoding
+        self.codec = _codecs()[encoding]()
+        self.send: Send | None = None
+        self.initial_message: Message = {}
+        self.started = False
+        self.passthrough = False
+
+    async def __call__(
+        self, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_with_compression)
+
+    async def send_with_compression(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            # held back until the first body says how to encode it
+            self.initial_message = message
+            headers = Headers(raw=message["headers"])
+            self.passthrough = (
+                "content-encoding" in headers
+                or message["status"] == 206
+                or headers.get("content-type", "").startswith(
+                    UNCOMPRESSED_TYPES
+                )
+            )
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.started:
+            if not self.passthrough:
+                message["body"] = self.codec.compress(body, not more_body)
+            await self.send(message)
+            return
+
+        self.started = True
+        if self.passthrough or (
+            len(body) < self.minimum_size and not more_body
+        ):
+            self.passthrough = True
+            await self.send(self.initial_message)
+            await self.send(message)
+            return
+
+        headers = MutableHeaders(raw=self.initial_message["headers"])
+        headers.add_vary_header("Accept-Encoding")
+        headers["Content-Encoding"] = self.content_encoding
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["etag"] = "W/" + etag
+        message["body"] = self.codec.compress(body, not more_body)
+        if more_body:
+            del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(len(message["body"]))
+        await self.send(self.initial_message)
+        await self.send(message)
+
+
+class CompressionMiddleware:
+    """
+    Compress responses with the best encoding the client accepts.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = COMPRESS_MIN_BYTES,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(
+        self, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        encoding = None
+        if scope["type"] == "http":
+            accept = Headers(scope=scope).get("accept-encoding", "")
+            encoding = choose_encoding(accept) if accept else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressingResponder(
+            self.app, self.minimum_size, encoding
+        )
+        await responder(scope, receive, send)
+
+
+class MsgPackResponse(Response):
+    media_type = MSGPACK_MEDIA_TYPES[0]
+
+    def render(self, content) -> bytes:
+        return msgpack.packb(content, use_bin_type=True)
+
+
+def wants_msgpack(accept: str) -> bool:
+    """
+    True if *accept* prefers MessagePack and msgpack is installed.
+    """
+    if msgpack is None or not accept:
+        return False
+    accepted = _qvalues(accept)
+    q = max(accepted.get(t, 0.0) for t in MSGPACK_MEDIA_TYPES)
+    return q > 0 and q >= accepted.get("application/json", 0.0)
+
+
+def negotiated_response(content, accept: str, **kwargs) -> Response:
+    """
+    *content* as MessagePack if the client asks for it, else orjson.
+
+    *content* is trusted (runner output), so it is not re-validated.
+    """
+    if wants_msgpack(accept):
+        response = MsgPackResponse(content, **kwargs)
+    else:
+        response = ORJSONResponse(content, **kwargs)
+    response.headers["Vary"] = "Accept"
+    return response
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Weak comparison of an ``If-None-Match`` header against *etag*.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        tag.strip().removeprefix("W/") == opaque
+        for tag in if_none_match.split(",")
+    )
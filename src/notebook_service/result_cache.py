@@ -0,0 +1,245 @@
+# src/notebook_service/result_cache.py
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+
+from notebook_service import __version__
+from notebook_service.nlu_backends import backend_identity, backend_name
+
+# Cache settings; entries live on the shared data/processed volume
+DEFAULT_RESULT_CACHE_DIR = (
+    Path(__file__).resolve().parents[2]
+    / "data" / "processed" / ".cache" / "results"
+)
+RESULT_CACHE_ENABLED = (
+    os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+)
+RESULT_CACHE_DIR = Path(
+    os.getenv("RESULT_CACHE_DIR", DEFAULT_RESULT_CACHE_DIR)
+)
+RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", "3600"))
+RESULT_CACHE_MAX_MB = int(os.getenv("RESULT_CACHE_MAX_MB", "200"))
+
+# Packages whose versions can change what a notebook produces
+FINGERPRINT_PACKAGES = [
+    "pandas",
+    "networkx",
+    "scikit-learn",
+    "matplotlib",
+    "nbclient",
+    "ibm-watson",
+]
+
+
+@lru_cache(maxsize=1)
+def environment_fingerprint() -> dict:
+    """
+    Describe the kernel environment that produced a result.
+
+    Includes the NLU backend kernels will use, so results computed
+    against a synthetic or dummy backend (e.g. by a load-test pod on the
+    shared volume) are never served to Watson-backed pods.
+    """
+    dev_mode = os.getenv("DEV_MODE", "false").lower() == "true"
+    packages = {}
+    for name in FINGERPRINT_PACKAGES:
+        try:
+            packages[name] = version(name)
+        except PackageNotFoundError:
+            packages[name] = None
+    return {
+        "python": sys.version,
+        "kernel": "python3",
+        "notebook_service": __version__,
+        "packages": packages,
+        "nlu": {
+            "dev_mode": dev_mode,
+            **backend_identity(backend_name(dev_mode)),
+        },
+    }
+
+
+def declared_inputs(nb) -> list[str]:
+    """
+    Input files listed under ``metadata.notebook_service.inputs``.
+
+    Paths are relative to the notebook's directory.
+    """
+    metadata = getattr(nb, "metadata", None) or {}
+    return list(metadata.get("notebook_service", {}).get("inputs", []))
+
+
+# Paths whose digest is remembered, least recently used dropped first
+_MAX_DIGESTS = 4096
+
+_digest_lock = threading.Lock()
+# path -> (mtime_ns, size, sha256) of the latest version seen
+_digests: OrderedDict[str, tuple[int, int, str]] = OrderedDict()
+
+
+def file_digest(path: Path) -> str:
+    """
+    SHA-256 of *path*, memoised on (path, mtime, size).
+
+    Only the latest version of each path is remembered, for at most
+    _MAX_DIGESTS paths.
+    """
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return "missing"
+    key = str(path)
+    with _digest_lock:
+        known = _digests.get(key)
+        if known and known[:2] == (st.st_mtime_ns, st.st_size):
+            _digests.move_to_end(key)
+            return known[2]
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+    with _digest_lock:
+        _digests[key] = (st.st_mtime_ns, st.st_size, digest)
+        _digests.move_to_end(key)
+        while len(_digests) > _MAX_DIGESTS:
+            _digests.popitem(last=False)
+    return digest
+
+
+def cache_key(nb_path: Path, nb) -> str:
+    """
+    Hash the notebook's code, its declared inputs and the environment.
+
+    Stored outputs are ignored, so re-saving a notebook after running it
+    in Jupyter does not invalidate the entry.
+    """
+    h = hashlib.sha256()
+    for cell in nb.cells:
+        h.update(str(cell.get("cell_type", "")).encode())
+        h.update(b"\0")
+        h.update(str(cell.get("source", "")).encode())
+        h.update(b"\0")
+    for rel in sorted(declared_inputs(nb)):
+        h.update(rel.encode())
+        h.update(file_digest((nb_path.parent / rel).resolve()).encode())
+    h.update(
+        json.dumps(environment_fingerprint(), sort_keys=True).encode()
+    )
+    return h.hexdigest()
+
+
+class ResultCache:
+    """
+    On-disk, content-addressed store of ``run_notebook`` results.
+
+    One JSON file per key. A hit bumps the file's mtime, so LRU order is
+    shared by every replica mounting the same directory. Entries older
+    than *ttl* seconds are dropped on read, and the least recently used
+    entries are evicted once the directory exceeds *max_bytes*.
+    """
+
+    def __init__(self, directory: Path, ttl: int, max_bytes: int):
+        self.directory = Path(directory)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._stores = 0
+        self._evictions = 0
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def get(self, key: str) -> dict | None:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self._count("_misses")
+            return None
+
+        if time.time() - entry.get("created", 0) > self.ttl:
+            path.unlink(missing_ok=True)
+            self._count("_misses")
+            self._count("_evictions")
+            return None
+
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        self._count("_hits")
+        return entry["result"]
+
+    def put(self, key: str, result: dict) -> None:
+        path = self._path(key)
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"created": time.time(), "result": result}, f)
+        os.replace(tmp, path)
+        self._count("_stores")
+        self._evict()
+
+    def _evict(self) -> None:
+        entries = []
+        total = 0
+        for p in self.directory.glob("*.json"):
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+            total += st.st_size
+        entries.sort()
+        for _, size, p in entries:
+            if total <= self.max_bytes:
+                break
+            p.unlink(missing_ok=True)
+            total -= size
+            self._count("_evictions")
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "stores": self._stores,
+                "evictions": self._evictions,
+            }
+
+
+_cache: ResultCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache | None:
+    """
+    Return the process-wide result cache, or None when disabled.
+    """
+    global _cache
+    if not RESULT_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache(
+                RESULT_CACHE_DIR,
+                ttl=RESULT_CACHE_TTL,
+                max_bytes=RESULT_CACHE_MAX_MB * 1024 * 1024,
+            )
+        return _cache
@@ -1,17 +1,52 @@
 # src/notebook_service/runner.py
+import asyncio
+import math
 import os
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
 
-import nbformat
-import nest_asyncio
 import pandas as pd
-from nbclient import execute
+from jupyter_core.utils import ensure_async, run_sync
+from nbclient import NotebookClient, execute
+from nbclient.exceptions import CellExecutionError, CellTimeoutError
+
+from notebook_service.forkserver import get_fork_server, kernel_manager_class
+from notebook_service.kernel_pool import (
+    KERNEL_START_SECONDS,
+    LeaseCancelled,
+    LeaseTimeout,
+    PooledKernel,
+    get_pool,
+)
+from notebook_service.notebook_cache import read_notebook
+from notebook_service.profiling import (
+    CellProfiler,
+    cell_durations,
+    get_cell_histograms,
+)
+from notebook_service.result_cache import cache_key, get_result_cache
 
 DEFAULT_NOTEBOOK_DIR = Path(__file__).resolve().parent / "notebooks"
 NOTEBOOK_DIR = Path(os.getenv("NOTEBOOK_DIR", DEFAULT_NOTEBOOK_DIR))
 
+# Longest any single cell may run, in seconds (0 = only the run deadline)
+CELL_TIMEOUT = float(os.getenv("CELL_TIMEOUT", "0"))
+
+# How often a running client checks its cancel event
+CANCEL_POLL_SECONDS = 0.2
+
+# ename of the error reply nbclient fakes when it interrupts a slow cell
+TIMEOUT_ENAME = "ExecutionTimeout"
+
 
-nest_asyncio.apply()
+class ExecutionCancelled(Exception):
+    """Raised when a run is cancelled before it finishes."""
+
+
+class ExecutionTimeout(TimeoutError):
+    """Raised when a run passes its execution deadline."""
 
 
 def load_data(path: str) -> pd.DataFrame:
@@ -21,14 +56,111 @@ def load_data(path: str) -> pd.DataFrame:
     return pd.read_csv(path)
 
 
-def run_notebook(path: str):
+class OutputHookClient(NotebookClient):
     """
-    Execute a Jupyter notebook and return a dict of its cell outputs.
+    NotebookClient that hands every new output to *on_output* as soon as
+    the kernel produces it.
 
-    - If *path* is relative, it's resolved inside NOTEBOOK_DIR.
-    - The “.ipynb” suffix is added automatically if missing.
+    Delivered outputs are not kept on the cell (unless a later
+    ``update_display_data`` may need to patch them), so memory stays flat
+    for notebooks with large outputs. A *profiler* is attached to the
+    client's cell hooks. Setting *cancel_event* interrupts the kernel
+    mid-cell instead of waiting for the cell to finish.
+    """
+
+    def __init__(
+        self,
+        nb,
+        km=None,
+        on_output=None,
+        profiler=None,
+        cancel_event: threading.Event | None = None,
+        **kw,
+    ):
+        super().__init__(nb, km=km, **kw)
+        self.on_output = on_output
+        self.cancel_event = cancel_event
+        if profiler is not None:
+            profiler.attach(self)
+
+    def output(self, outs, msg, display_id, cell_index):
+        out = super().output(outs, msg, display_id, cell_index)
+        if out is not None and self.on_output is not None:
+            self.on_output(cell_index, out)
+            if not display_id and outs and outs[-1] is out:
+                outs.pop()
+        return out
+
+    async def async_execute(self, reset_kc: bool = False, **kwargs):
+        if self.cancel_event is None:
+            return await super().async_execute(reset_kc=reset_kc, **kwargs)
+        watchdog = asyncio.ensure_future(self._interrupt_on_cancel())
+        try:
+            return await super().async_execute(reset_kc=reset_kc, **kwargs)
+        finally:
+            watchdog.cancel()
+
+    async def async_start_new_kernel(self, **kwargs) -> None:
+        with KERNEL_START_SECONDS.labels("fresh").time():
+            await super().async_start_new_kernel(**kwargs)
+
+    def execute(self, **kwargs):
+        # NotebookClient.execute wraps the base class's async_execute
+        return run_sync(self.async_execute)(**kwargs)
+
+    async def _interrupt_on_cancel(self) -> None:
+        while not self.cancel_event.is_set():
+            await asyncio.sleep(CANCEL_POLL_SECONDS)
+        # the running cell fails with KeyboardInterrupt; cells not yet
+        # started are stopped by the on_cell_start guard
+        if self.km is not None and self.kc is not None:
+            await ensure_async(self.km.interrupt_kernel())
+
+
+def execute_with_kernel(
+    nb, km, on_output=None, profiler=None, **client_kwargs
+):
+    """
+    Execute *nb* on an already-running kernel owned by the caller.
+
+    The kernel is left alive; only this run's client channels are closed.
+    """
+    client = OutputHookClient(
+        nb,
+        km=km,
+        on_output=on_output,
+        profiler=profiler,
+        kernel_name="python3",
+        **client_kwargs,
+    )
+    try:
+        return client.execute()
+    finally:
+        if client.kc is not None:
+            client.kc.stop_channels()
+
+
+def _cell_guard(
+    deadline: float | None,
+    cancel_event: threading.Event | None,
+):
+    """
+    Build an ``on_cell_start`` hook that stops the run between cells.
+    """
+    def on_cell_start(cell, cell_index):
+        if cancel_event is not None and cancel_event.is_set():
+            raise ExecutionCancelled(f"Cancelled before cell {cell_index}")
+        if deadline is not None and time.monotonic() > deadline:
+            raise ExecutionTimeout(f"Deadline passed before cell {cell_index}")
+    return on_cell_start
+
+
+def resolve_notebook_path(path: str) -> Path:
+    """
+    Resolve *path* inside NOTEBOOK_DIR, adding “.ipynb” if missing.
+
+    Raises FileNotFoundError if the notebook does not exist.
     """
-    # Resolve the notebook file path
     nb_path = Path(path)
     if nb_path.suffix != ".ipynb":
         nb_path = nb_path.with_suffix(".ipynb")
@@ -36,51 +168,395 @@ def run_notebook(path: str):
     if not nb_path.is_absolute():
         nb_path = NOTEBOOK_DIR / nb_path
 
-    nb_path = nb_path.resolve(strict=True)  # raises FileNotFoundError
+    return nb_path.resolve(strict=True)
 
-    # Load & execute
-    nb = nbformat.read(nb_path, as_version=4)
+
+def notebook_limits(nb) -> tuple[float | None, float | None]:
+    """
+    ``(timeout, cell_timeout)`` set in the notebook's own metadata::
+
+        "metadata": {"notebook_service": {"timeout": 120, "cell_timeout": 30}}
+    """
+    metadata = getattr(nb, "metadata", None) or {}
+    limits = metadata.get("notebook_service") or {}
+    return limits.get("timeout"), limits.get("cell_timeout")
+
+
+def _tightest(*limits: float | None) -> float | None:
+    set_limits = [limit for limit in limits if limit]
+    return min(set_limits) if set_limits else None
+
+
+def _deadline(nb, timeout: float | None) -> float | None:
+    # time.monotonic() at which the run must stop, if any
+    timeout = _tightest(timeout, notebook_limits(nb)[0])
+    return None if timeout is None else time.monotonic() + timeout
+
+
+def _client_kwargs(
+    nb,
+    deadline: float | None,
+    cancel_event: threading.Event | None,
+    cell_timeout: float | None,
+) -> dict:
+    client_kwargs = {}
+    if get_fork_server() is not None:
+        client_kwargs["kernel_manager_class"] = kernel_manager_class()
+
+    cell_timeout = _tightest(cell_timeout, notebook_limits(nb)[1],
+                             CELL_TIMEOUT)
+
+    if deadline is not None or cell_timeout is not None:
+        def timeout_func(cell):
+            limit = cell_timeout
+            if deadline is not None:
+                limit = _tightest(limit, deadline - time.monotonic())
+            return max(math.ceil(limit), 1)
+
+        # nbclient interrupts a cell that runs past its budget and fails
+        # the run with this error, leaving the kernel idle
+        client_kwargs["timeout_func"] = timeout_func
+        client_kwargs["interrupt_on_timeout"] = True
+        client_kwargs["error_on_timeout"] = {
+            "ename": TIMEOUT_ENAME,
+            "evalue": "Cell execution timed out",
+            "traceback": [],
+        }
+    if deadline is not None or cancel_event is not None:
+        client_kwargs["on_cell_start"] = _cell_guard(deadline, cancel_event)
+    return client_kwargs
+
+
+def _acquire(pool, cwd: str, deadline, cancel_event) -> PooledKernel:
+    # waiting for a kernel counts against the run's deadline
+    try:
+        return pool.acquire(cwd, deadline=deadline, cancel_event=cancel_event)
+    except LeaseTimeout as e:
+        raise ExecutionTimeout(str(e)) from e
+    except LeaseCancelled as e:
+        raise ExecutionCancelled(str(e)) from e
+
+
+@contextmanager
+def _stop_errors(cancel_event: threading.Event | None):
+    """
+    Re-raise nbclient errors of a timed-out or cancelled run as
+    ExecutionTimeout / ExecutionCancelled.
+    """
+    try:
+        yield
+    except CellTimeoutError as e:
+        raise ExecutionTimeout(str(e)) from e
+    except CellExecutionError as e:
+        if e.ename == TIMEOUT_ENAME:
+            raise ExecutionTimeout(e.evalue) from e
+        if cancel_event is not None and cancel_event.is_set():
+            raise ExecutionCancelled("Cancelled during a cell") from e
+        raise
+
+
+def execute_notebook(
+    nb,
+    nb_path: Path,
+    timeout: float | None = None,
+    cancel_event: threading.Event | None = None,
+    on_output=None,
+    profiler: CellProfiler | None = None,
+    cell_timeout: float | None = None,
+):
+    """
+    Execute *nb* with the pool (if enabled) or a fresh kernel.
+
+    The run stops at the tightest of *timeout* and the notebook's own
+    limit; no cell runs longer than *cell_timeout*, the notebook's
+    ``cell_timeout`` or CELL_TIMEOUT. A pooled kernel interrupted by a
+    timeout or *cancel_event* goes back to the pool.
+    """
     exec_kwargs = {
         "kernel_name": "python3",
         "cwd": str(nb_path.parent),
     }
-    executed_nb = execute(
-        nb,
-        **exec_kwargs
+    deadline = _deadline(nb, timeout)
+    client_kwargs = _client_kwargs(nb, deadline, cancel_event, cell_timeout)
+
+    pool = get_pool()
+    if pool is not None:
+        # lease a warm kernel instead of starting a fresh one
+        kernel = _acquire(pool, exec_kwargs["cwd"], deadline, cancel_event)
+        healthy = False
+        try:
+            with _stop_errors(cancel_event):
+                executed = execute_with_kernel(
+                    nb,
+                    kernel.km,
+                    on_output=on_output,
+                    profiler=profiler,
+                    cancel_event=cancel_event,
+                    **client_kwargs,
+                )
+            healthy = True
+            return executed
+        except (ExecutionCancelled, ExecutionTimeout):
+            healthy = True
+            raise
+        finally:
+            pool.release(kernel, healthy)
+
+    with _stop_errors(cancel_event):
+        if on_output is None and profiler is None and cancel_event is None:
+            return execute(
+                nb,
+                **exec_kwargs,
+                **client_kwargs
+            )
+        client = OutputHookClient(
+            nb,
+            on_output=on_output,
+            profiler=profiler,
+            cancel_event=cancel_event,
+            kernel_name=exec_kwargs["kernel_name"],
+            resources={"metadata": {"path": exec_kwargs["cwd"]}},
+            **client_kwargs,
+        )
+        return client.execute()
+
+
+async def async_execute_notebook(
+    nb,
+    nb_path: Path,
+    timeout: float | None = None,
+    cancel_event: threading.Event | None = None,
+    on_output=None,
+    profiler: CellProfiler | None = None,
+    cell_timeout: float | None = None,
+):
+    """
+    Coroutine version of execute_notebook for callers on an event loop.
+
+    Kernel start-up and messaging are awaited on the running loop; only
+    taking a kernel from the pool and handing it back (blocking
+    handshakes with the kernel) run in a worker thread.
+    """
+    cwd = str(nb_path.parent)
+    deadline = _deadline(nb, timeout)
+    client_kwargs = _client_kwargs(nb, deadline, cancel_event, cell_timeout)
+    client_kwargs.update(
+        on_output=on_output,
+        profiler=profiler,
+        cancel_event=cancel_event,
+        kernel_name="python3",
+    )
+
+    pool = get_pool()
+    if pool is None:
+        client = OutputHookClient(
+            nb, resources={"metadata": {"path": cwd}}, **client_kwargs
+        )
+        with _stop_errors(cancel_event):
+            return await client.async_execute()
+
+    kernel = await asyncio.to_thread(
+        _acquire, pool, cwd, deadline, cancel_event
     )
+    client = OutputHookClient(nb, km=kernel.km, **client_kwargs)
+    healthy = False
+    try:
+        with _stop_errors(cancel_event):
+            executed = await client.async_execute()
+        healthy = True
+        return executed
+    except (ExecutionCancelled, ExecutionTimeout):
+        # interrupted, so the kernel is idle and can be reused
+        healthy = True
+        raise
+    finally:
+        if client.kc is not None:
+            client.kc.stop_channels()
+        await asyncio.to_thread(pool.release, kernel, healthy)
+
+
+def output_records(idx: int, out) -> list[dict]:
+    """
+    Turn one nbformat output of cell *idx* into CellOutput-shaped dicts.
+    """
+    ot = out.get("output_type")
+
+    if ot == "stream":
+        return [{
+            "cell": idx,
+            "type": ot,
+            "mime": "text/plain",
+            "data": out.get("text", "")
+        }]
+
+    records: list[dict] = []
+    if ot in ("execute_result", "display_data"):
+        data_dict = out.get("data") or {}
+        # every mime is recorded inline; OutputProjection picks what is
+        # returned and offloads what is large
+        for mime_type, content in data_dict.items():
+            records.append({
+                "cell": idx,
+                "type": ot,
+                "mime": mime_type,
+                "data": content
+            })
+    return records
+
+
+def result_key(path: str) -> str | None:
+    """
+    Result-cache key of *path* as it is now, or None without a cache.
+    """
+    if get_result_cache() is None:
+        return None
+    nb_path = resolve_notebook_path(path)
+    return cache_key(nb_path, read_notebook(nb_path, strip=True))
+
+
+def _prepare_run(path: str, profile: bool):
+    nb_path = resolve_notebook_path(path)
+
+    # Load & execute
+    nb = read_notebook(nb_path, strip=True)
+
+    # Serve unchanged notebook + inputs straight from the result cache
+    key = cached = None
+    cache = get_result_cache()
+    if cache is not None:
+        key = cache_key(nb_path, nb)
+        cached = None if profile else cache.get(key)
+    return nb_path, nb, key, cached
+
+
+def _collect_run(nb_path: Path, executed_nb, key, profiler) -> dict:
+    record_latency(nb_path, executed_nb, profiler)
 
     # Structured objects with type and data
     collected: list[dict] = []
-    allowed_mimes = {
-        "text/plain",
-        "application/json",
-        "text/csv",
-        "image/png",
-    }
-
     for idx, cell in enumerate(executed_nb.cells, start=1):
         for out in cell.get("outputs", []):
-            ot = out.get("output_type")
-
-            if ot == "stream":
-                collected.append({
-                    "cell": idx,
-                    "type": ot,
-                    "mime": "text/plain",
-                    "data": out.get("text", "")
-                })
-                continue
-
-            if ot in ("execute_result", "display_data"):
-                data_dict = out.get("data") or {}
-                for mime_type, content in data_dict.items():
-                    if mime_type not in allowed_mimes:
-                        continue
-                    collected.append({
-                        "cell": idx,
-                        "type": ot,
-                        "mime": mime_type,
-                        "data": content
-                    })
-
-    return {"outputs": collected}
+            collected.extend(output_records(idx, out))
+
+    result = {"outputs": collected}
+    cache = get_result_cache()
+    if cache is not None and key is not None:
+        cache.put(key, result)
+    if profiler is not None:
+        result["profile"] = profiler.cells
+    return result
+
+
+def run_notebook(
+    path: str,
+    timeout: float | None = None,
+    cancel_event: threading.Event | None = None,
+    profile: bool = False,
+    cell_timeout: float | None = None,
+):
+    """
+    Execute a Jupyter notebook and return a dict of its cell outputs.
+
+    - If *path* is relative, it's resolved inside NOTEBOOK_DIR.
+    - The “.ipynb” suffix is added automatically if missing.
+    - *timeout* bounds the run and *cell_timeout* each cell, in seconds
+      (ExecutionTimeout); setting *cancel_event* interrupts the kernel
+      and stops the run (ExecutionCancelled).
+    - With *profile*, the notebook is always executed (never served from
+      the cache) and a per-cell ``profile`` list is added to the result.
+    """
+    nb_path, nb, key, cached = _prepare_run(path, profile)
+    if cached is not None:
+        return cached
+
+    profiler = CellProfiler() if profile else None
+    executed_nb = execute_notebook(
+        nb,
+        nb_path,
+        timeout,
+        cancel_event,
+        profiler=profiler,
+        cell_timeout=cell_timeout,
+    )
+    return _collect_run(nb_path, executed_nb, key, profiler)
+
+
+async def async_run_notebook(
+    path: str,
+    timeout: float | None = None,
+    cancel_event: threading.Event | None = None,
+    profile: bool = False,
+    cell_timeout: float | None = None,
+):
+    """
+    Coroutine version of run_notebook: same arguments and result.
+
+    File and cache I/O go to a worker thread; the kernel run itself is a
+    coroutine on the caller's loop.
+    """
+    nb_path, nb, key, cached = await asyncio.to_thread(
+        _prepare_run, path, profile
+    )
+    if cached is not None:
+        return cached
+
+    profiler = CellProfiler() if profile else None
+    executed_nb = await async_execute_notebook(
+        nb,
+        nb_path,
+        timeout,
+        cancel_event,
+        profiler=profiler,
+        cell_timeout=cell_timeout,
+    )
+    return await asyncio.to_thread(
+        _collect_run, nb_path, executed_nb, key, profiler
+    )
+
+
+def record_latency(nb_path: Path, executed_nb, profiler=None) -> None:
+    """
+    Add this run's per-cell wall times to the latency histograms.
+    """
+    if profiler is not None:
+        durations = {c["cell"]: c["wall_seconds"] for c in profiler.cells}
+    else:
+        durations = cell_durations(executed_nb)
+    get_cell_histograms().observe(nb_path.name, durations)
+
+
+async def async_stream_notebook(
+    path: str,
+    on_output,
+    timeout: float | None = None,
+    cancel_event: threading.Event | None = None,
+    cell_timeout: float | None = None,
+) -> None:
+    """
+    Execute a notebook, calling ``on_output(record)`` for each CellOutput
+    dict as soon as the kernel produces it.
+
+    A cached result is replayed as-is; fresh runs are not cached, since
+    their outputs are never held in memory all at once.
+    """
+    nb_path, nb, _, cached = await asyncio.to_thread(
+        _prepare_run, path, False
+    )
+    if cached is not None:
+        for record in cached["outputs"]:
+            on_output(record)
+        return
+
+    def emit(cell_index, out):
+        for record in output_records(cell_index + 1, out):
+            on_output(record)
+
+    executed_nb = await async_execute_notebook(
+        nb,
+        nb_path,
+        timeout,
+        cancel_event,
+        on_output=emit,
+        cell_timeout=cell_timeout,
+    )
+    record_latency(nb_path, executed_nb)
@@ -11,12 +11,73 @@ class OutputType(str, Enum):
     display_data = "display_data"
 
 
+class ArtifactRef(BaseModel):
+    sha256: str
+    mime: str
+    size: int
+    url: str
+
+
 class CellOutput(BaseModel):
     cell: int
     type: OutputType
     mime: str
     data: Any
+    # set instead of inline data when the payload was offloaded
+    artifact: ArtifactRef | None = None
+    # set when the payload was cut or dropped by max_bytes
+    truncated: bool | None = None
+
+
+class CellProfile(BaseModel):
+    cell: int
+    wall_seconds: float
+    cpu_seconds: float | None = None
+    rss_delta_bytes: int | None = None
+    peak_rss_delta_bytes: int | None = None
+    output_bytes: int
+    status: str | None = None
 
 
 class NotebookOutputs(BaseModel):
     outputs: list[CellOutput]
+    # set by incremental runs: cells actually executed, numbered like
+    # CellOutput.cell (1-based, markdown cells included)
+    executed_cells: list[int] | None = None
+    # set by /run?profile=true
+    profile: list[CellProfile] | None = None
+
+
+class JobStatus(str, Enum):
+    queued = "queued"
+    running = "running"
+    succeeded = "succeeded"
+    failed = "failed"
+    cancelled = "cancelled"
+    timeout = "timeout"
+
+
+class JobInfo(BaseModel):
+    id: str
+    notebook: str
+    fmt: str
+    status: JobStatus
+    submitted_at: float
+    started_at: float | None = None
+    finished_at: float | None = None
+    error: str | None = None
+    result: NotebookOutputs | None = None
+
+
+class ProcessedFile(BaseModel):
+    name: str
+    size: int
+    # seconds since the epoch
+    mtime: float
+    sha256: str
+
+
+class ProcessedPage(BaseModel):
+    items: list[ProcessedFile]
+    # pass as ?cursor= to get the next page; None on the last page
+    next_cursor: str | None = None
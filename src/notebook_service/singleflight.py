@@ -0,0 +1,78 @@
+# src/notebook_service/singleflight.py
+import asyncio
+import threading
+from typing import Awaitable, Callable, Hashable
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task, cancel_event: threading.Event):
+        self.task = task
+        self.cancel_event = cancel_event
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key into one execution.
+
+    The first caller for a key starts ``start(cancel_event)``; callers
+    arriving while it is in flight wait on the same task and receive its
+    result (or exception). A waiter that is cancelled leaves the flight;
+    once the last waiter has left, *cancel_event* is set so the run can
+    stop. Meant to be used from the event loop only.
+    """
+
+    def __init__(self):
+        self._flights: dict[Hashable, _Flight] = {}
+
+        # counters reported by stats()
+        self._executions = 0
+        self._coalesced = 0
+        self._abandoned = 0
+
+    async def run(
+        self,
+        key: Hashable,
+        start: Callable[[threading.Event], Awaitable],
+    ):
+        flight = self._flights.get(key)
+        if flight is None or flight.cancel_event.is_set():
+            # nobody waits on a cancelled flight; start afresh
+            cancel_event = threading.Event()
+            flight = _Flight(
+                asyncio.ensure_future(start(cancel_event)), cancel_event
+            )
+            self._flights[key] = flight
+            flight.task.add_done_callback(
+                lambda task: self._forget(key, flight)
+            )
+            self._executions += 1
+        else:
+            self._coalesced += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                flight.cancel_event.set()
+                self._abandoned += 1
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def _forget(self, key: Hashable, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if not flight.task.cancelled():
+            # an abandoned flight's error has nobody to report to
+            flight.task.exception()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._flights),
+            "waiting": sum(f.waiters for f in self._flights.values()),
+            "executions": self._executions,
+            "coalesced": self._coalesced,
+            "abandoned": self._abandoned,
+        }
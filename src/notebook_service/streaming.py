@@ -0,0 +1,76 @@
+# src/notebook_service/streaming.py
+import asyncio
+import json
+import threading
+from typing import AsyncIterator
+
+from notebook_service.projection import OutputProjection
+from notebook_service.runner import async_stream_notebook
+
+STREAM_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "sse": "text/event-stream",
+}
+
+_DONE = object()
+
+
+def encode_event(record: dict, fmt: str, event: str = "output") -> str:
+    """
+    Frame one record as an NDJSON line or a Server-Sent Event.
+    """
+    payload = json.dumps(record)
+    if fmt == "sse":
+        return f"event: {event}\ndata: {payload}\n\n"
+    return payload + "\n"
+
+
+async def stream_outputs(
+    path: str,
+    fmt: str,
+    projection: OutputProjection | None = None,
+    timeout: float | None = None,
+    cell_timeout: float | None = None,
+) -> AsyncIterator[str]:
+    """
+    Run *path* on the current loop and yield each CellOutput as it arrives.
+
+    Records are passed through *projection*, if given, as they arrive.
+    A failed or timed-out run ends the stream with an ``error`` record.
+    If the client goes away, the kernel is interrupted and the run stops.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    cancel = threading.Event()
+
+    # the run is a coroutine on this loop, so outputs go straight in
+    task = asyncio.ensure_future(
+        async_stream_notebook(
+            path,
+            queue.put_nowait,
+            timeout=timeout,
+            cancel_event=cancel,
+            cell_timeout=cell_timeout,
+        )
+    )
+    task.add_done_callback(lambda _: queue.put_nowait(_DONE))
+
+    try:
+        while True:
+            record = await queue.get()
+            if record is _DONE:
+                break
+            if projection is not None:
+                # offloading hashes and writes large payloads
+                record = await asyncio.to_thread(projection.record, record)
+                if record is None:
+                    continue
+            yield encode_event(record, fmt)
+
+        exc = task.exception()
+        if exc is not None:
+            error = {"error": f"{type(exc).__name__}: {exc}"}
+            yield encode_event(error, fmt, event="error")
+        elif fmt == "sse":
+            yield encode_event({}, fmt, event="end")
+    finally:
+        cancel.set()
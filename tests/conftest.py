@@ -9,7 +9,13 @@ import nbformat
 import pytest
 from fastapi.testclient import TestClient
 
+import notebook_service.artifacts as artifacts_mod
+import notebook_service.incremental as incremental_mod
 import notebook_service.main as main_mod
+import notebook_service.nlu_cache as nlu_cache_mod
+import notebook_service.nlu_retry as nlu_retry_mod
+import notebook_service.notebook_cache as notebook_cache_mod
+import notebook_service.result_cache as result_cache_mod
 import notebook_service.runner as runner_mod
 
 
@@ -100,3 +106,50 @@ def dummy_nb():
 def patch_notebook_dir(monkeypatch, tmp_path):
     monkeypatch.setenv("NOTEBOOK_DIR", str(tmp_path))
     monkeypatch.setattr(runner_mod, "NOTEBOOK_DIR", tmp_path, raising=False)
+
+
+@pytest.fixture(autouse=True)
+def isolate_result_cache(monkeypatch, tmp_path):
+    # keep cached run results out of the repo's data/processed
+    monkeypatch.setattr(
+        result_cache_mod, "RESULT_CACHE_DIR", tmp_path / ".cache" / "results"
+    )
+    monkeypatch.setattr(result_cache_mod, "_cache", None)
+
+
+@pytest.fixture(autouse=True)
+def isolate_incremental_state(monkeypatch, tmp_path):
+    monkeypatch.setattr(
+        incremental_mod, "INCREMENTAL_DIR", tmp_path / ".cache" / "incr"
+    )
+
+
+@pytest.fixture(autouse=True)
+def isolate_artifacts(monkeypatch, tmp_path):
+    monkeypatch.setattr(
+        artifacts_mod, "ARTIFACT_DIR", tmp_path / "artifacts"
+    )
+    monkeypatch.setattr(artifacts_mod, "_store", None)
+
+
+@pytest.fixture(autouse=True)
+def isolate_notebook_cache(monkeypatch):
+    monkeypatch.setattr(notebook_cache_mod, "_cache", None)
+
+
+@pytest.fixture(autouse=True)
+def isolate_nlu_cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(
+        nlu_cache_mod, "NLU_CACHE_PATH", tmp_path / ".cache" / "nlu.sqlite3"
+    )
+    monkeypatch.setattr(nlu_cache_mod, "_cache", None)
+
+
+@pytest.fixture(autouse=True)
+def fast_nlu_retries(monkeypatch, tmp_path):
+    # retries are exercised without real backoff sleeps
+    monkeypatch.setattr(nlu_retry_mod, "NLU_BACKOFF_BASE", 0.0)
+    monkeypatch.setattr(nlu_retry_mod, "_limiter", None)
+    monkeypatch.setattr(
+        nlu_retry_mod, "NLU_LIMITER_STATE", str(tmp_path / "nlu-limit.json")
+    )
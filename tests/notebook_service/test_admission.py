@@ -0,0 +1,144 @@
+import asyncio
+import importlib
+import threading
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from notebook_service import main as app_main
+from notebook_service.admission import AdmissionController, AdmissionRejected
+from notebook_service.projection import OutputProjection
+
+
+def test_slots_queue_and_reject():
+    async def scenario():
+        ctl = AdmissionController(max_concurrent=1, max_queue=1)
+        order = []
+        gate = asyncio.Event()
+
+        async def work(name):
+            async with ctl.slot():
+                order.append(name)
+                await gate.wait()
+
+        first = asyncio.create_task(work("first"))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(work("second"))
+        await asyncio.sleep(0)
+        assert ctl.stats()["running"] == 1
+        assert ctl.stats()["queued"] == 1
+
+        # one running, one waiting: the next caller is turned away
+        with pytest.raises(AdmissionRejected) as exc:
+            await ctl.acquire()
+        assert exc.value.retry_after >= 1
+
+        gate.set()
+        await asyncio.gather(first, second)
+        return ctl.stats(), order
+
+    stats, order = asyncio.run(scenario())
+    assert order == ["first", "second"]
+    assert stats["running"] == 0
+    assert stats["queued"] == 0
+    assert stats["admitted"] == 2
+    assert stats["rejected"] == 1
+    assert stats["wait_seconds_max"] > 0
+
+
+def test_cancelled_waiter_leaves_queue():
+    async def scenario():
+        ctl = AdmissionController(max_concurrent=1, max_queue=4)
+        held = await ctl.acquire()
+        waiter = asyncio.create_task(ctl.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert ctl.stats()["queued"] == 0
+        ctl.release(held)
+        return ctl.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["running"] == 0
+    assert stats["admitted"] == 1
+
+
+def test_run_returns_503_when_saturated(
+    sample_notebook, auth_header, monkeypatch
+):
+    sample_notebook(name="foo")
+    importlib.reload(app_main)
+    monkeypatch.setattr(
+        app_main, "admission", AdmissionController(0, 0)
+    )
+    client = TestClient(app_main.app)
+    # DEV mode answers /run before admission
+    monkeypatch.setattr(app_main, "DEV", False)
+
+    resp = client.get(
+        "/run", params={"notebook": "foo.ipynb"}, headers=auth_header
+    )
+    assert resp.status_code == 503
+    assert int(resp.headers["Retry-After"]) >= 1
+    stats = client.get("/stats", headers=auth_header).json()
+    assert stats["admission"]["rejected"] == 1
+
+
+def test_streamed_run_releases_its_slot_however_it_ends(monkeypatch):
+    async def scenario():
+        ctl = AdmissionController(max_concurrent=2, max_queue=0)
+        monkeypatch.setattr(app_main, "admission", ctl)
+
+        async def body():
+            yield "never sent"
+
+        async def gone(message):
+            raise OSError("client went away")
+
+        # the client leaves before the first chunk
+        response = app_main._AdmittedStreamingResponse(
+            body(), await ctl.acquire()
+        )
+        with pytest.raises(Exception):
+            await response({"type": "http"}, None, gone)
+        # released once, even if asked again
+        response.release()
+        assert ctl.stats()["running"] == 0
+
+        # the handler's response is dropped without being sent
+        response = app_main._AdmittedStreamingResponse(
+            body(), await ctl.acquire()
+        )
+        assert ctl.stats()["running"] == 1
+        del response
+        return ctl.stats()
+
+    assert asyncio.run(scenario())["running"] == 0
+
+
+def test_run_abandoned_while_queued_does_not_start(monkeypatch, tmp_path):
+    started = []
+
+    async def fake_run(path, **kwargs):
+        started.append(path)
+        return {"outputs": []}
+
+    monkeypatch.setattr(app_main, "async_run_notebook", fake_run)
+
+    async def scenario():
+        ctl = AdmissionController(max_concurrent=1, max_queue=1)
+        monkeypatch.setattr(app_main, "admission", ctl)
+        cancel = threading.Event()
+        cancel.set()
+        with pytest.raises(HTTPException) as exc:
+            await app_main._execute_run(
+                tmp_path / "foo.ipynb", OutputProjection(), "kernel",
+                False, False, None, None, cancel,
+            )
+        assert exc.value.status_code == 499
+        return ctl.stats()
+
+    assert asyncio.run(scenario())["running"] == 0
+    assert started == []
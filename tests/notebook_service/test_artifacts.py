@@ -0,0 +1,118 @@
+import base64
+import importlib
+
+from fastapi.testclient import TestClient
+
+import notebook_service.artifacts as artifacts_mod
+from notebook_service import main as app_main
+from notebook_service.artifacts import ArtifactStore
+from notebook_service.projection import OutputProjection
+from notebook_service.runner import output_records
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\0" * 200
+
+
+def png_output():
+    return {
+        "output_type": "display_data",
+        "data": {
+            "image/png": base64.b64encode(PNG).decode(),
+            "text/plain": "<Figure>",
+        },
+    }
+
+
+def test_small_payload_stays_inline(tmp_path):
+    store = ArtifactStore(tmp_path, min_bytes=1024, max_bytes=1 << 20)
+    record = {"cell": 1, "type": "display_data", "mime": "text/plain",
+              "data": "hi"}
+    assert store.offload(record) is record
+    assert store.stats()["offloaded"] == 0
+
+
+def test_large_payload_is_stored_once(tmp_path):
+    store = ArtifactStore(tmp_path, min_bytes=100, max_bytes=1 << 20)
+    record = {"cell": 2, "type": "display_data", "mime": "image/png",
+              "data": base64.b64encode(PNG).decode()}
+
+    first = store.offload(record)
+    second = store.offload(dict(record, cell=5))
+
+    ref = first["artifact"]
+    assert first["data"] is None
+    assert ref["mime"] == "image/png"
+    assert ref["size"] == len(PNG)
+    assert ref["url"] == f"/processed/artifacts/{ref['sha256']}.png"
+    # identical payloads share one file
+    assert second["artifact"] == ref
+    assert (tmp_path / f"{ref['sha256']}.png").read_bytes() == PNG
+    assert store.stats()["written"] == 1
+    assert store.stats()["offloaded"] == 2
+
+
+def test_least_recently_offloaded_are_evicted(tmp_path):
+    store = ArtifactStore(tmp_path, min_bytes=100, max_bytes=2500)
+    refs = []
+    for i in range(3):
+        record = {"cell": 1, "type": "display_data", "mime": "text/csv",
+                  "data": str(i) * 1000}
+        refs.append(store.offload(record)["artifact"])
+        # reusing the first artifact makes it the most recent
+        store.offload({**record, "data": "0" * 1000})
+
+    names = {p.name for p in tmp_path.iterdir()}
+    assert names == {
+        f"{refs[0]['sha256']}.csv", f"{refs[2]['sha256']}.csv"
+    }
+    assert store.stats()["evictions"] == 1
+
+
+def test_directory_is_listed_only_when_eviction_is_due(tmp_path):
+    store = ArtifactStore(tmp_path, min_bytes=100, max_bytes=5500)
+    listings = []
+    evict = store._evict
+    store._evict = lambda keep: listings.append(keep) or evict(keep)
+
+    for i in range(7):
+        store.offload({"cell": 1, "type": "display_data",
+                       "mime": "text/csv", "data": str(i) * 1000})
+    # once to learn the size, then only on the sixth write, which goes
+    # over the cap and deletes down to 90% of it
+    assert len(listings) == 2
+    assert len(list(tmp_path.iterdir())) == 5
+    assert store.stats()["evictions"] == 2
+
+
+def test_only_projected_outputs_are_offloaded(monkeypatch, tmp_path):
+    monkeypatch.setattr(artifacts_mod, "ARTIFACT_MIN_BYTES", 100)
+    records = output_records(3, png_output())
+    assert all("artifact" not in r for r in records)
+
+    projected = OutputProjection(mimes={"text/plain"}).apply(
+        {"outputs": records}
+    )
+    assert projected["outputs"] == [records[1]]
+    assert not any((tmp_path / "artifacts").iterdir())
+
+
+def test_projected_outputs_offload_and_download(monkeypatch, auth_header):
+    monkeypatch.setattr(artifacts_mod, "ARTIFACT_MIN_BYTES", 100)
+
+    records = OutputProjection().apply(
+        {"outputs": output_records(3, png_output())}
+    )["outputs"]
+    by_mime = {r["mime"]: r for r in records}
+    assert by_mime["text/plain"]["data"] == "<Figure>"
+    ref = by_mime["image/png"]["artifact"]
+    assert ref is not None
+
+    importlib.reload(app_main)
+    client = TestClient(app_main.app)
+    resp = client.get(ref["url"], headers=auth_header)
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "image/png"
+    assert resp.content == PNG
+
+    for bad in ("artifacts/../secret", "artifacts/nothex.png", "a/b"):
+        resp = client.get(f"/processed/{bad}", headers=auth_header)
+        assert resp.status_code == 404
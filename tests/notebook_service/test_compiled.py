@@ -0,0 +1,142 @@
+import importlib
+from concurrent.futures import ThreadPoolExecutor
+
+import nbformat
+import pytest
+from fastapi.testclient import TestClient
+
+import notebook_service.compiled as compiled_mod
+from notebook_service import main as app_main
+from notebook_service.compiled import (
+    CompiledCell,
+    CompiledCellError,
+    CompiledEngine,
+    UnsupportedNotebook,
+    run_compiled,
+    run_in_worker,
+)
+from notebook_service.runner import ExecutionTimeout
+
+
+def write_notebook(path, *sources):
+    nb = nbformat.v4.new_notebook()
+    nb.cells = [nbformat.v4.new_markdown_cell("# compiled")]
+    nb.cells += [nbformat.v4.new_code_cell(src) for src in sources]
+    path.write_text(nbformat.writes(nb))
+    return path
+
+
+def test_cell_splits_trailing_expression():
+    assert CompiledCell(1, "x = 1\nx + 1", "nb").expr is not None
+    assert CompiledCell(1, "x = 1\nx + 1;", "nb").expr is None
+    assert CompiledCell(1, "%matplotlib inline\nx = 1", "nb").expr is None
+    with pytest.raises(UnsupportedNotebook):
+        CompiledCell(1, "!pip install pandas", "nb")
+
+
+def test_run_in_worker_captures_outputs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = write_notebook(
+        tmp_path / "nb.ipynb",
+        "import matplotlib\nmatplotlib.use('Agg')\n"
+        "import matplotlib.pyplot as plt\nprint('hi')\nx = 41",
+        "x + 1",
+        "display([1, 2])\nplt.plot([1, 2])\nNone",
+    )
+
+    outputs = run_in_worker(str(path))
+    kinds = [(cell, out["output_type"]) for cell, out in outputs]
+
+    assert kinds == [
+        (2, "stream"),
+        (3, "execute_result"),
+        (4, "display_data"),
+        (4, "display_data"),
+    ]
+    assert outputs[0][1]["text"] == "hi\n"
+    assert outputs[1][1]["data"] == {"text/plain": "42"}
+    assert outputs[2][1]["data"] == {"text/plain": "[1, 2]"}
+    assert "image/png" in outputs[3][1]["data"]
+
+
+def test_cell_error_names_the_cell(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = write_notebook(tmp_path / "bad.ipynb", "x = 1", "1 / 0")
+    with pytest.raises(CompiledCellError) as exc:
+        run_in_worker(str(path))
+    assert exc.value.cell == 3
+    assert "ZeroDivisionError" in str(exc.value)
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    e = CompiledEngine(workers=1, preload=[])
+    monkeypatch.setattr(compiled_mod, "_engine", e)
+    yield e
+    e.shutdown()
+
+
+def test_run_compiled_in_worker_pool(tmp_path, engine):
+    write_notebook(tmp_path / "pool.ipynb", "import os\nos.getpid()")
+    outputs = run_compiled("pool")["outputs"]
+
+    assert outputs[0]["cell"] == 2
+    assert outputs[0]["type"] == "execute_result"
+    assert int(outputs[0]["data"]) != __import__("os").getpid()
+    assert engine.stats()["runs"] == 1
+
+
+def test_timeout_replaces_worker_pool(tmp_path, engine):
+    write_notebook(tmp_path / "slow.ipynb", "import time\ntime.sleep(30)")
+    write_notebook(tmp_path / "fast.ipynb", "1 + 1")
+
+    with pytest.raises(ExecutionTimeout):
+        run_compiled("slow", timeout=1)
+    assert engine.stats()["resets"] == 1
+    assert run_compiled("fast")["outputs"][0]["data"] == "2"
+
+
+def test_timeout_spares_runs_on_other_workers(tmp_path, monkeypatch):
+    engine = CompiledEngine(workers=2, preload=[])
+    monkeypatch.setattr(compiled_mod, "_engine", engine)
+    write_notebook(tmp_path / "slow.ipynb", "import time\ntime.sleep(30)")
+    write_notebook(
+        tmp_path / "busy.ipynb", "import time\ntime.sleep(3)\n1 + 1"
+    )
+    try:
+        with ThreadPoolExecutor(2) as pool:
+            busy = pool.submit(run_compiled, "busy", timeout=60)
+            slow = pool.submit(run_compiled, "slow", timeout=2)
+            with pytest.raises(ExecutionTimeout):
+                slow.result()
+            assert busy.result()["outputs"][0]["data"] == "2"
+        stats = engine.stats()
+        assert (stats["runs"], stats["resets"]) == (1, 1)
+        assert stats["running"]
+    finally:
+        engine.shutdown()
+
+
+def test_run_endpoint_rejects_unsupported_modes(
+    sample_notebook, auth_header, monkeypatch
+):
+    sample_notebook(name="foo")
+    importlib.reload(app_main)
+    client = TestClient(app_main.app)
+    monkeypatch.setattr(app_main, "DEV", False)
+    resp = client.get(
+        "/run",
+        params={"notebook": "foo.ipynb", "engine": "compiled",
+                "stream": "ndjson"},
+        headers=auth_header,
+    )
+    assert resp.status_code == 400
+
+    for params in ({"engine": "compiled"}, {"incremental": "true"}):
+        resp = client.get(
+            "/run",
+            params={"notebook": "foo.ipynb", "cell_timeout": 5, **params},
+            headers=auth_header,
+        )
+        assert resp.status_code == 422
+        assert "cell_timeout" in resp.json()["detail"]
@@ -2,6 +2,7 @@
 import importlib
 import os
 import sys
+import time
 
 import pandas as pd
 import pytest
@@ -42,7 +43,7 @@ def test_get_analysis_dummy_stub_outputs(monkeypatch):
     expected_cols = [
         "text",
         "anger", "disgust", "fear", "joy", "sadness",
-        "concepts_raw", "concepts", "semantic_roles",
+        "concepts_raw", "concepts", "semantic_roles", "error",
     ]
     assert list(df.columns) == expected_cols
 
@@ -79,13 +80,14 @@ def test_get_analysis_real_path_parses_concepts_and_roles(monkeypatch):
         ],
     }
 
-    # Stub NLU_CLIENT.analyze(...) so it returns an object with get_result()
+    # Stub the SDK client's analyze(...) so it returns an object with
+    # get_result()
     class FakeResp:
         def get_result(self):
             return fake_raw
 
     monkeypatch.setattr(
-        emo.NLU_CLIENT,
+        emo.NLU_CLIENT.client,
         "analyze",
         lambda *args, **kwargs: FakeResp()
     )
@@ -97,7 +99,7 @@ def test_get_analysis_real_path_parses_concepts_and_roles(monkeypatch):
     expected_cols = [
         "text",
         "anger", "disgust", "fear", "joy", "sadness",
-        "concepts_raw", "concepts", "semantic_roles",
+        "concepts_raw", "concepts", "semantic_roles", "error",
     ]
     assert list(df.columns) == expected_cols
 
@@ -113,3 +115,65 @@ def test_get_analysis_real_path_parses_concepts_and_roles(monkeypatch):
     assert row["concepts"] == ["Alpha", "Beta"]
     # semantic_roles is list of tuples
     assert row["semantic_roles"] == [("Brittany", "writes", "code")]
+
+
+def test_get_analysis_keeps_order_and_captures_failures(monkeypatch):
+    # restore DEV_MODE afterwards; later tests reload main
+    monkeypatch.setenv("DEV_MODE", "true")
+    emo = reload_emotion(dev_mode=True)
+    real_analyze = emo.NLU_CLIENT.analyze
+
+    def analyze(*, text, features):
+        # later texts answer first
+        time.sleep(0.02 * (5 - int(text)))
+        if text == "3":
+            raise ConnectionError("reset by peer")
+        return real_analyze(text=text, features=features)
+
+    monkeypatch.setattr(emo.NLU_CLIENT, "analyze", analyze)
+    df = emo.get_analysis([str(i) for i in range(5)], concurrency=5)
+
+    assert df["text"].tolist() == ["0", "1", "2", "3", "4"]
+    assert df["error"].tolist() == [
+        None, None, None, "ConnectionError: reset by peer", None
+    ]
+    assert df.loc[3, "concepts_raw"] == []
+    assert pd.isna(df.loc[3, "joy"])
+    assert df.loc[4, "joy"] == 1.0
+
+
+def test_get_analysis_dedupes_normalised_texts(monkeypatch):
+    emo = reload_emotion(dev_mode=False)
+    sent = []
+
+    class FakeResp:
+        def __init__(self, text):
+            self.text = text
+
+        def get_result(self):
+            return {
+                "emotion": {"document": {"emotion": dict.fromkeys(
+                    emo.EMOTIONS, 0.5
+                )}},
+                "concepts": [{"text": self.text.upper()}],
+            }
+
+    def analyze(*, text, **kwargs):
+        sent.append(text)
+        return FakeResp(text)
+
+    monkeypatch.setattr(emo.NLU_CLIENT.client, "analyze", analyze)
+    texts = [
+        "I’ve shipped it.",
+        '"I\'ve  shipped it."',
+        "Something else",
+        " I've shipped it.\n",
+    ]
+    df = emo.get_analysis(texts)
+
+    assert sorted(sent) == ["I've shipped it.", "Something else"]
+    assert df["text"].tolist() == texts
+    assert df.loc[1, "concepts"] == ["I'VE SHIPPED IT."]
+    # duplicates share one parsed list instead of copies
+    assert df.loc[0, "concepts"] is df.loc[3, "concepts"]
+    assert df.loc[2, "concepts"] == ["SOMETHING ELSE"]
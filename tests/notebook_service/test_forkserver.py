@@ -0,0 +1,81 @@
+import asyncio
+import os
+import sys
+import threading
+
+import nbformat
+import psutil
+import pytest
+
+import notebook_service.forkserver as fs_mod
+import notebook_service.runner as runner_mod
+from notebook_service.forkserver import ForkServer, ForkServerKernelManager
+
+
+@pytest.fixture
+def fork_server(monkeypatch):
+    server = ForkServer(preload=["colorsys"])
+    monkeypatch.setattr(fs_mod, "KERNEL_FORKSERVER", True)
+    monkeypatch.setattr(fs_mod, "_server", server)
+    server.start()
+    yield server
+    server.shutdown()
+
+
+def test_disabled_by_default(monkeypatch):
+    monkeypatch.setattr(fs_mod, "KERNEL_FORKSERVER", False)
+    assert fs_mod.get_fork_server() is None
+    assert fs_mod.kernel_manager_class() is not ForkServerKernelManager
+
+
+def test_run_notebook_on_forked_kernel(tmp_path, fork_server):
+    nb = nbformat.v4.new_notebook()
+    nb.cells = [nbformat.v4.new_code_cell(
+        "import os, sys\n"
+        "print(os.getppid(), os.getcwd(), 'colorsys' in sys.modules)"
+    )]
+    (tmp_path / "forked.ipynb").write_text(nbformat.writes(nb))
+
+    out = runner_mod.run_notebook("forked")["outputs"][0]["data"].split()
+    ppid, cwd, preloaded = out
+
+    # the kernel is a child of the template, not of this process
+    assert int(ppid) == fork_server._proc.pid
+    assert int(ppid) != os.getpid()
+    assert cwd == str(tmp_path.resolve())
+    assert preloaded == "True"
+    assert fork_server.stats()["forks"] == 1
+
+
+def test_forked_kernel_is_stopped_on_shutdown(fork_server):
+    from jupyter_core.utils import run_sync
+
+    fs_mod.register_provisioner()
+    km = ForkServerKernelManager(kernel_name="python3")
+    run_sync(km.start_kernel)()
+    pid = km.provisioner.pid
+    assert psutil.Process(pid).ppid() == fork_server._proc.pid
+
+    run_sync(km.shutdown_kernel)(now=True)
+    assert not psutil.pid_exists(pid) or (
+        psutil.Process(pid).status() == psutil.STATUS_ZOMBIE
+    )
+
+
+def test_spawn_runs_off_the_event_loop(monkeypatch):
+    class FakeServer:
+        def spawn(self, args, env, cwd):
+            self.thread = threading.current_thread()
+            return 12345
+
+    server = FakeServer()
+    monkeypatch.setattr(fs_mod, "get_fork_server", lambda: server)
+    provisioner = fs_mod.ForkServerProvisioner(
+        kernel_id="k", kernel_spec=None, parent=None
+    )
+    asyncio.run(provisioner.launch_kernel(
+        [sys.executable, "-m", "ipykernel_launcher", "-f", "conn.json"]
+    ))
+    assert provisioner.pid == 12345
+    # a blocking spawn() must not stall the loop's thread
+    assert server.thread is not threading.main_thread()
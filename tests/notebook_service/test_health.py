@@ -0,0 +1,108 @@
+import importlib
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+from notebook_service import main as app_main
+from notebook_service.health import HealthProber
+
+
+def test_failing_and_hung_checks_are_not_ok():
+    release = threading.Event()
+
+    def boom():
+        raise ConnectionError("refused")
+
+    prober = HealthProber(
+        {
+            "fine": lambda: {"ok": True, "detail": 1},
+            "boom": boom,
+            "hung": lambda: release.wait() or {"ok": True},
+        },
+        check_timeout=0.1,
+    )
+    snapshot = prober.snapshot()
+    release.set()
+
+    assert not snapshot["ready"]
+    assert snapshot["checks"]["fine"]["ok"] is True
+    assert snapshot["checks"]["fine"]["detail"] == 1
+    assert snapshot["checks"]["boom"]["error"] == "ConnectionError: refused"
+    assert snapshot["checks"]["hung"]["error"] == "timed out"
+    assert prober.stats()["failed_checks"] == 2
+
+
+def test_hung_check_is_not_started_again():
+    release = threading.Event()
+    calls = []
+
+    def hung():
+        calls.append(1)
+        release.wait()
+        return {"ok": True}
+
+    prober = HealthProber({"hung": hung}, check_timeout=0.05)
+    try:
+        for _ in range(5):
+            snapshot = prober.probe()
+        assert len(calls) == 1
+        assert "still running" in snapshot["checks"]["hung"]["error"]
+
+        release.set()
+        deadline = time.monotonic() + 5
+        while not prober.probe()["ready"] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert prober.latest()["ready"]
+        assert len(calls) == 2
+    finally:
+        release.set()
+        prober.stop()
+
+
+def test_background_loop_refreshes_cache():
+    calls = []
+    prober = HealthProber(
+        {"count": lambda: calls.append(1) or {"ok": True}}, interval=0.05
+    )
+    prober.start()
+    try:
+        deadline = time.monotonic() + 5
+        while len(calls) < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        prober.stop()
+    assert len(calls) >= 3
+    # reads never run checks
+    seen = len(calls)
+    for _ in range(10):
+        prober.snapshot()
+    assert len(calls) == seen
+    assert not prober.stale()
+
+
+def test_ready_waits_for_a_warm_pool(monkeypatch):
+    monkeypatch.setenv("DEV_MODE", "true")
+    importlib.reload(app_main)
+    stats = {"size": 2, "idle": 1, "leased": 0}
+
+    class FakePool:
+        def stats(self):
+            return dict(stats)
+
+    monkeypatch.setattr(app_main, "get_pool", lambda: FakePool())
+    client = TestClient(app_main.app)
+
+    resp = client.get("/ready")
+    assert resp.status_code == 503
+    kernels = resp.json()["checks"]["kernels"]
+    assert (kernels["ok"], kernels["warm"], kernels["size"]) == (False, 1, 2)
+
+    # fully warm once, then one recycled kernel doesn't flip readiness
+    stats["idle"] = 2
+    app_main.prober.probe()
+    assert client.get("/ready").status_code == 200
+    stats["idle"] = 1
+    app_main.prober.probe()
+    assert client.get("/ready").status_code == 200
+    assert client.get("/health").status_code == 200
@@ -0,0 +1,132 @@
+import nbformat
+import pytest
+
+from notebook_service.incremental import (
+    CellGraph,
+    analyze_cell,
+    cell_hash,
+    plan_run,
+    run_incremental,
+)
+
+
+def make_nb(*sources):
+    nb = nbformat.v4.new_notebook()
+    nb.cells = [nbformat.v4.new_markdown_cell("# title")] + [
+        nbformat.v4.new_code_cell(src) for src in sources
+    ]
+    return nb
+
+
+@pytest.mark.parametrize(
+    "source, defines, uses",
+    [
+        ("x = y + 1", {"x"}, {"y"}),
+        ("x += 1", {"x"}, {"x"}),
+        ("import pandas as pd\nfrom a.b import c", {"pd", "c"}, set()),
+        ("df['z'] = df.a * k", {"df"}, {"df", "k"}),
+        ("def f(a, b=d):\n    return a + g\n", {"f"}, {"d", "g"}),
+        ("out = [v * w for v in vals]", {"out"}, {"w", "vals"}),
+        ("%matplotlib inline\nprint(len(z))", set(), {"z"}),
+    ],
+)
+def test_analyze_cell(source, defines, uses):
+    assert analyze_cell(source) == (defines, uses)
+
+
+def test_analyze_cell_opaque():
+    assert analyze_cell("%%bash\necho hi") is None
+    assert analyze_cell("def (:") is None
+
+
+def test_graph_and_plan():
+    nb = make_nb(
+        "import math",           # 1
+        "raw = expensive()",     # 2
+        "k = 2",                 # 3
+        "res = raw * k",         # 4
+        "print(math.pi, res)",   # 5
+    )
+    graph = CellGraph(nb)
+    assert graph.parents[4] == {"raw": 2, "k": 3}
+    assert graph.downstream({3}) == {3, 4, 5}
+
+    previous = {
+        "hashes": {str(i): cell_hash(nb.cells[i].source) for i in range(1, 6)},
+        "checkpointed": ["raw", "k", "res"],
+    }
+    nb.cells[3].source = "k = 3"
+    to_run, restore = plan_run(CellGraph(nb), previous, set())
+    # the import can't be checkpointed, so its cell re-runs; raw is restored
+    assert to_run == {1, 3, 4, 5}
+    assert restore == {"raw": 2}
+
+
+def test_changed_input_marks_reading_cells():
+    nb = make_nb("df = load('input.csv')", "n = 1")
+    graph = CellGraph(nb)
+    previous = {
+        "hashes": {str(i): cell_hash(nb.cells[i].source) for i in (1, 2)},
+        "checkpointed": ["df", "n"],
+    }
+    assert plan_run(graph, previous, {"input.csv"})[0] == {1}
+
+
+def test_rebound_names_are_not_restored_from_the_checkpoint(tmp_path):
+    nb = make_nb("x = 1", "print(x)", "x = 2")
+    path = tmp_path / "rebind.ipynb"
+    path.write_text(nbformat.writes(nb))
+    assert [o["data"] for o in run_incremental("rebind")["outputs"]] == [
+        "1\n"
+    ]
+
+    # the checkpoint holds x = 2; the middle cell must still see 1
+    nb.cells[2].source = "print(x, 'again')"
+    path.write_text(nbformat.writes(nb))
+    second = run_incremental("rebind")
+    assert second["executed_cells"] == [2, 3]
+    assert [o["data"] for o in second["outputs"]] == ["1 again\n"]
+
+
+def test_names_that_can_no_longer_be_saved_leave_the_checkpoint(tmp_path):
+    nb = make_nb("x = 1", "print(type(x).__name__)")
+    path = tmp_path / "stale.ipynb"
+    path.write_text(nbformat.writes(nb))
+    run_incremental("stale")
+
+    # a module can't be checkpointed, so the old x = 1 must go
+    nb.cells[1].source = "import os as x"
+    path.write_text(nbformat.writes(nb))
+    assert run_incremental("stale")["outputs"][0]["data"] == "module\n"
+
+    nb.cells[2].source = "print(type(x).__name__, 'again')"
+    path.write_text(nbformat.writes(nb))
+    third = run_incremental("stale")
+    assert third["executed_cells"] == [2, 3]
+    assert third["outputs"][0]["data"] == "module again\n"
+
+
+def test_run_incremental_reuses_upstream_cells(tmp_path):
+    nb = make_nb(
+        "base = 10\nprint('expensive')",
+        "scale = 2",
+        "print(base * scale)",
+    )
+    path = tmp_path / "inc.ipynb"
+    path.write_text(nbformat.writes(nb))
+
+    first = run_incremental("inc")
+    assert first["executed_cells"] == [2, 3, 4]
+    assert [o["data"] for o in first["outputs"]] == ["expensive\n", "20\n"]
+
+    nb.cells[2].source = "scale = 3"
+    path.write_text(nbformat.writes(nb))
+    second = run_incremental("inc")
+    assert second["executed_cells"] == [3, 4]
+    # cell 2's output is replayed; base came from the checkpoint
+    assert [(o["cell"], o["data"]) for o in second["outputs"]] == [
+        (2, "expensive\n"),
+        (4, "30\n"),
+    ]
+
+    assert run_incremental("inc")["executed_cells"] == []
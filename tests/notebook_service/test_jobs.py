@@ -0,0 +1,112 @@
+import importlib
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from notebook_service import main as app_main
+from notebook_service.jobs import JobManager, JobQueueFull
+from notebook_service.runner import ExecutionCancelled, ExecutionTimeout
+
+
+def wait_for(job, statuses=("succeeded", "failed", "cancelled", "timeout")):
+    deadline = time.monotonic() + 30
+    while job.status not in statuses:
+        assert time.monotonic() < deadline, f"stuck in {job.status}"
+        time.sleep(0.01)
+    return job
+
+
+def blocking_run(release: threading.Event):
+    def run(notebook, fmt, timeout, cancel_event):
+        while not release.is_set():
+            if cancel_event.is_set():
+                raise ExecutionCancelled("stop")
+            time.sleep(0.01)
+        return {"outputs": []}
+    return run
+
+
+def test_job_succeeds_and_passes_limits():
+    seen = {}
+
+    def run(notebook, fmt, timeout, cancel_event):
+        seen.update(notebook=notebook, fmt=fmt, timeout=timeout)
+        return {"outputs": [{"cell": 1}]}
+
+    manager = JobManager(run, concurrency=1, queue_size=1, timeout=60)
+    job = wait_for(manager.submit("sfe.ipynb", "raw", timeout=120))
+
+    assert job.status == "succeeded"
+    assert job.result == {"outputs": [{"cell": 1}]}
+    # a per-job timeout can't exceed the configured limit
+    assert seen == {"notebook": "sfe.ipynb", "fmt": "raw", "timeout": 60}
+    assert manager.stats()["pending"] == 0
+
+
+@pytest.mark.parametrize(
+    "exc, status",
+    [
+        (ExecutionTimeout("too slow"), "timeout"),
+        (ValueError("bad cell"), "failed"),
+    ],
+)
+def test_job_errors_are_recorded(exc, status):
+    def run(*args, **kwargs):
+        raise exc
+
+    manager = JobManager(run, concurrency=1, queue_size=0)
+    job = wait_for(manager.submit("nb.ipynb", "trimmed"))
+    assert job.status == status
+    assert str(exc) in job.error
+
+
+def test_queue_bound_and_cancellation():
+    release = threading.Event()
+    manager = JobManager(blocking_run(release), concurrency=1, queue_size=1)
+
+    running = manager.submit("a.ipynb", "trimmed")
+    wait_for(running, statuses=("running",))
+    queued = manager.submit("b.ipynb", "trimmed")
+    with pytest.raises(JobQueueFull):
+        manager.submit("c.ipynb", "trimmed")
+
+    # queued jobs are cancelled immediately and free their slot
+    assert manager.cancel(queued.id).status == "cancelled"
+    manager.submit("d.ipynb", "trimmed")
+
+    # running jobs stop once the runner sees the cancel event
+    manager.cancel(running.id)
+    assert wait_for(running).status == "cancelled"
+    release.set()
+    assert manager.cancel("missing") is None
+
+
+def test_jobs_endpoints(sample_notebook, auth_header):
+    sample_notebook(name="foo")
+    importlib.reload(app_main)
+    client = TestClient(app_main.app)
+
+    resp = client.post(
+        "/jobs",
+        params={"notebook": "foo.ipynb", "fmt": "raw"},
+        headers=auth_header,
+    )
+    assert resp.status_code == 202
+    job_id = resp.json()["id"]
+
+    deadline = time.monotonic() + 60
+    while True:
+        body = client.get(f"/jobs/{job_id}", headers=auth_header).json()
+        if body["status"] not in ("queued", "running"):
+            break
+        assert time.monotonic() < deadline
+        time.sleep(0.1)
+    assert body["status"] == "succeeded"
+    assert body["result"]["outputs"] == []
+
+    assert client.get("/jobs/nope", headers=auth_header).status_code == 404
+    assert client.delete("/jobs/nope", headers=auth_header).status_code == 404
+    stats = client.get("/stats", headers=auth_header).json()
+    assert stats["jobs"]["jobs"] == {"succeeded": 1}
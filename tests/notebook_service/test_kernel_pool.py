@@ -0,0 +1,119 @@
+import asyncio
+import threading
+import time
+
+import nbformat
+import pytest
+
+import notebook_service.kernel_pool as pool_mod
+import notebook_service.runner as runner_mod
+from notebook_service.kernel_pool import KernelPool
+
+
+def write_notebook(path, *sources):
+    nb = nbformat.v4.new_notebook()
+    nb.cells = [nbformat.v4.new_code_cell(src) for src in sources]
+    path.write_text(nbformat.writes(nb))
+    return path
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    p = KernelPool(size=1, max_runs=2, preload=["json"])
+    monkeypatch.setattr(pool_mod, "_pool", p)
+    monkeypatch.setattr(pool_mod, "KERNEL_POOL_SIZE", 1)
+    p.start()
+    yield p
+    p.shutdown()
+
+
+def test_get_pool_disabled_by_default(monkeypatch):
+    monkeypatch.setattr(pool_mod, "KERNEL_POOL_SIZE", 0)
+    assert pool_mod.get_pool() is None
+
+
+def test_run_notebook_leases_and_resets_namespace(tmp_path, pool):
+    write_notebook(tmp_path / "first.ipynb", "x = 41\nprint(x + 1)")
+    write_notebook(
+        tmp_path / "second.ipynb",
+        "import os\nprint('x' in globals(), os.getcwd())",
+    )
+
+    first = runner_mod.run_notebook("first")["outputs"]
+    assert first[0]["data"].strip() == "42"
+
+    second = runner_mod.run_notebook("second")["outputs"]
+    seen, cwd = second[0]["data"].split()
+    assert seen == "False"
+    assert cwd == str(tmp_path.resolve())
+
+    stats = pool.stats()
+    assert stats["size"] == 1
+    assert stats["leases"] == 2
+    assert stats["leased"] == 0
+    assert stats["lease_wait_seconds_max"] >= 0
+
+
+def test_kernel_recycled_after_max_runs_and_on_error(tmp_path, pool):
+    with pool.lease(cwd=str(tmp_path)) as km1:
+        pass
+    with pool.lease(cwd=str(tmp_path)) as km2:
+        pass
+    assert km1 is km2
+    # second run hit max_runs=2 → replaced by a fresh kernel
+    assert pool.stats()["recycled"] == 1
+
+    with pytest.raises(ValueError):
+        with pool.lease(cwd=str(tmp_path)) as km3:
+            raise ValueError("boom")
+    assert km3 is not km2
+    assert pool.stats()["recycled"] == 2
+
+    with pool.lease(cwd=str(tmp_path)) as km4:
+        assert km4 is not km3
+    assert pool.stats()["idle"] == 1
+
+
+def test_async_runs_share_pool_on_one_loop(tmp_path, pool):
+    write_notebook(tmp_path / "a.ipynb", "print('a')")
+    write_notebook(tmp_path / "b.ipynb", "print('b')")
+
+    async def both():
+        return await asyncio.gather(
+            runner_mod.async_run_notebook("a"),
+            runner_mod.async_run_notebook("b"),
+        )
+
+    first, second = asyncio.run(both())
+    assert first["outputs"][0]["data"].strip() == "a"
+    assert second["outputs"][0]["data"].strip() == "b"
+    assert pool.stats()["leases"] == 2
+    assert pool.stats()["leased"] == 0
+
+
+def test_timed_out_kernel_is_interrupted_and_reused(tmp_path, pool):
+    write_notebook(tmp_path / "slow.ipynb", "import time\ntime.sleep(30)")
+
+    with pytest.raises(runner_mod.ExecutionTimeout):
+        asyncio.run(runner_mod.async_run_notebook("slow", timeout=1))
+
+    stats = pool.stats()
+    assert stats["leased"] == 0
+    assert stats["recycled"] == 0
+
+
+def test_waiting_for_a_kernel_honours_deadline_and_cancel(tmp_path, pool):
+    write_notebook(tmp_path / "quick.ipynb", "print('hi')")
+    with pool.lease(cwd=str(tmp_path)):
+        t0 = time.monotonic()
+        with pytest.raises(runner_mod.ExecutionTimeout):
+            runner_mod.run_notebook("quick", timeout=0.5)
+        assert time.monotonic() - t0 < 5
+
+        cancel = threading.Event()
+        threading.Timer(0.3, cancel.set).start()
+        with pytest.raises(runner_mod.ExecutionCancelled):
+            asyncio.run(
+                runner_mod.async_run_notebook("quick", cancel_event=cancel)
+            )
+    assert pool.stats()["leased"] == 0
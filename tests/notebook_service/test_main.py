@@ -10,12 +10,7 @@ import pytest
 from fastapi.testclient import TestClient
 
 from notebook_service import main as app_main
-from notebook_service.main import (
-    app,
-    filter_notebook,
-    list_cells,
-    run_and_filter,
-)
+from notebook_service.main import app, list_cells, run_and_filter
 
 client = TestClient(app)
 
@@ -89,14 +84,17 @@ def test_health_ok(monkeypatch):
     # 1) DEV_MODE=false so we *do* hit NLU check
     monkeypatch.setenv("DEV_MODE", "false")
 
-    # 2) Ensure NLU_CLIENT exists on the real module
+    # 2) Stub the NLU client the health check pings
     import notebook_service.emotion as emotion_mod
-    monkeypatch.setattr(emotion_mod, "NLU_CLIENT", object(), raising=False)
+    pings = []
+    fake_client = types.SimpleNamespace(ping=lambda: pings.append(1))
+    monkeypatch.setattr(emotion_mod, "DEV_MODE", False)
+    monkeypatch.setattr(emotion_mod, "NLU_CLIENT", fake_client, raising=False)
 
     # 3) Reload and remake the client
     client = make_test_client()
 
-    # 4) Call /health — should skip the exception and return 200
+    # 4) Call /health — the first probe pings NLU
     resp = client.get("/health")
     assert resp.status_code == 200
 
@@ -107,6 +105,11 @@ def test_health_ok(monkeypatch):
     assert body["version"] == __version__
     assert body.get("nlu") == "reachable"
 
+    # later probes are answered from the prober's cache
+    client.get("/health")
+    assert client.get("/ready").status_code == 200
+    assert pings == [1]
+
 
 def test_health_nlu_unreachable(monkeypatch):
     # 1) DEV_MODE=false so we *do* hit NLU check
@@ -120,10 +123,13 @@ def test_health_nlu_unreachable(monkeypatch):
     # 3) Reload & remake the client /health picks up our fake
     client = make_test_client()
 
-    # 4) Call /health — now the import fails and you get 503
+    # 4) The pod stays alive but stops taking traffic
     resp = client.get("/health")
+    assert resp.status_code == 200
+    assert resp.json()["nlu"] == "unreachable"
+    resp = client.get("/ready")
     assert resp.status_code == 503
-    assert "NLU error" in resp.json()["detail"]
+    assert "ping" in resp.json()["checks"]["nlu"]["error"]
 
 
 #
@@ -191,41 +197,6 @@ def test_run_query_success_trimmed(
     assert isinstance(data["outputs"], list)
 
 
-##
-# 4) filter_notebook unit test
-#
-
-
-@pytest.fixture
-def raw_nb():
-    return {
-        "cells": [
-            {
-                "cell_type": "code",
-                "outputs": [
-                    {"output_type": "stream", "data": "hello"},
-                    {
-                        "output_type": "execute_result",
-                        "data": {"text/plain": "42"},
-                        "execution_count": 1,
-                    },
-                    {"output_type": "display_data",
-                     "data": {"text/html": "<b>nope</b>"}
-                     },
-                ],
-            },
-            {"cell_type": "markdown", "source": "## ignore me"},
-        ]
-    }
-
-
-def test_filter_only_keeps_stream_and_plain_execute(raw_nb):
-    pruned = filter_notebook(raw_nb.copy())
-    outs = pruned["cells"][0]["outputs"]
-    assert len(outs) == 2
-    assert all(o["output_type"] in {"stream", "execute_result"} for o in outs)
-
-
 #
 # 5) CLI helpers
 #
@@ -263,3 +234,124 @@ def test_run_and_filter_executes_and_filters(tmp_path, capsys, monkeypatch):
     run_and_filter(str(path), [0, 1])
     out = capsys.readouterr().out
     assert "✅ Completed run_and_filter on foo.ipynb" in out
+
+
+def test_run_and_filter_keeps_streams_and_results_only(tmp_path, monkeypatch):
+    nb = nbformat.v4.new_notebook()
+    nb.cells.append(nbformat.v4.new_code_cell("x"))
+    path = tmp_path / "foo.ipynb"
+    path.write_text(nbformat.writes(nb))
+
+    class DummyClient:
+        def __init__(self, nb, timeout, kernel_name):
+            self.nb = nb
+
+        def execute(self):
+            self.nb.cells[0].outputs = [
+                nbformat.v4.new_output("stream", text="ok\n"),
+                nbformat.v4.new_output(
+                    "display_data", data={"text/plain": "shown"}
+                ),
+                nbformat.v4.new_output(
+                    "execute_result",
+                    data={"text/plain": "2", "text/html": "<b>2</b>"},
+                    execution_count=1,
+                ),
+            ]
+
+    monkeypatch.setattr("notebook_service.main.NotebookClient", DummyClient)
+
+    outputs = run_and_filter(str(path), [0])["outputs"]
+    assert [(o["type"], o["data"]) for o in outputs] == [
+        ("stream", "ok\n"), ("execute_result", "2")
+    ]
+
+
+#
+# 6) /stats endpoint
+#
+
+
+def test_stats_reports_disabled_kernel_pool(client, auth_header):
+    resp = client.get("/stats", headers=auth_header)
+    assert resp.status_code == 200
+    assert resp.json()["kernel_pool"] is None
+
+
+def test_run_query_timeout_returns_504(auth_header):
+    nb = nbformat.v4.new_notebook()
+    nb.cells.append(nbformat.v4.new_code_cell("import time\ntime.sleep(30)"))
+    path = Path(app_main.NOTEBOOK_DIR) / "slow.ipynb"
+    path.write_text(nbformat.writes(nb))
+    importlib.reload(app_main)
+
+    resp = TestClient(app_main.app).get(
+        "/run",
+        params={"notebook": "slow.ipynb", "timeout": 1},
+        headers=auth_header,
+    )
+    assert resp.status_code == 504
+
+
+#
+# 7) conditional and partial GETs
+#
+
+
+def test_processed_etag_304_and_range(tmp_path, monkeypatch, auth_header):
+    monkeypatch.setattr(app_main, "PROCESSED_DIR", tmp_path)
+    (tmp_path / "features.csv").write_text("a,b\n" + "1,2\n" * 100)
+    client = TestClient(app_main.app)
+    url = "/processed/features.csv"
+    plain = {**auth_header, "Accept-Encoding": "identity"}
+
+    first = client.get(url, headers=plain)
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert not etag.startswith("W/")
+
+    again = client.get(url, headers={**plain, "If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+
+    part = client.get(url, headers={**plain, "Range": "bytes=0-3"})
+    assert part.status_code == 206
+    assert part.content == b"a,b\n"
+    assert part.headers["content-range"] == f"bytes 0-3/{len(first.content)}"
+
+    # a changed file gets a new ETag
+    (tmp_path / "features.csv").write_text("a,b\n")
+    changed = client.get(url, headers={**plain, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+
+
+def test_cached_run_carries_etag(sample_notebook, auth_header, monkeypatch):
+    sample_notebook(name="foo")
+    importlib.reload(app_main)
+    calls = []
+
+    async def fake_run(path, **kwargs):
+        calls.append(path)
+        return {"outputs": []}
+
+    monkeypatch.setattr(app_main, "async_run_notebook", fake_run)
+    client = TestClient(app_main.app)
+    params = {"notebook": "foo.ipynb"}
+
+    first = client.get("/run", params=params, headers=auth_header)
+    etag = first.headers["etag"]
+    second = client.get(
+        "/run", params=params, headers={**auth_header, "If-None-Match": etag}
+    )
+    assert second.status_code == 304
+    assert len(calls) == 1
+
+    # a different projection is a different representation
+    raw = client.get(
+        "/run",
+        params={**params, "mimes": "*"},
+        headers={**auth_header, "If-None-Match": etag},
+    )
+    assert raw.status_code == 200
+    assert raw.headers["etag"] != etag
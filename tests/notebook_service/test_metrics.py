@@ -0,0 +1,155 @@
+import importlib
+import json
+import os
+import subprocess
+import sys
+
+from fastapi.testclient import TestClient
+
+from notebook_service import main as app_main
+from notebook_service import metrics, nlu_retry
+from notebook_service.metrics import Counter, Gauge, Histogram, Registry
+
+
+def test_render_text_format():
+    registry = Registry()
+    runs = Counter("runs_total", "Runs", labels=("nb",), registry=registry)
+    busy = Gauge("busy", "Busy", registry=registry)
+    latency = Histogram(
+        "latency_seconds", "Latency", buckets=(0.1, 1), registry=registry
+    )
+    runs.labels('a"b').inc()
+    runs.labels('a"b').inc(2)
+    busy.set(3)
+    busy.dec()
+    for v in (0.05, 0.5, 5):
+        latency.observe(v)
+    registry.add_collector("extra", lambda: [("idle", "Idle", 4)])
+
+    text = registry.render()
+    assert '# TYPE runs_total counter\nruns_total{nb="a\\"b"} 3\n' in text
+    assert "busy 2\n" in text
+    assert 'latency_seconds_bucket{le="0.1"} 1\n' in text
+    assert 'latency_seconds_bucket{le="1"} 2\n' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 3\n' in text
+    assert "latency_seconds_sum 5.55\n" in text
+    assert "latency_seconds_count 3\n" in text
+    assert "# TYPE idle gauge\nidle 4\n" in text
+
+
+def test_child_process_samples_are_merged(tmp_path):
+    registry = Registry()
+    Counter("calls_total", "Calls", registry=registry).inc(2)
+    child = (
+        "from notebook_service import metrics\n"
+        "c = metrics.Counter('calls_total', 'Calls')\n"
+        "c.inc(5)\n"
+        "metrics.Gauge('child_gauge', 'not shared').set(1)\n"
+        "metrics.flush()\n"
+    )
+    env = {**os.environ, "METRICS_DIR": str(tmp_path)}
+    env["PYTHONPATH"] = os.pathsep.join(sys.path)
+    subprocess.run([sys.executable, "-c", child], env=env, check=True)
+
+    text = registry.render(str(tmp_path))
+    assert "calls_total 7\n" in text
+    assert "child_gauge" not in text
+
+
+def test_exited_processes_are_folded_into_one_file(tmp_path):
+    registry = Registry()
+    Counter("calls_total", "Calls", registry=registry)
+    sample = {"calls_total": {
+        "type": "counter", "help": "Calls", "labels": [],
+        "samples": [[[], 1]],
+    }}
+    # the pid of a process that has already exited
+    dead = subprocess.run(
+        [sys.executable, "-c", "import os; print(os.getpid())"],
+        capture_output=True, text=True,
+    ).stdout.strip()
+    live = f"{os.getpid()}-c.json"
+    for name in (f"{dead}-a.json", f"{dead}-b.json", live):
+        (tmp_path / name).write_text(json.dumps(sample))
+
+    for _ in range(2):
+        assert "calls_total 3\n" in registry.render(str(tmp_path))
+        assert sorted(p.name for p in tmp_path.iterdir()) == [
+            live, "exited.json"
+        ]
+
+    (tmp_path / f"{dead}-d.json").write_text(json.dumps(sample))
+    assert "calls_total 4\n" in registry.render(str(tmp_path))
+
+
+def test_metrics_endpoint(sample_notebook, auth_header, monkeypatch):
+    sample_notebook(name="foo")
+    importlib.reload(app_main)
+
+    async def fake_run(path, **kwargs):
+        return {"outputs": []}
+
+    monkeypatch.setattr(app_main, "async_run_notebook", fake_run)
+    client = TestClient(app_main.app)
+    client.get("/run", params={"notebook": "foo.ipynb"}, headers=auth_header)
+
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    text = resp.text
+    assert (
+        'notebook_service_run_duration_seconds_count{notebook="foo.ipynb",'
+        'engine="kernel",outcome="ok"}'
+    ) in text
+    assert (
+        'notebook_service_http_request_duration_seconds_count{method="GET",'
+        'route="/run",status="200"}'
+    ) in text
+    assert "notebook_service_runs_in_flight 0\n" in text
+    assert "notebook_service_threadpool_max_threads 40\n" in text
+    assert "notebook_service_admission_" in text
+
+
+def test_nlu_errors_are_counted(monkeypatch):
+    monkeypatch.setenv("DEV_MODE", "true")
+    sys.modules.pop("notebook_service.emotion", None)
+    emo = importlib.import_module("notebook_service.emotion")
+
+    def failing(**kwargs):
+        raise TimeoutError("slow")
+
+    monkeypatch.setattr(emo.NLU_CLIENT, "analyze", failing)
+    monkeypatch.setattr(nlu_retry, "NLU_MAX_RETRIES", 1)
+    df = emo.get_analysis(["text"])
+    assert df.loc[0, "error"] == "TimeoutError: slow"
+
+    text = metrics.render()
+    assert (
+        'notebook_service_nlu_errors_total{error="TimeoutError"} 2\n'
+    ) in text
+    assert "notebook_service_nlu_call_seconds_count 2\n" in text
+    assert (
+        'notebook_service_nlu_retries_total{reason="TimeoutError"} 1\n'
+    ) in text
+
+
+def test_stats_reports_nlu_cache_lookups_flushed_by_kernels(
+    client, auth_header, monkeypatch, tmp_path
+):
+    monkeypatch.setattr(metrics, "METRICS_DIR", str(tmp_path))
+    monkeypatch.setattr(metrics, "_serving", True)
+    before = client.get("/stats", headers=auth_header).json()["nlu_cache"]
+
+    # what a kernel's emotion.get_analysis leaves behind
+    (tmp_path / "123-kernel.json").write_text(json.dumps({
+        "notebook_service_nlu_cache_lookups_total": {
+            "type": "counter",
+            "help": "NLU cache lookups",
+            "labels": ["result"],
+            "samples": [[["hit"], 3], [["miss"], 1]],
+        }
+    }))
+    nlu = client.get("/stats", headers=auth_header).json()["nlu_cache"]
+    assert nlu["hits"] - before["hits"] == 3
+    assert nlu["misses"] - before["misses"] == 1
+    assert 0 < nlu["hit_rate"] <= 1
@@ -0,0 +1,112 @@
+import importlib
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+from notebook_service import nlu_backends, nlu_standin
+from notebook_service.nlu_backends import (
+    HttpBackend,
+    NluBackendError,
+    SyntheticBackend,
+    make_backend,
+    synthesize,
+)
+from notebook_service.nlu_retry import call_with_retry, retry_after
+
+TEXT = (
+    "After my promotion, I confidently adjusted my retirement "
+    "contributions upward. Stress led me to overspend on shopping."
+)
+FEATURES = {
+    "concepts": {"limit": 3},
+    "semantic_roles": {"limit": 5},
+    "emotion": {},
+}
+
+
+def test_synthesize_is_deterministic_and_watson_shaped():
+    raw = synthesize(TEXT, FEATURES)
+    assert raw == synthesize(TEXT, FEATURES)
+    assert raw != synthesize("Something else entirely", FEATURES)
+
+    emotions = raw["emotion"]["document"]["emotion"]
+    assert set(emotions) == {"anger", "disgust", "fear", "joy", "sadness"}
+    assert all(0 <= v <= 1 for v in emotions.values())
+
+    concepts = raw["concepts"]
+    assert len(concepts) == 3
+    relevance = [c["relevance"] for c in concepts]
+    assert relevance == sorted(relevance, reverse=True)
+    for c in concepts:
+        assert c["dbpedia_resource"].endswith("/" + c["text"])
+
+    assert len(raw["semantic_roles"]) == 2
+    role = raw["semantic_roles"][0]
+    assert TEXT.startswith(role["subject"]["text"])
+    assert role["action"]["text"] and "text" in role["object"]
+
+    # only the requested features
+    assert set(synthesize(TEXT, {"emotion": {}})) == {
+        "language", "usage", "emotion"
+    }
+
+
+def test_synthetic_faults_are_retried():
+    backend = SyntheticBackend(throttle_rate=1.0, seed=1)
+    with pytest.raises(NluBackendError) as exc:
+        backend.analyze(text=TEXT, features=FEATURES)
+    assert exc.value.status_code == 429
+    assert retry_after(exc.value) == 1.0
+
+    # a 500 on roughly every other call still gets through
+    backend = SyntheticBackend(error_rate=0.5, seed=1)
+    raw = call_with_retry(
+        lambda: backend.analyze(text=TEXT, features=FEATURES),
+        sleep=lambda s: None,
+    )
+    assert raw == synthesize(TEXT, FEATURES)
+
+
+# HttpBackend passes a timeout, which TestClient only warns about
+@pytest.mark.filterwarnings("ignore:You should not use the 'timeout'")
+def test_http_backend_talks_to_the_standin(monkeypatch):
+    client = TestClient(nlu_standin.app)
+    backend = HttpBackend("http://nlu", session=client)
+    assert backend.analyze(text=TEXT, features=FEATURES) == synthesize(
+        TEXT, FEATURES
+    )
+    backend.ping()
+    assert backend.version.endswith("@http://nlu")
+
+    monkeypatch.setattr(
+        nlu_standin.app.state, "backend", SyntheticBackend(throttle_rate=1.0)
+    )
+    with pytest.raises(NluBackendError) as exc:
+        backend.analyze(text=TEXT, features=FEATURES)
+    assert exc.value.status_code == 429
+    assert exc.value.message == "Too Many Requests"
+    assert retry_after(exc.value) == 1.0
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError, match="Unknown NLU_BACKEND"):
+        make_backend("nope")
+
+
+def test_synthetic_backend_feeds_the_graph_pipeline(monkeypatch):
+    from notebook_service.graph_builder import preprocess_concepts
+
+    monkeypatch.setenv("DEV_MODE", "true")
+    monkeypatch.setattr(nlu_backends, "NLU_BACKEND", "synthetic")
+    sys.modules.pop("notebook_service.emotion", None)
+    emo = importlib.import_module("notebook_service.emotion")
+    assert emo.NLU_VERSION == "synthetic-1"
+
+    df = emo.get_analysis([TEXT, "I shipped the release on Friday."])
+    assert df["error"].isna().all()
+    assert all(df["concepts"].apply(len) > 0)
+    assert all(df["semantic_roles"].apply(len) > 0)
+
+    concepts = preprocess_concepts(df)
+    assert set(concepts["doc_index"]) == {0, 1}
@@ -0,0 +1,85 @@
+import importlib
+import sys
+
+import pytest
+
+from notebook_service import nlu_cache
+from notebook_service.nlu_cache import NluCache, cache_key
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return NluCache(tmp_path / "nlu.sqlite3", ttl=3600, max_bytes=10_000)
+
+
+def test_key_ignores_whitespace_but_not_features_or_version():
+    key = cache_key("Hello  world\n", {"emotion": {}}, "2023-08-01")
+    assert key == cache_key(" Hello world", {"emotion": {}}, "2023-08-01")
+    assert key != cache_key("Hello world", {"concepts": {}}, "2023-08-01")
+    assert key != cache_key("Hello world", {"emotion": {}}, "2022-04-07")
+
+
+def test_round_trip_and_stats(cache, tmp_path):
+    cache.put_many({"a": {"emotion": 1}, "b": {"emotion": 2}})
+    assert cache.get_many(["a", "c"]) == {"a": {"emotion": 1}}
+
+    # another kernel of the pod sees the same database
+    other = NluCache(tmp_path / "nlu.sqlite3", ttl=3600, max_bytes=10_000)
+    assert other.get_many(["b"]) == {"b": {"emotion": 2}}
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 2)
+    assert stats["hit_rate"] == 0.5
+
+
+def test_ttl_expiry(tmp_path):
+    cache = NluCache(tmp_path / "nlu.sqlite3", ttl=0, max_bytes=10_000)
+    cache.put_many({"a": {"x": 1}})
+    assert cache.get_many(["a"]) == {}
+
+
+def test_size_cap_evicts_least_recently_read(tmp_path):
+    cache = NluCache(tmp_path / "nlu.sqlite3", ttl=3600, max_bytes=250)
+    blob = "x" * 90
+    cache.put_many({"a": {"v": blob}})
+    cache.put_many({"b": {"v": blob}})
+    cache.get_many(["a"])  # a is now the most recently read
+    cache.put_many({"c": {"v": blob}})  # over the cap: evicts b
+
+    assert set(cache.get_many(["a", "b", "c"])) == {"a", "c"}
+    assert cache.stats()["evictions"] == 1
+
+
+def test_eviction_is_batched(monkeypatch, tmp_path):
+    monkeypatch.setattr(nlu_cache, "_EVICT_EVERY", 3)
+    cache = NluCache(tmp_path / "nlu.sqlite3", ttl=0, max_bytes=10_000)
+    cache.put_many({"a": {"x": 1}})  # the first store evicts
+    cache.put_many({"b": {"x": 1}})
+    cache.put_many({"c": {"x": 1}})
+    assert (cache.stats()["entries"], cache.stats()["evictions"]) == (2, 1)
+
+    cache.put_many({"d": {"x": 1}})  # third store since the last eviction
+    assert (cache.stats()["entries"], cache.stats()["evictions"]) == (0, 4)
+
+
+def test_repeat_analysis_makes_no_nlu_calls(monkeypatch):
+    monkeypatch.setenv("DEV_MODE", "true")
+    sys.modules.pop("notebook_service.emotion", None)
+    emo = importlib.import_module("notebook_service.emotion")
+    calls = []
+    real_analyze = emo.NLU_CLIENT.analyze
+
+    def analyze(**kwargs):
+        calls.append(kwargs["text"])
+        if kwargs["text"] == "bad":
+            raise ValueError("unsupported text")
+        return real_analyze(**kwargs)
+
+    monkeypatch.setattr(emo.NLU_CLIENT, "analyze", analyze)
+    first = emo.get_analysis(["one", "two", "bad"])
+    second = emo.get_analysis(["one ", "two", "bad"])
+
+    # failures are not cached, so only "bad" is retried
+    assert sorted(calls) == ["bad", "bad", "one", "two"]
+    assert second["joy"].tolist()[:2] == first["joy"].tolist()[:2]
+    assert second["text"].tolist() == ["one ", "two", "bad"]
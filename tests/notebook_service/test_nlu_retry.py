@@ -0,0 +1,157 @@
+import threading
+import time
+from email.utils import formatdate
+from types import SimpleNamespace
+
+import pytest
+
+from notebook_service import nlu_retry
+from notebook_service.nlu_retry import (
+    AdaptiveLimiter,
+    call_with_retry,
+    retry_after,
+)
+
+
+class ApiError(Exception):
+    """Shaped like the SDK's ApiException."""
+
+    def __init__(self, code, headers=None):
+        super().__init__(f"HTTP {code}")
+        self.status_code = code
+        self.http_response = SimpleNamespace(headers=headers or {})
+
+
+def flaky(*failures, result="ok"):
+    calls = []
+
+    def fn():
+        calls.append(time.monotonic())
+        if len(calls) <= len(failures):
+            raise failures[len(calls) - 1]
+        return result
+
+    return fn, calls
+
+
+def test_retries_throttles_and_transient_errors():
+    fn, calls = flaky(ApiError(429), ApiError(502), ConnectionError())
+    sleeps = []
+    assert call_with_retry(fn, sleep=sleeps.append) == "ok"
+    assert len(calls) == 4
+    assert len(sleeps) == 3
+
+
+def test_gives_up_on_client_errors_and_after_max_retries(monkeypatch):
+    fn, calls = flaky(ApiError(400))
+    with pytest.raises(ApiError):
+        call_with_retry(fn, sleep=lambda s: None)
+    assert len(calls) == 1
+
+    monkeypatch.setattr(nlu_retry, "NLU_MAX_RETRIES", 2)
+    fn, calls = flaky(*[ApiError(503)] * 5)
+    with pytest.raises(ApiError):
+        call_with_retry(fn, sleep=lambda s: None)
+    assert len(calls) == 3
+
+
+def test_honours_retry_after(monkeypatch):
+    sleeps = []
+    fn, _ = flaky(ApiError(429, {"Retry-After": "7"}))
+    call_with_retry(fn, sleep=sleeps.append)
+    assert sleeps == [7.0]
+
+    # more than NLU_BACKOFF_MAX: give up rather than wait
+    monkeypatch.setattr(nlu_retry, "NLU_BACKOFF_MAX", 5)
+    fn, calls = flaky(ApiError(429, {"Retry-After": "60"}))
+    with pytest.raises(ApiError):
+        call_with_retry(fn, sleep=sleeps.append)
+    assert len(calls) == 1
+
+
+def test_retry_after_parses_http_dates():
+    date = formatdate(time.time() + 30, usegmt=True)
+    assert 28 <= retry_after(ApiError(429, {"Retry-After": date})) <= 30
+    assert retry_after(ApiError(429)) is None
+    assert retry_after(ValueError()) is None
+
+
+def test_backoff_grows_with_jitter_and_is_capped(monkeypatch):
+    monkeypatch.setattr(nlu_retry.random, "uniform", lambda lo, hi: hi)
+    assert [nlu_retry.backoff(n, 0.5, 3) for n in range(5)] == [
+        0.5, 1, 2, 3, 3
+    ]
+
+
+def test_limiter_adds_a_slot_per_window_and_halves_on_throttle():
+    limiter = AdaptiveLimiter(initial=4, minimum=1, maximum=6)
+    # each success adds 1/limit, so about one window adds a slot
+    for _ in range(5):
+        limiter.release(limiter.acquire(), "ok")
+    assert limiter.limit == 5
+
+    # requests sent before a cut don't cut again
+    started = [limiter.acquire() for _ in range(3)]
+    for s in started:
+        limiter.release(s, "throttled")
+    assert limiter.limit == 2
+
+    for _ in range(100):
+        limiter.release(limiter.acquire(), "ok")
+    assert limiter.limit == 6
+
+    stats = limiter.stats()
+    assert stats["throttled"] == 3
+    assert stats["limit_cuts"] == 1
+    assert stats["ok"] == 105
+    assert stats["throughput_per_second"] > 0
+
+
+def test_limiter_bounds_requests_in_flight():
+    limiter = AdaptiveLimiter(initial=2, minimum=1, maximum=2)
+    in_flight = peak = 0
+    lock = threading.Lock()
+
+    def work():
+        nonlocal in_flight, peak
+        with lock:
+            in_flight += 1
+            peak = max(peak, in_flight)
+        time.sleep(0.01)
+        with lock:
+            in_flight -= 1
+
+    threads = [
+        threading.Thread(target=call_with_retry, args=(work, limiter))
+        for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert peak == 2
+    assert limiter.stats()["in_flight"] == 0
+
+
+def test_learned_limit_is_shared_through_the_state_file(
+    monkeypatch, tmp_path
+):
+    monkeypatch.setattr(nlu_retry, "_SYNC_SECONDS", 0)
+    state = tmp_path / "limit.json"
+    first = AdaptiveLimiter(initial=8, minimum=1, maximum=32,
+                            state_path=state)
+    first.release(first.acquire(), "throttled")
+    assert first.limit == 4
+
+    # a kernel started later begins where the last one left off
+    second = AdaptiveLimiter(initial=8, minimum=1, maximum=32,
+                             state_path=state)
+    assert second.limit == 4
+    for _ in range(20):
+        second.release(second.acquire(), "ok")
+    assert second.limit > 4
+
+    # a cut in one process is adopted by the other
+    first.release(first.acquire(), "throttled")
+    second.release(second.acquire(), "ok")
+    assert second.limit == first.limit == 2
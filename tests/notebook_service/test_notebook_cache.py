@@ -0,0 +1,71 @@
+import os
+
+import nbformat
+
+from notebook_service.notebook_cache import NotebookCache
+
+
+def write_notebook(path, source, output_text=None):
+    nb = nbformat.v4.new_notebook()
+    cell = nbformat.v4.new_code_cell(source, execution_count=1)
+    if output_text is not None:
+        cell.outputs = [nbformat.v4.new_output("stream", text=output_text)]
+    nb.cells = [cell, nbformat.v4.new_markdown_cell("# notes")]
+    path.write_text(nbformat.writes(nb))
+    return path
+
+
+def test_hit_returns_private_copy(tmp_path, monkeypatch):
+    path = write_notebook(tmp_path / "a.ipynb", "x = 1", "big output")
+    cache = NotebookCache(max_entries=4)
+
+    reads = []
+    real_read = nbformat.read
+
+    def counting_read(*args, **kwargs):
+        reads.append(args)
+        return real_read(*args, **kwargs)
+
+    monkeypatch.setattr(nbformat, "read", counting_read)
+
+    first = cache.read(path)
+    first.cells[0].source = "mutated"
+    second = cache.read(path)
+
+    assert len(reads) == 1
+    assert second.cells[0].source == "x = 1"
+    assert second.cells[0].outputs[0].text == "big output"
+    assert cache.stats()["hits"] == 1
+
+
+def test_stripped_variant_and_invalidation(tmp_path):
+    path = write_notebook(tmp_path / "a.ipynb", "x = 1", "big output")
+    cache = NotebookCache(max_entries=4)
+
+    stripped = cache.read(path, strip=True)
+    assert stripped.cells[0].outputs == []
+    assert stripped.cells[0].execution_count is None
+    assert stripped.cells[1].source == "# notes"
+
+    write_notebook(path, "x = 2 + 2")
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    assert cache.read(path, strip=True).cells[0].source == "x = 2 + 2"
+    assert cache.stats()["misses"] == 2
+
+
+def test_lru_eviction(tmp_path):
+    cache = NotebookCache(max_entries=2)
+    paths = [
+        write_notebook(tmp_path / f"{n}.ipynb", f"{n} = 1") for n in "abc"
+    ]
+    cache.read(paths[0])
+    cache.read(paths[1])
+    cache.read(paths[0])  # a is now most recent
+    cache.read(paths[2])  # evicts b
+
+    assert cache.stats()["entries"] == 2
+    cache.read(paths[0])
+    assert cache.stats()["hits"] == 2
+    cache.read(paths[1])
+    assert cache.stats()["misses"] == 4
@@ -0,0 +1,134 @@
+import hashlib
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from notebook_service import main as app_main
+from notebook_service.processed_index import ProcessedIndex
+
+
+def touch(path, size, mtime):
+    path.write_bytes(b"x" * size)
+    os.utime(path, (mtime, mtime))
+
+
+@pytest.fixture
+def files(tmp_path):
+    root = tmp_path / "processed"
+    root.mkdir()
+    (root / "artifacts").mkdir()
+    for i, name in enumerate(["b.csv", "a.json", "c.csv", "ab.csv"]):
+        touch(root / name, size=10 * (4 - i), mtime=1_000_000 + i)
+    return root
+
+
+def walk(index, **kwargs):
+    names, cursor = [], None
+    while True:
+        entries, cursor = index.page(limit=1, cursor=cursor, **kwargs)
+        names += [e.name for e in entries]
+        if cursor is None:
+            return names
+
+
+@pytest.mark.parametrize("sort, order, expected", [
+    ("name", "asc", ["a.json", "ab.csv", "b.csv", "c.csv"]),
+    ("name", "desc", ["c.csv", "b.csv", "ab.csv", "a.json"]),
+    ("mtime", "desc", ["ab.csv", "c.csv", "a.json", "b.csv"]),
+    ("size", "asc", ["ab.csv", "c.csv", "a.json", "b.csv"]),
+])
+def test_cursor_walks_every_file_once(files, sort, order, expected):
+    index = ProcessedIndex(files)
+    assert walk(index, sort=sort, order=order) == expected
+
+
+@pytest.mark.parametrize("order", ["asc", "desc"])
+def test_prefix_and_glob_filters(files, order):
+    index = ProcessedIndex(files)
+    assert sorted(walk(index, order=order, prefix="a")) == [
+        "a.json", "ab.csv"
+    ]
+    assert walk(index, sort="size", glob="*.csv") == [
+        "ab.csv", "c.csv", "b.csv"
+    ]
+
+
+def test_rescans_only_on_change(files):
+    index = ProcessedIndex(files, ttl=3600)
+    index.page()
+    index.page()
+    assert index.stats()["scans"] == 1
+
+    touch(files / "d.csv", size=1, mtime=2_000_000)
+    entries, _ = index.page(sort="mtime", order="desc", limit=1)
+    assert entries[0].name == "d.csv"
+    stats = index.stats()
+    assert stats["scans"] == 2
+    assert stats["files"] == 5
+    assert stats["reused_entries"] == 4
+    # only the new file was statted
+    assert stats["stat_calls"] == 5
+
+
+def test_replaced_file_is_statted_when_the_directory_changes(files):
+    index = ProcessedIndex(files, ttl=3600)
+    index.page()
+    touch(files / "tmp", size=7, mtime=2_000_000)
+    os.replace(files / "tmp", files / "b.csv")
+
+    entries, _ = index.page(prefix="b")
+    assert (entries[0].size, entries[0].mtime_ns) == (7, 2 * 10**15)
+    assert index.stats()["stat_calls"] == 5
+
+
+def test_digests_are_kept_until_the_file_changes(files):
+    index = ProcessedIndex(files, ttl=0)
+    for _ in range(2):
+        entries, _ = index.page(prefix="ab")
+        digest = index.digest(entries[0])
+    assert digest == hashlib.sha256(b"x" * 10).hexdigest()
+    assert index.stats()["digests"] == 1
+
+    touch(files / "ab.csv", size=3, mtime=2_000_000)
+    entries, _ = index.page(prefix="ab")
+    assert index.digest(entries[0]) == hashlib.sha256(b"xxx").hexdigest()
+    assert index.stats()["digests"] == 2
+
+
+def test_rejects_foreign_cursor(files):
+    index = ProcessedIndex(files)
+    _, cursor = index.page(limit=1)
+    with pytest.raises(ValueError):
+        index.page(sort="size", cursor=cursor)
+    with pytest.raises(ValueError):
+        index.page(cursor="not-a-cursor")
+
+
+def test_processed_endpoint_pages(files, monkeypatch, auth_header):
+    monkeypatch.setattr(app_main, "PROCESSED_DIR", files)
+    client = TestClient(app_main.app)
+
+    resp = client.get(
+        "/processed", params={"limit": 2, "glob": "*.csv"},
+        headers=auth_header,
+    )
+    assert resp.status_code == 200
+    body = resp.json()
+    assert [f["name"] for f in body["items"]] == ["ab.csv", "b.csv"]
+    assert body["items"][1]["size"] == 40
+    assert body["items"][1]["mtime"] == 1_000_000
+    assert len(body["items"][1]["sha256"]) == 64
+
+    resp = client.get(
+        "/processed",
+        params={"limit": 2, "glob": "*.csv", "cursor": body["next_cursor"]},
+        headers=auth_header,
+    )
+    assert [f["name"] for f in resp.json()["items"]] == ["c.csv"]
+    assert resp.json()["next_cursor"] is None
+
+    resp = client.get(
+        "/processed", params={"cursor": "bogus"}, headers=auth_header
+    )
+    assert resp.status_code == 400
@@ -0,0 +1,58 @@
+import nbformat
+
+from notebook_service.profiling import (
+    CellLatencyHistograms,
+    cell_durations,
+    get_cell_histograms,
+)
+from notebook_service.runner import run_notebook
+
+
+def test_histogram_buckets_are_cumulative():
+    h = CellLatencyHistograms(buckets=(0.1, 1))
+    h.observe("a.ipynb", {1: 0.05, 2: 0.5})
+    h.observe("a.ipynb", {1: 3.0})
+
+    snap = h.snapshot()["a.ipynb"]
+    assert snap[1]["count"] == 2
+    assert snap[1]["sum"] == 3.05
+    assert snap[1]["buckets"] == {"0.1": 1, "1": 1, "+Inf": 2}
+    assert snap[2]["buckets"] == {"0.1": 0, "1": 1, "+Inf": 1}
+
+
+def test_cell_durations_from_timing_metadata():
+    nb = nbformat.v4.new_notebook()
+    timed = nbformat.v4.new_code_cell("x = 1")
+    timed.metadata["execution"] = {
+        "iopub.status.busy": "2024-01-01T00:00:00.000000Z",
+        "shell.execute_reply": "2024-01-01T00:00:01.500000Z",
+    }
+    nb.cells = [nbformat.v4.new_markdown_cell("# t"), timed]
+    assert cell_durations(nb) == {2: 1.5}
+
+
+def test_run_notebook_profile(tmp_path):
+    nb = nbformat.v4.new_notebook()
+    nb.cells = [
+        nbformat.v4.new_markdown_cell("# profiled"),
+        nbformat.v4.new_code_cell("print('x' * 1000)"),
+        nbformat.v4.new_code_cell("data = bytearray(20 * 1024 * 1024)"),
+    ]
+    (tmp_path / "prof.ipynb").write_text(nbformat.writes(nb))
+
+    result = run_notebook("prof", profile=True)
+    by_cell = {p["cell"]: p for p in result["profile"]}
+
+    assert set(by_cell) == {2, 3}
+    assert by_cell[2]["output_bytes"] > 1000
+    assert by_cell[2]["status"] == "ok"
+    assert all(p["wall_seconds"] > 0 for p in by_cell.values())
+    assert by_cell[3]["peak_rss_delta_bytes"] >= 10 * 1024 * 1024
+    assert get_cell_histograms().snapshot()["prof.ipynb"][3]["count"] >= 1
+
+
+def test_profile_endpoint(client, auth_header):
+    get_cell_histograms().observe("seen.ipynb", {4: 0.2})
+    body = client.get("/profile", headers=auth_header).json()
+    assert body["buckets"][0] == 0.01
+    assert body["notebooks"]["seen.ipynb"]["4"]["count"] >= 1
@@ -0,0 +1,113 @@
+import importlib
+
+import pytest
+from fastapi.testclient import TestClient
+
+from notebook_service import main as app_main
+from notebook_service.projection import OutputProjection, parse_cell_range
+
+
+@pytest.fixture
+def result():
+    return {
+        "outputs": [
+            {"cell": 1, "type": "stream", "mime": "text/plain",
+             "data": "hello"},
+            {"cell": 2, "type": "execute_result", "mime": "text/plain",
+             "data": "42"},
+            {"cell": 2, "type": "execute_result", "mime": "text/html",
+             "data": "<b>42</b>"},
+            {"cell": 3, "type": "display_data", "mime": "application/json",
+             "data": {"values": list(range(100))}},
+        ],
+        "executed_cells": [1, 2, 3],
+    }
+
+
+def test_default_mimes_unless_asked_for_all(result):
+    for fmt in ("trimmed", "raw"):
+        trimmed = OutputProjection.from_query(fmt).apply(result)
+        assert [o["mime"] for o in trimmed["outputs"]] == [
+            "text/plain", "text/plain", "application/json"
+        ]
+        assert trimmed["executed_cells"] == [1, 2, 3]
+
+    every = OutputProjection.from_query("raw", mimes="*").apply(result)
+    assert len(every["outputs"]) == 4
+    # unchanged records are passed through, not copied
+    assert every["outputs"][0] is result["outputs"][0]
+
+
+def test_mimes_and_cell_range(result):
+    projection = OutputProjection.from_query(
+        "raw", mimes="text/html,text/plain", cells="2-"
+    )
+    outputs = projection.apply(result)["outputs"]
+    assert [(o["cell"], o["mime"]) for o in outputs] == [
+        (2, "text/plain"), (2, "text/html")
+    ]
+
+
+def test_max_bytes_cuts_text_and_drops_other_data(result):
+    outputs = OutputProjection.from_query(
+        "raw", mimes="*", max_bytes=4
+    ).apply(result)["outputs"]
+    assert outputs[0] == {**result["outputs"][0], "data": "hell",
+                          "truncated": True}
+    assert outputs[1] is result["outputs"][1]
+    assert outputs[3]["data"] is None
+    assert outputs[3]["truncated"] is True
+
+
+def test_fields_projection(result):
+    outputs = OutputProjection.from_query(
+        "trimmed", fields="cell,data"
+    ).apply(result)["outputs"]
+    assert outputs[1] == {"cell": 2, "data": "42"}
+
+
+@pytest.mark.parametrize(
+    "spec, expected",
+    [("3", (3, 3)), ("2-5", (2, 5)), ("4-", (4, None)), ("-2", (None, 2))],
+)
+def test_parse_cell_range(spec, expected):
+    assert parse_cell_range(spec) == expected
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"cells": "5-2"}, {"cells": "x"}, {"fields": "cell,bogus"},
+])
+def test_invalid_parameters_raise(kwargs):
+    with pytest.raises(ValueError):
+        OutputProjection.from_query("raw", **kwargs)
+
+
+def test_run_applies_projection(sample_notebook, auth_header, monkeypatch):
+    sample_notebook(name="foo")
+    importlib.reload(app_main)
+
+    async def fake_run(path, **kwargs):
+        return {"outputs": [
+            {"cell": 1, "type": "stream", "mime": "text/plain",
+             "data": "hi"},
+            {"cell": 2, "type": "display_data", "mime": "text/html",
+             "data": "<p/>"},
+        ]}
+
+    monkeypatch.setattr(app_main, "async_run_notebook", fake_run)
+    client = TestClient(app_main.app)
+
+    resp = client.get(
+        "/run",
+        params={"notebook": "foo.ipynb", "fields": "cell,mime"},
+        headers=auth_header,
+    )
+    assert resp.status_code == 200
+    assert resp.json() == {"outputs": [{"cell": 1, "mime": "text/plain"}]}
+
+    resp = client.get(
+        "/run",
+        params={"notebook": "foo.ipynb", "cells": "9-1"},
+        headers=auth_header,
+    )
+    assert resp.status_code == 400
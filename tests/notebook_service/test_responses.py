@@ -0,0 +1,148 @@
+import importlib
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from notebook_service import main as app_main
+from notebook_service.responses import (
+    CompressionMiddleware,
+    choose_encoding,
+    etag_matches,
+    wants_msgpack,
+)
+
+BODY = "x,y\n" + "1,2\n" * 2000
+
+# br and zstd need the optional "speedups" extra
+OPTIONAL = {"br": "brotli", "zstd": "zstandard"}
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+    @app.get("/csv")
+    def csv():
+        return PlainTextResponse(
+            BODY, media_type="text/csv", headers={"ETag": '"abc"'}
+        )
+
+    @app.get("/small")
+    def small():
+        return PlainTextResponse("tiny")
+
+    @app.get("/png")
+    def png():
+        return Response(b"\x89PNG" * 1000, media_type="image/png")
+
+    @app.get("/lines")
+    def lines():
+        return StreamingResponse(
+            (f"{i}\n" for i in range(500)),
+            media_type="application/x-ndjson",
+        )
+
+    return TestClient(app)
+
+
+@pytest.mark.parametrize(
+    "accept, expected",
+    [
+        ("gzip, deflate, br, zstd", "zstd"),
+        ("gzip, br", "br"),
+        ("gzip;q=1, br;q=0.5", "gzip"),
+        ("br;q=0, gzip;q=0", None),
+        ("*", "zstd"),
+        ("identity", None),
+    ],
+)
+def test_choose_encoding(accept, expected):
+    for module in OPTIONAL.values():
+        pytest.importorskip(module)
+    assert choose_encoding(accept) == expected
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "br", "zstd"])
+def test_compresses_with_negotiated_encoding(client, encoding):
+    if encoding in OPTIONAL:
+        pytest.importorskip(OPTIONAL[encoding])
+    resp = client.get("/csv", headers={"Accept-Encoding": encoding})
+    assert resp.headers["content-encoding"] == encoding
+    assert "Accept-Encoding" in resp.headers["vary"]
+    # the compressed body is a different representation
+    assert resp.headers["etag"] == 'W/"abc"'
+    # httpx decodes all three
+    assert resp.text == BODY
+    assert resp.num_bytes_downloaded < len(BODY) // 10
+
+
+def test_small_and_unaccepted_bodies_are_sent_as_is(client):
+    assert "content-encoding" not in client.get(
+        "/small", headers={"Accept-Encoding": "gzip"}
+    ).headers
+    resp = client.get("/csv", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in resp.headers
+    assert resp.headers["etag"] == '"abc"'
+
+
+def test_already_compressed_types_are_sent_as_is(client):
+    resp = client.get("/png", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in resp.headers
+    assert resp.content == b"\x89PNG" * 1000
+
+
+def test_streamed_chunks_are_flushed(client):
+    resp = client.get("/lines", headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["content-encoding"] == "gzip"
+    assert resp.text.splitlines() == [str(i) for i in range(500)]
+
+
+def test_wants_msgpack():
+    pytest.importorskip("msgpack")
+    assert wants_msgpack("application/msgpack")
+    assert wants_msgpack("application/x-msgpack, application/json;q=0.5")
+    assert not wants_msgpack("application/json")
+    assert not wants_msgpack("application/json, application/msgpack;q=0.1")
+
+
+def test_run_returns_msgpack_when_asked(
+    sample_notebook, auth_header, monkeypatch
+):
+    msgpack = pytest.importorskip("msgpack")
+    sample_notebook(name="foo")
+    importlib.reload(app_main)
+    outputs = {"outputs": [
+        {"cell": 1, "type": "stream", "mime": "text/plain", "data": "hi"}
+    ]}
+
+    async def fake_run(path, **kwargs):
+        return outputs
+
+    monkeypatch.setattr(app_main, "async_run_notebook", fake_run)
+    client = TestClient(app_main.app)
+
+    resp = client.get(
+        "/run",
+        params={"notebook": "foo.ipynb"},
+        headers={**auth_header, "Accept": "application/msgpack"},
+    )
+    assert resp.headers["content-type"] == "application/msgpack"
+    assert msgpack.unpackb(resp.content) == outputs
+
+    resp = client.get(
+        "/run", params={"notebook": "foo.ipynb"}, headers=auth_header
+    )
+    assert resp.headers["content-type"] == "application/json"
+    assert resp.json() == outputs
+
+
+def test_etag_matches_uses_weak_comparison():
+    assert etag_matches('"a"', '"a"')
+    assert etag_matches('W/"a"', '"a"')
+    assert etag_matches('"b", W/"a"', 'W/"a"')
+    assert etag_matches("*", '"a"')
+    assert not etag_matches('"b"', '"a"')
+    assert not etag_matches(None, '"a"')
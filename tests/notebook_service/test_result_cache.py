@@ -0,0 +1,137 @@
+import os
+import time
+from collections import OrderedDict
+
+import nbformat
+
+import notebook_service.nlu_backends as nlu_backends_mod
+import notebook_service.result_cache as result_cache_mod
+import notebook_service.runner as runner_mod
+from notebook_service.result_cache import (
+    ResultCache,
+    cache_key,
+    environment_fingerprint,
+    file_digest,
+)
+
+
+def write_notebook(path, source, inputs=()):
+    nb = nbformat.v4.new_notebook()
+    nb.cells.append(nbformat.v4.new_code_cell(source))
+    if inputs:
+        nb.metadata["notebook_service"] = {"inputs": list(inputs)}
+    path.write_text(nbformat.writes(nb))
+    return path
+
+
+def read(path):
+    return nbformat.read(path, as_version=4)
+
+
+def test_cache_key_tracks_code_and_declared_inputs(tmp_path):
+    data = tmp_path / "input.csv"
+    data.write_text("a\n1\n")
+    nb_path = write_notebook(tmp_path / "nb.ipynb", "print(1)", ["input.csv"])
+    key = cache_key(nb_path, read(nb_path))
+
+    # same code + inputs → same key, even with stored outputs
+    nb = read(nb_path)
+    nb.cells[0].outputs = [nbformat.v4.new_output("stream", text="1\n")]
+    assert cache_key(nb_path, nb) == key
+
+    data.write_text("a\n2\n")
+    os.utime(data, ns=(time.time_ns() + 10**9,) * 2)
+    assert cache_key(nb_path, read(nb_path)) != key
+
+    write_notebook(nb_path, "print(2)", ["input.csv"])
+    assert cache_key(nb_path, read(nb_path)) != key
+
+
+def test_file_digests_keep_one_version_per_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(result_cache_mod, "_digests", OrderedDict())
+    monkeypatch.setattr(result_cache_mod, "_MAX_DIGESTS", 2)
+    data = tmp_path / "data.csv"
+    for i in range(3):
+        data.write_text(f"v{i}\n")
+        os.utime(data, ns=(time.time_ns() + i * 10**9,) * 2)
+        first = file_digest(data)
+        assert file_digest(data) == first
+    assert list(result_cache_mod._digests) == [str(data)]
+
+    for name in ("a", "b"):
+        (tmp_path / name).write_text(name)
+        file_digest(tmp_path / name)
+    # least recently used path dropped once over the cap
+    assert list(result_cache_mod._digests) == [
+        str(tmp_path / "a"), str(tmp_path / "b")
+    ]
+
+
+def test_cache_key_tracks_the_nlu_backend(tmp_path, monkeypatch):
+    nb_path = write_notebook(tmp_path / "nb.ipynb", "print(1)")
+    monkeypatch.setenv("DEV_MODE", "false")
+    environment_fingerprint.cache_clear()
+    watson = cache_key(nb_path, read(nb_path))
+
+    monkeypatch.setattr(nlu_backends_mod, "NLU_BACKEND", "synthetic")
+    environment_fingerprint.cache_clear()
+    try:
+        assert cache_key(nb_path, read(nb_path)) != watson
+    finally:
+        monkeypatch.undo()
+        environment_fingerprint.cache_clear()
+
+
+def test_get_put_hit_and_miss_counters(tmp_path):
+    cache = ResultCache(tmp_path, ttl=60, max_bytes=1 << 20)
+    assert cache.get("k") is None
+    cache.put("k", {"outputs": [{"cell": 1}]})
+    assert cache.get("k") == {"outputs": [{"cell": 1}]}
+    assert cache.stats() == {
+        "hits": 1, "misses": 1, "stores": 1, "evictions": 0,
+    }
+
+
+def test_ttl_expiry(tmp_path, monkeypatch):
+    cache = ResultCache(tmp_path, ttl=10, max_bytes=1 << 20)
+    cache.put("k", {"outputs": []})
+    real_time = time.time
+    monkeypatch.setattr(
+        "notebook_service.result_cache.time.time", lambda: real_time() + 11
+    )
+    assert cache.get("k") is None
+    assert not (tmp_path / "k.json").exists()
+
+
+def test_size_cap_evicts_least_recently_used(tmp_path):
+    payload = {"outputs": [{"data": "x" * 400}]}
+    cache = ResultCache(tmp_path, ttl=60, max_bytes=1000)
+    cache.put("old", payload)
+    cache.put("new", payload)
+    # make "old" the most recently used, then overflow the cap
+    os.utime(tmp_path / "new.json", (1, 1))
+    assert cache.get("old") is not None
+    cache.put("third", payload)
+
+    assert not (tmp_path / "new.json").exists()
+    assert (tmp_path / "old.json").exists()
+    assert (tmp_path / "third.json").exists()
+    assert cache.stats()["evictions"] == 1
+
+
+def test_run_notebook_served_from_cache(tmp_path, monkeypatch):
+    nb_path = write_notebook(tmp_path / "cached.ipynb", "print('hi')")
+    calls = []
+    real_execute = runner_mod.execute
+
+    def counting_execute(nb, **kw):
+        calls.append(nb)
+        return real_execute(nb, **kw)
+
+    monkeypatch.setattr(runner_mod, "execute", counting_execute)
+
+    first = runner_mod.run_notebook(str(nb_path))
+    second = runner_mod.run_notebook(str(nb_path))
+    assert first == second
+    assert first["outputs"][0]["data"] == "hi\n"
+    assert len(calls) == 1
@@ -1,16 +1,15 @@
 import importlib
+import threading
+import time
 from types import SimpleNamespace
 
-import nest_asyncio
+import nbformat
 import pandas as pd
 import pytest
 
 import notebook_service.runner as runner_mod
 from notebook_service.runner import load_data, run_notebook
 
-# Ensure notebooks run in the temp dir
-nest_asyncio.apply()
-
 
 def reload_runner(tmp_path):
     """
@@ -60,7 +59,7 @@ def test_run_notebook_adds_suffix_and_stream_and_execute(
 
     # Stub out read() and execute() to return our dummy
     monkeypatch.setattr(
-        runner_mod.nbformat,
+        nbformat,
         "read",
         lambda path,
         **kwargs: dummy_nb
@@ -90,7 +89,7 @@ def test_run_notebook_adds_suffix_and_stream_and_execute(
     assert len(outputs) == 2
 
 
-def test_run_notebook_filters_allowed_mimes(tmp_path, monkeypatch):
+def test_run_notebook_records_every_mime(tmp_path, monkeypatch):
     # 1) Create an empty baz.ipynb so resolve(strict=True) passes
     nb_file = tmp_path / "baz.ipynb"
     nb_file.write_text("")
@@ -110,17 +109,17 @@ def test_run_notebook_filters_allowed_mimes(tmp_path, monkeypatch):
                 "output_type": "display_data",
                 "data": {"image/png": "iVBORw0KG"}
             },
-            # disallowed
+            # not in the default projection
             {
                 "output_type": "display_data",
-                "data": {"application/pdf":  b"%PDF-"}
+                "data": {"application/pdf": "JVBERi0="}
             },
         ]
     }])
 
     # 3) Stub both read() and execute() to return our dummy (no validation)
     monkeypatch.setattr(
-        runner_mod.nbformat,
+        nbformat,
         "read",
         lambda path, **kwargs: dummy
     )
@@ -133,9 +132,69 @@ def test_run_notebook_filters_allowed_mimes(tmp_path, monkeypatch):
     # 4) Run and inspect outputs
     outputs = run_notebook("baz.ipynb")["outputs"]
 
-    # 5) Only the 3 allowed mimes remain
+    # 5) Every mime is recorded; the projection decides what is returned
     mimes = {o["mime"] for o in outputs}
-    assert mimes == {"application/json", "text/plain", "image/png"}
+    assert mimes == {
+        "application/json", "text/plain", "image/png", "application/pdf"
+    }
     assert all(o["type"] == "display_data" for o in outputs)
     assert all(o["cell"] == 1 for o in outputs)
-    assert len(outputs) == 3
+    assert len(outputs) == 4
+
+
+def write_code_notebook(path, *sources):
+    nb = nbformat.v4.new_notebook()
+    nb.cells = [nbformat.v4.new_code_cell(src) for src in sources]
+    path.write_text(nbformat.writes(nb))
+    return path
+
+
+def test_run_notebook_cancel_event_stops_run(tmp_path):
+    write_code_notebook(tmp_path / "cancel.ipynb", "print('never')")
+    cancel = threading.Event()
+    cancel.set()
+    with pytest.raises(runner_mod.ExecutionCancelled):
+        run_notebook("cancel", cancel_event=cancel)
+
+
+def test_run_notebook_timeout_interrupts_slow_cell(tmp_path):
+    write_code_notebook(
+        tmp_path / "slow.ipynb", "import time\ntime.sleep(30)"
+    )
+    with pytest.raises(runner_mod.ExecutionTimeout):
+        run_notebook("slow", timeout=1)
+
+
+def test_cell_timeout_interrupts_only_the_slow_cell(tmp_path):
+    write_code_notebook(
+        tmp_path / "cells.ipynb",
+        "print('fast')",
+        "import time\ntime.sleep(30)",
+    )
+    with pytest.raises(runner_mod.ExecutionTimeout):
+        run_notebook("cells", cell_timeout=1)
+
+
+def test_notebook_metadata_sets_its_own_deadline(tmp_path):
+    path = write_code_notebook(
+        tmp_path / "limited.ipynb", "import time\ntime.sleep(30)"
+    )
+    nb = nbformat.read(path, as_version=4)
+    nb.metadata["notebook_service"] = {"timeout": 1}
+    path.write_text(nbformat.writes(nb))
+
+    assert runner_mod.notebook_limits(nb) == (1, None)
+    with pytest.raises(runner_mod.ExecutionTimeout):
+        run_notebook("limited")
+
+
+def test_cancel_event_interrupts_running_cell(tmp_path):
+    write_code_notebook(
+        tmp_path / "busy.ipynb", "import time\ntime.sleep(30)"
+    )
+    cancel = threading.Event()
+    threading.Timer(2, cancel.set).start()
+    t0 = time.monotonic()
+    with pytest.raises(runner_mod.ExecutionCancelled):
+        run_notebook("busy", cancel_event=cancel)
+    assert time.monotonic() - t0 < 20
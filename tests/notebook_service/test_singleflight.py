@@ -0,0 +1,119 @@
+import asyncio
+import importlib
+
+import httpx
+import pytest
+
+from notebook_service import main as app_main
+from notebook_service.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    async def scenario():
+        flights = SingleFlight()
+        gate = asyncio.Event()
+        calls = []
+
+        async def start(cancel_event):
+            calls.append(cancel_event)
+            await gate.wait()
+            return {"outputs": ["done"]}
+
+        waiters = [
+            asyncio.create_task(flights.run("sfe", start)) for _ in range(5)
+        ]
+        await asyncio.sleep(0)
+        assert flights.stats()["waiting"] == 5
+        gate.set()
+        return await asyncio.gather(*waiters), calls, flights.stats()
+
+    results, calls, stats = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results)
+    assert stats["executions"] == 1
+    assert stats["coalesced"] == 4
+    assert stats["in_flight"] == 0
+
+
+def test_errors_reach_every_waiter():
+    async def scenario():
+        flights = SingleFlight()
+
+        async def start(cancel_event):
+            await asyncio.sleep(0.01)
+            raise RuntimeError("boom")
+
+        return await asyncio.gather(
+            flights.run("k", start),
+            flights.run("k", start),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(scenario())
+    assert [type(r) for r in results] == [RuntimeError, RuntimeError]
+
+
+def test_flight_cancelled_only_when_last_waiter_leaves():
+    async def scenario():
+        flights = SingleFlight()
+        events = []
+
+        async def start(cancel_event):
+            events.append(cancel_event)
+            while not cancel_event.is_set():
+                await asyncio.sleep(0.01)
+            raise RuntimeError("stopped")
+
+        first = asyncio.create_task(flights.run("k", start))
+        second = asyncio.create_task(flights.run("k", start))
+        await asyncio.sleep(0.02)
+
+        first.cancel()
+        await asyncio.sleep(0.02)
+        assert not events[0].is_set()
+
+        second.cancel()
+        await asyncio.sleep(0.02)
+        assert events[0].is_set()
+        with pytest.raises(asyncio.CancelledError):
+            await second
+        return flights.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["abandoned"] == 1
+    assert stats["in_flight"] == 0
+
+
+def test_identical_run_requests_are_coalesced(
+    sample_notebook, auth_header, monkeypatch
+):
+    sample_notebook(name="foo")
+    importlib.reload(app_main)
+    calls = []
+
+    async def fake_run(path, **kwargs):
+        calls.append(path)
+        await asyncio.sleep(0.2)
+        return {"outputs": []}
+
+    monkeypatch.setattr(app_main, "async_run_notebook", fake_run)
+    # DEV mode answers /run without executing anything
+    monkeypatch.setattr(app_main, "DEV", False)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app_main.app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            params = {"notebook": "foo.ipynb", "fmt": "raw"}
+            responses = await asyncio.gather(*[
+                client.get("/run", params=params, headers=auth_header)
+                for _ in range(10)
+            ])
+            stats = await client.get("/stats", headers=auth_header)
+        return responses, stats.json()
+
+    responses, stats = asyncio.run(scenario())
+    assert [r.status_code for r in responses] == [200] * 10
+    assert len(calls) == 1
+    assert stats["coalescing"]["coalesced"] == 9
@@ -0,0 +1,74 @@
+import asyncio
+import importlib
+import json
+
+import nbformat
+from fastapi.testclient import TestClient
+
+from notebook_service import main as app_main
+from notebook_service.runner import async_stream_notebook
+from notebook_service.streaming import encode_event
+
+
+def write_notebook(path, *sources):
+    nb = nbformat.v4.new_notebook()
+    nb.cells = [nbformat.v4.new_code_cell(src) for src in sources]
+    path.write_text(nbformat.writes(nb))
+    return path
+
+
+def make_client():
+    app_main.NotebookName = app_main._make_notebook_enum()
+    importlib.reload(app_main)
+    return TestClient(app_main.app)
+
+
+def test_encode_event_framing():
+    assert encode_event({"a": 1}, "ndjson") == '{"a": 1}\n'
+    assert encode_event({"a": 1}, "sse", "end") == (
+        'event: end\ndata: {"a": 1}\n\n'
+    )
+
+
+def test_stream_notebook_emits_records_in_order(tmp_path):
+    write_notebook(tmp_path / "s.ipynb", "print('one')", "print('two')\n2")
+    seen = []
+    asyncio.run(async_stream_notebook("s", seen.append))
+    assert [(r["cell"], r["type"], r["data"]) for r in seen] == [
+        (1, "stream", "one\n"),
+        (2, "stream", "two\n"),
+        (2, "execute_result", "2"),
+    ]
+
+
+def test_run_stream_ndjson(tmp_path, auth_header):
+    write_notebook(tmp_path / "nd.ipynb", "print('a')", "print('b')")
+    client = make_client()
+
+    resp = client.get(
+        "/run",
+        params={"notebook": "nd.ipynb", "stream": "ndjson"},
+        headers=auth_header,
+    )
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    assert [(r["cell"], r["data"]) for r in lines] == [(1, "a\n"), (2, "b\n")]
+
+
+def test_run_stream_sse_reports_errors(tmp_path, auth_header):
+    write_notebook(tmp_path / "bad.ipynb", "print('ok')", "1/0")
+    client = make_client()
+
+    resp = client.get(
+        "/run",
+        params={"notebook": "bad.ipynb", "stream": "sse"},
+        headers=auth_header,
+    )
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    events = [e for e in resp.text.split("\n\n") if e]
+    assert events[0].startswith("event: output\n")
+    assert json.loads(events[0].split("data: ", 1)[1])["data"] == "ok\n"
+    assert events[-1].startswith("event: error\n")
+    assert "ZeroDivisionError" in events[-1]